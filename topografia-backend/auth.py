@@ -1,9 +1,19 @@
-from fastapi import HTTPException, Depends, status
+from fastapi import HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from typing import Optional
+import hashlib
+import logging
 import os
+import time
 from pydantic import BaseModel
+from cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Tokens ya verificados: evita repetir la validación del JWT en cada request.
+# La entrada nunca sobrevive a la expiración (exp) del propio token.
+_tokens_verificados = cache.espacio("token")
 
 # Este esquema representa la información del usuario extraída del token JWT de Supabase
 class CurrentUser(BaseModel):
@@ -14,7 +24,8 @@ class CurrentUser(BaseModel):
 # Configuración del esquema de autenticación Bearer
 security = HTTPBearer()
 
-def get_supabase_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> CurrentUser:
+def get_supabase_user(credentials: HTTPAuthorizationCredentials = Depends(security),
+                      request: Request = None) -> CurrentUser:
     """
     Esta función valida el token JWT de Supabase y extrae la información del usuario.
     Es crucial para que funcione el Row Level Security, ya que Supabase necesita
@@ -22,6 +33,8 @@ def get_supabase_user(credentials: HTTPAuthorizationCredentials = Depends(securi
     
     Args:
         credentials: Token JWT enviado en el header Authorization
+        request: Petición en curso (la inyecta FastAPI); el id del usuario queda
+            en request.state para el enrutamiento de lecturas (replica.py)
         
     Returns:
         CurrentUser: Información del usuario autenticado
@@ -29,11 +42,18 @@ def get_supabase_user(credentials: HTTPAuthorizationCredentials = Depends(securi
     Raises:
         HTTPException: Si el token es inválido o ha expirado
     """
+    clave_token = hashlib.sha256(credentials.credentials.encode()).hexdigest()
+    usuario_cacheado = _tokens_verificados.get(clave_token)
+    if usuario_cacheado is not None:
+        usuario = CurrentUser(**usuario_cacheado)
+        if request is not None:
+            request.state.usuario_id = usuario.id
+        return usuario
+    
     try:
         # Debug: Imprimir información del token para troubleshooting
         jwt_secret = os.getenv("SUPABASE_JWT_SECRET")
-        print(f"🔐 DEBUG - JWT Secret configurado: {jwt_secret is not None}")
-        print(f"🔐 DEBUG - Token recibido (primeros 50 chars): {credentials.credentials[:50]}...")
+        logger.debug(f"🔐 JWT Secret configurado: {jwt_secret is not None}")
         
         # El JWT secret se obtiene de la configuración de tu proyecto Supabase
         # Se encuentra en: Proyecto > Settings > API > JWT Secret
@@ -44,7 +64,7 @@ def get_supabase_user(credentials: HTTPAuthorizationCredentials = Depends(securi
             audience="authenticated"
         )
         
-        print(f"🔐 DEBUG - Token decodificado exitosamente para usuario: {payload.get('email')}")
+        logger.debug(f"🔐 Token decodificado exitosamente para usuario: {payload.get('email')}")
         
         # Extraer información del usuario del payload del token
         user_id: str = payload.get("sub")
@@ -56,7 +76,15 @@ def get_supabase_user(credentials: HTTPAuthorizationCredentials = Depends(securi
                 detail="Token inválido: no se pudo extraer ID de usuario"
             )
             
-        return CurrentUser(id=user_id, email=email)
+        usuario = CurrentUser(id=user_id, email=email)
+        if request is not None:
+            request.state.usuario_id = usuario.id
+        
+        vigencia = payload.get("exp", 0) - time.time()
+        if vigencia > 0:
+            _tokens_verificados.set(clave_token, usuario.model_dump(), ttl=min(vigencia, _tokens_verificados.ttl))
+        
+        return usuario
         
     except JWTError as e:
         raise HTTPException(
@@ -65,11 +93,12 @@ def get_supabase_user(credentials: HTTPAuthorizationCredentials = Depends(securi
         )
 
 # Dependencia opcional para endpoints que pueden funcionar con o sin autenticación
-def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> Optional[CurrentUser]:
+def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+                      request: Request = None) -> Optional[CurrentUser]:
     """
     Versión opcional de get_supabase_user para endpoints públicos que pueden
     beneficiarse de información del usuario si está disponible, pero no la requieren.
     """
     if not credentials:
         return None
-    return get_supabase_user(credentials)
+    return get_supabase_user(credentials, request)
@@ -0,0 +1,14 @@
+"""
+Suite de benchmarks reproducibles para la API de topografía.
+
+Incluye un generador de proyectos sintéticos, micro-benchmarks de las rutas
+de cálculo y escenarios de carga HTTP. Los resultados se guardan como JSON
+para poder comparar regresiones entre commits:
+
+    python -m benchmarks micro --salida resultados/micro.json
+    python -m benchmarks carga --salida resultados/carga.json
+    python -m benchmarks comparar resultados/base.json resultados/nuevo.json
+
+Por defecto se usa un SQLite temporal. Para medir contra PostgreSQL se
+define BENCH_DATABASE_URL (por ejemplo un contenedor local de Postgres).
+"""
@@ -0,0 +1,232 @@
+"""
+Punto de entrada: python -m benchmarks {micro,carga,borrado,comparar} [opciones]
+
+Se ejecuta desde topografia-backend/ para que los módulos de la API
+(database, models, routers, main) sean importables.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from benchmarks.base_datos import preparar_entorno
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    def comunes(p):
+        p.add_argument("--db", help="URL de base de datos (por defecto BENCH_DATABASE_URL o SQLite temporal)")
+        p.add_argument("--km", type=float, default=1.0, help="Longitud del proyecto en km")
+        p.add_argument("--intervalo", type=float, default=5.0, help="Intervalo entre estaciones en metros")
+        p.add_argument("--divisiones", type=int, default=13, help="Número de divisiones transversales")
+        p.add_argument("--relleno", type=float, default=0.5, help="Fracción de estaciones con medición")
+        p.add_argument("--semilla", type=int, default=42)
+        p.add_argument("--filtro", help="Ejecutar sólo los benchmarks cuyo nombre contenga este texto")
+        p.add_argument("--salida", help="Ruta del JSON de resultados")
+
+    micro = sub.add_parser("micro", help="Micro-benchmarks de cálculo y serialización")
+    comunes(micro)
+    micro.add_argument("--repeticiones", type=int, default=50)
+
+    carga = sub.add_parser("carga", help="Escenarios de carga HTTP")
+    comunes(carga)
+    carga.add_argument("--total", type=int, default=200, help="Operaciones por escenario")
+    carga.add_argument("--concurrencia", type=int, default=16)
+    carga.add_argument("--url", help="Servidor uvicorn real; debe usar la misma base que --db")
+    carga.add_argument("--limites", action="store_true",
+                       help="Aplicar ESCRITURA_TASA/ESCRITURA_CONCURRENCIA (por defecto se desactivan: "
+                            "los escenarios usan un solo usuario)")
+    carga.add_argument("--sin-pool", action="store_true",
+                       help="CALCULO_PROCESOS=0: los cálculos pesados se ejecutan en el hilo de la petición")
+    carga.add_argument("--proyectos", type=int, default=1,
+                       help="Proyectos del usuario en resumen_portafolio (los adicionales son de 0.1 km)")
+    carga.add_argument("--cuadrillas", type=int, default=8, help="Usuarios con autosave normal en cliente_desbocado y autosave_con_recalculo")
+
+    borrado = sub.add_parser("borrado", help="Eliminación de proyectos grandes (cascada ORM vs base de datos)")
+    comunes(borrado)
+    borrado.add_argument("--repeticiones", type=int, default=3, help="Proyectos generados por estrategia")
+
+    comparar = sub.add_parser("comparar", help="Comparar dos JSON de resultados")
+    comparar.add_argument("base")
+    comparar.add_argument("actual")
+    comparar.add_argument("--umbral", type=float, default=0.10, help="Empeoramiento relativo de p95 tolerado")
+
+    return parser.parse_args()
+
+
+def _preparar_proyecto(args):
+    """Crea esquema, usuario y proyecto sintético; devuelve (SessionLocal, config, usuario_id, proyecto_id)"""
+    from benchmarks.base_datos import crear_esquema, crear_usuario
+    from benchmarks.generador import ConfigSintetica, generar_proyecto, divisiones_simetricas
+    from database import SessionLocal
+
+    crear_esquema()
+    izquierdas, derechas = divisiones_simetricas(args.divisiones)
+    config = ConfigSintetica(
+        longitud_km=args.km,
+        intervalo=args.intervalo,
+        divisiones_izquierdas=izquierdas,
+        divisiones_derechas=derechas,
+        relleno=args.relleno,
+        semilla=args.semilla,
+    )
+    with SessionLocal() as db:
+        usuario_id = crear_usuario(db)
+        proyecto_id = generar_proyecto(db, usuario_id, config)
+    return SessionLocal, config, usuario_id, proyecto_id
+
+
+def _imprimir(resultados):
+    for r in resultados:
+        print(f"{r['nombre']:<40} p50={r['p50_ms']:>9.3f}ms p95={r['p95_ms']:>9.3f}ms "
+              f"p99={r['p99_ms']:>9.3f}ms {r['throughput_ops']:>9.2f} op/s errores={r['errores']}")
+
+
+def _micro(args, url):
+    from benchmarks.micro import Contexto, ejecutar_micro
+
+    SessionLocal, config, usuario_id, proyecto_id = _preparar_proyecto(args)
+    ctx = Contexto(SessionLocal, proyecto_id, usuario_id, config)
+    return config, ejecutar_micro(ctx, repeticiones=args.repeticiones, filtro=args.filtro)
+
+
+def _borrado(args, url):
+    from benchmarks.borrado import ejecutar_borrado
+
+    # El proyecto de referencia no se usa: cada repetición genera y borra el suyo
+    SessionLocal, config, usuario_id, _ = _preparar_proyecto(args)
+    return config, ejecutar_borrado(SessionLocal, usuario_id, config, args.repeticiones, args.filtro)
+
+
+def _usuario_con_proyecto(SessionLocal, config):
+    """Usuario adicional con un proyecto pequeño: (headers, ids de medición)"""
+    from benchmarks.base_datos import crear_usuario, token_para
+    from benchmarks.generador import ConfigSintetica, generar_proyecto
+    from models.medicion import MedicionEstacion
+
+    pequeno = ConfigSintetica(
+        longitud_km=0.1,
+        intervalo=config.intervalo,
+        divisiones_izquierdas=config.divisiones_izquierdas,
+        divisiones_derechas=config.divisiones_derechas,
+        relleno=1.0,
+        semilla=config.semilla,
+    )
+    with SessionLocal() as db:
+        usuario_id = crear_usuario(db)
+        proyecto_id = generar_proyecto(db, usuario_id, pequeno)
+        medicion_ids = [m for (m,) in db.query(MedicionEstacion.id).filter(
+            MedicionEstacion.proyecto_id == proyecto_id
+        )]
+    return {"headers": {"Authorization": f"Bearer {token_para(usuario_id)}"}, "medicion_ids": medicion_ids}
+
+
+def _proyectos_adicionales(SessionLocal, config, usuario_id, cantidad: int):
+    """Proyectos pequeños adicionales del usuario principal (resumen_portafolio)"""
+    from benchmarks.generador import ConfigSintetica, generar_proyecto
+
+    pequeno = ConfigSintetica(
+        longitud_km=0.1,
+        intervalo=config.intervalo,
+        divisiones_izquierdas=config.divisiones_izquierdas,
+        divisiones_derechas=config.divisiones_derechas,
+        relleno=config.relleno,
+        semilla=config.semilla,
+    )
+    with SessionLocal() as db:
+        for _ in range(max(cantidad, 0)):
+            generar_proyecto(db, usuario_id, pequeno)
+
+
+def _carga(args, url):
+    import httpx
+    from benchmarks.base_datos import token_para
+    from benchmarks.carga import ContextoCarga, ejecutar_carga
+    from models.medicion import MedicionEstacion
+
+    SessionLocal, config, usuario_id, proyecto_id = _preparar_proyecto(args)
+    with SessionLocal() as db:
+        medicion_ids = [m for (m,) in db.query(MedicionEstacion.id).filter(
+            MedicionEstacion.proyecto_id == proyecto_id
+        ).order_by(MedicionEstacion.estacion_km)]
+    extra = {}
+    if not args.filtro or any(args.filtro in nombre for nombre in ("cliente_desbocado", "autosave_con_recalculo")):
+        extra["cuadrillas"] = [_usuario_con_proyecto(SessionLocal, config) for _ in range(args.cuadrillas)]
+        extra["desbocado"] = _usuario_con_proyecto(SessionLocal, config)
+    if not args.filtro or args.filtro in "resumen_portafolio":
+        _proyectos_adicionales(SessionLocal, config, usuario_id, args.proyectos - 1)
+        extra["proyectos"] = max(args.proyectos, 1)
+
+    ctx = ContextoCarga(
+        proyecto_id=proyecto_id,
+        headers={"Authorization": f"Bearer {token_para(usuario_id)}"},
+        medicion_ids=medicion_ids,
+        divisiones=config.divisiones_izquierdas + config.divisiones_derechas,
+        total_estaciones=config.total_estaciones,
+        km_inicial=config.km_inicial,
+        km_final=config.km_final,
+        extra=extra,
+    )
+
+    async def correr():
+        if args.url:
+            cliente = httpx.AsyncClient(base_url=args.url, timeout=60)
+        else:
+            from main import app
+            cliente = httpx.AsyncClient(app=app, base_url="http://bench", timeout=60)
+        async with cliente:
+            return await ejecutar_carga(cliente, ctx, args.total, args.concurrencia, args.filtro)
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    resultados = asyncio.run(correr())
+    if "respuestas_desbocado" in extra:
+        print(f"cliente_desbocado: respuestas del cliente desbocado por código {extra['respuestas_desbocado']}")
+    if extra.get("recalculos"):
+        recalculos = extra["recalculos"]
+        print(f"autosave_con_recalculo: {len(recalculos)} recálculos completos, "
+              f"{sum(recalculos) / len(recalculos):.2f} s de media")
+    if "consultas_resumen" in extra:
+        print(f"resumen_portafolio: {extra['proyectos']} proyectos, consultas SQL por petición "
+              f"{sorted(extra['consultas_resumen']) or 'sin Server-Timing'}")
+    return config, resultados
+
+
+def main():
+    args = _argumentos()
+
+    if args.comando == "comparar":
+        from benchmarks.resultados import cargar, comparar
+        filas = comparar(cargar(args.base), cargar(args.actual), args.umbral)
+        for f in filas:
+            marca = "REGRESIÓN" if f["regresion"] else "ok"
+            print(f"{f['nombre']:<40} {f['p95_base_ms']:>9.3f}ms -> {f['p95_actual_ms']:>9.3f}ms "
+                  f"({f['cambio']:+.1%}) {marca}")
+        return 1 if any(f["regresion"] for f in filas) else 0
+
+    url = preparar_entorno(args.db)
+    if args.comando == "carga" and not args.limites:
+        os.environ["ESCRITURA_TASA"] = "0"
+        os.environ["ESCRITURA_CONCURRENCIA"] = "0"
+    if args.comando == "carga" and args.sin_pool:
+        os.environ["CALCULO_PROCESOS"] = "0"
+    from benchmarks.resultados import metadatos, guardar
+
+    ejecutar = {"micro": _micro, "carga": _carga, "borrado": _borrado}[args.comando]
+    config, resultados = ejecutar(args, url)
+    _imprimir(resultados)
+
+    if args.salida:
+        guardar({
+            "tipo": args.comando,
+            "metadatos": metadatos(url, config.como_dict()),
+            "resultados": resultados,
+        }, args.salida)
+        print(f"Resultados guardados en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
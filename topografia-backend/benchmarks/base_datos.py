@@ -0,0 +1,110 @@
+"""
+Preparación de la base de datos de benchmarks.
+
+Si BENCH_DATABASE_URL está definida se usa ese PostgreSQL local (por ejemplo
+`docker run -p 5433:5432 postgres:16`). Si no, se crea un SQLite temporal en
+el que los tipos específicos de PostgreSQL se traducen a equivalentes
+compatibles. Este módulo debe importarse ANTES que `database`, `config` o
+`main`, porque esos módulos leen las variables de entorno al importarse.
+"""
+import os
+import tempfile
+import uuid
+
+from sqlalchemy import event, types
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.ext.compiler import compiles
+
+# Secreto usado para firmar los tokens de los escenarios HTTP
+JWT_SECRET_BENCH = "benchmark-jwt-secret"
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_en_sqlite(type_, compiler, **kw):
+    """SQLite no tiene JSONB; el tipo JSON genérico es suficiente para medir"""
+    return "JSON"
+
+
+class _UUIDTexto(types.TypeDecorator):
+    """
+    UUID para SQLite que, como psycopg2 en PostgreSQL, acepta tanto
+    uuid.UUID como str en los parámetros (los routers comparan con str).
+    """
+    impl = types.CHAR(36)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else str(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else uuid.UUID(value)
+
+
+def preparar_entorno(url: str = None) -> str:
+    """
+    Define las variables de entorno que esperan `database` y `config` y
+    devuelve la URL efectiva de la base de datos de benchmarks.
+    """
+    url = url or os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        ruta = os.path.join(tempfile.mkdtemp(prefix="topografia-bench-"), "bench.db")
+        url = f"sqlite:///{ruta}?check_same_thread=false&timeout=30"
+
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SUPABASE_URL", "http://localhost")
+    os.environ.setdefault("SUPABASE_KEY", "benchmark")
+    os.environ["SUPABASE_JWT_SECRET"] = JWT_SECRET_BENCH
+    return url
+
+
+def _activar_claves_foraneas(conexion_dbapi, registro):
+    cursor = conexion_dbapi.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def crear_esquema():
+    """Crea las tablas en la base de benchmarks a partir de los modelos"""
+    from database import engine, Base
+    import models  # noqa: F401 - registra todos los modelos en Base.metadata
+
+    if engine.dialect.name == "sqlite":
+        for tabla in Base.metadata.tables.values():
+            for columna in tabla.columns:
+                if isinstance(columna.type, UUID):
+                    columna.type = _UUIDTexto()
+
+        # SQLite no aplica ON DELETE CASCADE salvo que se activen las claves foráneas
+        event.listen(engine, "connect", _activar_claves_foraneas)
+
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def crear_usuario(db, email: str = None):
+    """Crea un perfil de usuario sintético y devuelve su id como string"""
+    from models.usuario import PerfilUsuario
+
+    usuario_id = uuid.uuid4()
+    db.add(PerfilUsuario(
+        id=usuario_id,
+        email=email or f"bench-{usuario_id.hex[:8]}@example.com",
+        nombre_completo="Usuario Benchmark",
+        activo=True
+    ))
+    db.commit()
+    return str(usuario_id)
+
+
+def token_para(usuario_id: str, email: str = "bench@example.com") -> str:
+    """Firma un JWT equivalente a los que emite Supabase para el usuario dado"""
+    from jose import jwt
+    import time
+
+    payload = {
+        "sub": usuario_id,
+        "email": email,
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+    }
+    return jwt.encode(payload, JWT_SECRET_BENCH, algorithm="HS256")
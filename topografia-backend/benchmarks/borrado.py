@@ -0,0 +1,98 @@
+"""
+Benchmark de eliminación de proyectos grandes.
+
+Cada repetición genera un proyecto sintético nuevo (fuera del cronómetro) y
+mide una de estas estrategias:
+
+- borrado.cascada_orm: el comportamiento anterior, con los hijos cargados en
+  la sesión y un DELETE por fila (referencia para comparar).
+- borrado.cascada_bd: delete_proyecto síncrono con passive_deletes; la base
+  de datos resuelve la cascada.
+- borrado.marcado: latencia de respuesta de delete_proyecto con
+  en_segundo_plano=true (sólo marca eliminado_en).
+- borrado.purga: duración de la purga por lotes que sigue al marcado.
+"""
+from typing import Callable
+import time
+
+from benchmarks.generador import ConfigSintetica, generar_proyecto
+from benchmarks.resultados import resumir
+
+
+def _cascada_orm(db, proyecto_id):
+    from sqlalchemy.orm import selectinload
+    from models.medicion import MedicionEstacion
+    from models.proyecto import Proyecto
+
+    proyecto = db.query(Proyecto).options(
+        selectinload(Proyecto.estaciones),
+        selectinload(Proyecto.mediciones).selectinload(MedicionEstacion.lecturas),
+    ).filter(Proyecto.id == proyecto_id).one()
+    for medicion in proyecto.mediciones:
+        for lectura in medicion.lecturas:
+            db.delete(lectura)
+        db.delete(medicion)
+    for estacion in proyecto.estaciones:
+        db.delete(estacion)
+    db.delete(proyecto)
+    db.commit()
+
+
+def _cascada_bd(db, proyecto_id):
+    from fastapi import BackgroundTasks
+    from models.proyecto import Proyecto
+    from routers.proyectos import delete_proyecto
+
+    delete_proyecto(BackgroundTasks(), en_segundo_plano=False, proyecto=db.get(Proyecto, proyecto_id), db=db)
+
+
+def _marcado(db, proyecto_id):
+    from fastapi import BackgroundTasks
+    from models.proyecto import Proyecto
+    from routers.proyectos import delete_proyecto
+
+    # Las tareas se descartan: la purga se mide por separado
+    delete_proyecto(BackgroundTasks(), en_segundo_plano=True, proyecto=db.get(Proyecto, proyecto_id), db=db)
+
+
+def _purga(db, proyecto_id):
+    from services.purga import marcar_eliminado, purgar_proyecto
+    from models.proyecto import Proyecto
+
+    marcar_eliminado(db, db.get(Proyecto, proyecto_id))
+    inicio = time.perf_counter()
+    purgar_proyecto(proyecto_id)
+    return time.perf_counter() - inicio
+
+
+ESTRATEGIAS = {
+    "borrado.cascada_orm": _cascada_orm,
+    "borrado.cascada_bd": _cascada_bd,
+    "borrado.marcado": _marcado,
+    "borrado.purga": _purga,
+}
+
+
+def ejecutar_borrado(SessionLocal: Callable, usuario_id: str, config: ConfigSintetica,
+                     repeticiones: int = 3, filtro: str = None):
+    from models.lectura import LecturaDivision
+
+    resultados = []
+    for nombre, estrategia in ESTRATEGIAS.items():
+        if filtro and filtro not in nombre:
+            continue
+        latencias = []
+        lecturas = 0
+        for _ in range(repeticiones):
+            with SessionLocal() as db:
+                proyecto_id = generar_proyecto(db, usuario_id, config)
+                lecturas = db.query(LecturaDivision).filter(LecturaDivision.proyecto_id == proyecto_id).count()
+            with SessionLocal() as db:
+                inicio = time.perf_counter()
+                medido = estrategia(db, proyecto_id)
+                latencias.append(medido if medido is not None else time.perf_counter() - inicio)
+            if nombre == "borrado.marcado":
+                from services.purga import purgar_proyecto
+                purgar_proyecto(proyecto_id)
+        resultados.append(resumir(nombre, latencias, sum(latencias), extra={"lecturas_por_proyecto": lecturas}))
+    return resultados
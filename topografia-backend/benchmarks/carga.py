@@ -0,0 +1,361 @@
+"""
+Escenarios de carga HTTP.
+
+Por defecto las peticiones se envían en proceso contra `main.app` (ASGI),
+lo que mide la API completa sin ruido de red. Con --url se apunta a un
+servidor uvicorn real. Cada escenario se registra con @escenario y devuelve
+una lista de "operaciones": corrutinas que representan una acción de usuario
+(que puede implicar varias peticiones) y cuya latencia se mide completa,
+salvo que la operación devuelva su propia latencia en segundos (para excluir
+pausas simuladas del usuario).
+"""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+import asyncio
+import random
+import re
+import time
+
+from benchmarks.resultados import resumir
+
+
+@dataclass
+class ContextoCarga:
+    """Datos del proyecto sintético que necesitan los escenarios"""
+    proyecto_id: int
+    headers: dict
+    medicion_ids: List[int]
+    divisiones: List[float]
+    total_estaciones: int
+    km_inicial: float = 0.0
+    km_final: float = 0.0
+    semilla: int = 7
+    extra: dict = field(default_factory=dict)
+
+
+ESCENARIOS: Dict[str, Callable] = {}
+CONSULTAS_RESUMEN = 1  # /proyectos/resumen: una consulta agrupada, sin importar cuántos proyectos
+
+
+def escenario(nombre: str):
+    """Registra un escenario de carga bajo `nombre`"""
+    def registrar(funcion):
+        ESCENARIOS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+async def _verificar(respuesta):
+    if respuesta.status_code >= 400:
+        raise RuntimeError(f"{respuesta.request.method} {respuesta.request.url.path} -> {respuesta.status_code}")
+    return respuesta
+
+
+async def ejecutar_operaciones(operaciones: List[Callable], concurrencia: int):
+    """Ejecuta las operaciones con un máximo de `concurrencia` simultáneas"""
+    semaforo = asyncio.Semaphore(concurrencia)
+    latencias = []
+    errores = []
+
+    async def correr(operacion):
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                propia = await operacion()
+                latencias.append(propia if propia is not None else time.perf_counter() - inicio)
+            except Exception as e:
+                errores.append(str(e))
+
+    inicio_total = time.perf_counter()
+    await asyncio.gather(*(correr(op) for op in operaciones))
+    return latencias, errores, time.perf_counter() - inicio_total
+
+
+@escenario("autosave_rafaga")
+def autosave_rafaga(cliente, ctx: ContextoCarga, total: int):
+    """Ráfaga de POST /lecturas/ como la que produce el debounce de Campo.jsx"""
+    rng = random.Random(ctx.semilla)
+
+    def operacion():
+        cuerpo = {
+            "medicion_id": rng.choice(ctx.medicion_ids),
+            "division_transversal": rng.choice(ctx.divisiones),
+            "lectura_mira": round(rng.uniform(1.0, 3.0), 6),
+            "calidad": "BUENA",
+        }
+
+        async def enviar():
+            await _verificar(await cliente.post("/lecturas/", json=cuerpo, headers=ctx.headers))
+        return enviar
+
+    return [operacion() for _ in range(total)]
+
+
+@escenario("autosave_misma_division")
+def autosave_misma_division(cliente, ctx: ContextoCarga, total: int):
+    """Escritores simultáneos sobre la MISMA división: detecta carreras del upsert"""
+    medicion_id = ctx.medicion_ids[0]
+    division = ctx.divisiones[0]
+
+    def operacion(i):
+        async def enviar():
+            cuerpo = {
+                "medicion_id": medicion_id,
+                "division_transversal": division,
+                "lectura_mira": 1.0 + (i % 1000) / 1000,
+                "calidad": "BUENA",
+            }
+            await _verificar(await cliente.post("/lecturas/", json=cuerpo, headers=ctx.headers))
+        return enviar
+
+    return [operacion(i) for i in range(total)]
+
+
+@escenario("autosave_misma_medicion")
+def autosave_misma_medicion(cliente, ctx: ContextoCarga, total: int):
+    """
+    Primer guardado simultáneo de TODAS las divisiones de una medición nueva:
+    cada inserción toma FOR KEY SHARE sobre la medición (clave foránea) y el
+    recálculo de alertas la bloquea; en PostgreSQL detecta esperas mutuas.
+    """
+    def operacion(i):
+        async def enviar():
+            medicion = await _verificar(await cliente.post("/mediciones/", json={
+                "proyecto_id": ctx.proyecto_id,
+                # Fuera del cadenamiento del proyecto: nunca choca con una medición existente
+                "estacion_km": round(ctx.km_final + 1000 + i * 5, 3),
+                "bn_altura": 100.0,
+                "bn_lectura": 1.5,
+                "fecha_medicion": "2024-01-01",
+            }, headers=ctx.headers))
+            medicion_id = medicion.json()["id"]
+            respuestas = await asyncio.gather(*(
+                cliente.post("/lecturas/", json={
+                    "medicion_id": medicion_id,
+                    "division_transversal": division,
+                    "lectura_mira": 1.0 + (i % 1000) / 1000,
+                    "calidad": "BUENA",
+                }, headers=ctx.headers)
+                for division in ctx.divisiones
+            ))
+            for respuesta in respuestas:
+                await _verificar(respuesta)
+        return enviar
+
+    return [operacion(i) for i in range(total)]
+
+
+@escenario("abrir_proyecto")
+def abrir_proyecto(cliente, ctx: ContextoCarga, total: int):
+    """Carga inicial de un proyecto: datos generales, estaciones y mediciones"""
+    base = f"/proyectos/{ctx.proyecto_id}"
+    limite = ctx.total_estaciones
+
+    async def operacion():
+        respuestas = await asyncio.gather(
+            cliente.get(base, headers=ctx.headers),
+            cliente.get(f"{base}/estaciones/", params={"limit": limite}, headers=ctx.headers),
+            cliente.get(f"{base}/mediciones/", params={"limit": limite}, headers=ctx.headers),
+        )
+        for respuesta in respuestas:
+            await _verificar(respuesta)
+
+    return [operacion for _ in range(total)]
+
+
+@escenario("refrescar_dashboard")
+def refrescar_dashboard(cliente, ctx: ContextoCarga, total: int):
+    """Dashboard: lista de proyectos más el fan-out de lecturas por medición"""
+    mediciones = ctx.medicion_ids[:50]
+
+    async def operacion():
+        await _verificar(await cliente.get("/proyectos/", headers=ctx.headers))
+        respuestas = await asyncio.gather(*(
+            cliente.get(f"/mediciones/{medicion_id}/lecturas/", headers=ctx.headers)
+            for medicion_id in mediciones
+        ))
+        for respuesta in respuestas:
+            await _verificar(respuesta)
+
+    return [operacion for _ in range(total)]
+
+
+@escenario("resumen_portafolio")
+def resumen_portafolio(cliente, ctx: ContextoCarga, total: int):
+    """
+    Dashboard con /proyectos/resumen: avance de todos los proyectos en una
+    petición. Falla si el número de consultas SQL (Server-Timing) depende de
+    cuántos proyectos tiene el usuario (--proyectos).
+    """
+    esperados = ctx.extra.get("proyectos", 1)
+    consultas = ctx.extra.setdefault("consultas_resumen", set())
+
+    async def operacion():
+        respuesta = await _verificar(await cliente.get("/proyectos/resumen", headers=ctx.headers))
+        if len(respuesta.json()) != esperados:
+            raise RuntimeError(f"/proyectos/resumen devolvió {len(respuesta.json())} proyectos, se esperaban {esperados}")
+        encontrado = re.search(r"(\d+) consultas", respuesta.headers.get("server-timing", ""))
+        if encontrado:
+            consultas.add(int(encontrado.group(1)))
+            if int(encontrado.group(1)) > CONSULTAS_RESUMEN:
+                raise RuntimeError(f"/proyectos/resumen hizo {encontrado.group(1)} consultas con {esperados} proyectos")
+
+    return [operacion for _ in range(total)]
+
+
+@escenario("desplazar_tramo")
+def desplazar_tramo(cliente, ctx: ContextoCarga, total: int):
+    """Perfil que se desplaza por el cadenamiento: ventanas de 500 m con proyección de campos"""
+    rng = random.Random(ctx.semilla)
+    ancho = 500.0
+    campos = "estaciones.km,estaciones.base_cl,lecturas.division_transversal,lecturas.elv_base_real"
+
+    def operacion():
+        desde = rng.uniform(ctx.km_inicial, max(ctx.km_inicial, ctx.km_final - ancho))
+
+        async def pedir():
+            await _verificar(await cliente.get(
+                f"/proyectos/{ctx.proyecto_id}/tramo",
+                params={"km_desde": round(desde, 3), "km_hasta": round(desde + ancho, 3), "campos": campos},
+                headers=ctx.headers,
+            ))
+        return pedir
+
+    return [operacion() for _ in range(total)]
+
+
+@escenario("exportar")
+def exportar(cliente, ctx: ContextoCarga, total: int):
+    """Exportación: todas las estaciones y todas las lecturas del proyecto"""
+    limite_lecturas = len(ctx.medicion_ids) * len(ctx.divisiones)
+
+    async def operacion():
+        respuestas = await asyncio.gather(
+            cliente.get(f"/proyectos/{ctx.proyecto_id}/estaciones/",
+                        params={"limit": ctx.total_estaciones}, headers=ctx.headers),
+            cliente.get("/lecturas/", params={"proyecto_id": ctx.proyecto_id, "limit": limite_lecturas},
+                        headers=ctx.headers),
+        )
+        for respuesta in respuestas:
+            await _verificar(respuesta)
+
+    return [operacion for _ in range(total)]
+
+
+@escenario("cliente_desbocado")
+def cliente_desbocado(cliente, ctx: ContextoCarga, total: int):
+    """
+    Autosave de varias cuadrillas (una escritura en curso por cuadrilla, con
+    pausa de debounce) mientras una tableta de otro usuario envía POST /lecturas/
+    sin pausa e ignorando los 429. Mide sólo los POST de las cuadrillas; con
+    --limites la inundación no debería subir su cola de latencia.
+    """
+    rng = random.Random(ctx.semilla)
+    cuadrillas = ctx.extra["cuadrillas"]
+    desbocado = ctx.extra["desbocado"]
+    turnos = [asyncio.Lock() for _ in cuadrillas]
+    estado = {"pendientes": total, "inundacion": None, "fin": asyncio.Event(), "respuestas": {}}
+
+    async def inundar():
+        async def escribir():
+            while not estado["fin"].is_set():
+                respuesta = await cliente.post("/lecturas/", json={
+                    "medicion_id": rng.choice(desbocado["medicion_ids"]),
+                    "division_transversal": rng.choice(ctx.divisiones),
+                    "lectura_mira": round(rng.uniform(1.0, 3.0), 6),
+                    "calidad": "BUENA",
+                }, headers=desbocado["headers"])
+                codigo = respuesta.status_code
+                estado["respuestas"][codigo] = estado["respuestas"].get(codigo, 0) + 1
+        await asyncio.gather(*(escribir() for _ in range(32)))
+
+    def operacion(i):
+        cuadrilla = cuadrillas[i % len(cuadrillas)]
+        cuerpo = {
+            "medicion_id": rng.choice(cuadrilla["medicion_ids"]),
+            "division_transversal": rng.choice(ctx.divisiones),
+            "lectura_mira": round(rng.uniform(1.0, 3.0), 6),
+            "calidad": "BUENA",
+        }
+
+        async def enviar():
+            if estado["inundacion"] is None:
+                estado["inundacion"] = asyncio.ensure_future(inundar())
+            try:
+                async with turnos[i % len(cuadrillas)]:
+                    await asyncio.sleep(0.2)  # Debounce de Campo.jsx
+                    inicio = time.perf_counter()
+                    await _verificar(await cliente.post("/lecturas/", json=cuerpo, headers=cuadrilla["headers"]))
+                    return time.perf_counter() - inicio
+            finally:
+                estado["pendientes"] -= 1
+                if estado["pendientes"] == 0:
+                    estado["fin"].set()
+                    await estado["inundacion"]
+                    ctx.extra["respuestas_desbocado"] = estado["respuestas"]
+        return enviar
+
+    return [operacion(i) for i in range(total)]
+
+
+@escenario("autosave_con_recalculo")
+def autosave_con_recalculo(cliente, ctx: ContextoCarga, total: int):
+    """
+    Autosave de varias cuadrillas mientras el dueño del proyecto grande lanza
+    recálculos completos de alertas uno tras otro. Mide sólo los POST de las
+    cuadrillas; con el pool de cálculo (CALCULO_PROCESOS > 0) el recálculo no
+    retiene el GIL del worker y su cola de latencia no debería subir.
+    """
+    rng = random.Random(ctx.semilla)
+    cuadrillas = ctx.extra["cuadrillas"]
+    turnos = [asyncio.Lock() for _ in cuadrillas]
+    estado = {"pendientes": total, "recalculo": None, "fin": asyncio.Event(), "recalculos": []}
+
+    async def recalcular():
+        while not estado["fin"].is_set():
+            inicio = time.perf_counter()
+            await _verificar(await cliente.post(f"/proyectos/{ctx.proyecto_id}/alertas/recalcular", headers=ctx.headers))
+            estado["recalculos"].append(time.perf_counter() - inicio)
+
+    def operacion(i):
+        cuadrilla = cuadrillas[i % len(cuadrillas)]
+        cuerpo = {
+            "medicion_id": rng.choice(cuadrilla["medicion_ids"]),
+            "division_transversal": rng.choice(ctx.divisiones),
+            "lectura_mira": round(rng.uniform(1.0, 3.0), 6),
+            "calidad": "BUENA",
+        }
+
+        async def enviar():
+            if estado["recalculo"] is None:
+                estado["recalculo"] = asyncio.ensure_future(recalcular())
+            try:
+                async with turnos[i % len(cuadrillas)]:
+                    await asyncio.sleep(0.2)  # Debounce de Campo.jsx
+                    inicio = time.perf_counter()
+                    await _verificar(await cliente.post("/lecturas/", json=cuerpo, headers=cuadrilla["headers"]))
+                    return time.perf_counter() - inicio
+            finally:
+                estado["pendientes"] -= 1
+                if estado["pendientes"] == 0:
+                    estado["fin"].set()
+                    await estado["recalculo"]
+                    ctx.extra["recalculos"] = estado["recalculos"]
+        return enviar
+
+    return [operacion(i) for i in range(total)]
+
+
+async def ejecutar_carga(cliente, ctx: ContextoCarga, total: int, concurrencia: int, filtro: str = None):
+    resultados = []
+    for nombre, construir in ESCENARIOS.items():
+        if filtro and filtro not in nombre:
+            continue
+        operaciones = construir(cliente, ctx, total)
+        latencias, errores, duracion = await ejecutar_operaciones(operaciones, concurrencia)
+        resultados.append(resumir(
+            nombre, latencias, duracion,
+            errores=len(errores),
+            extra={"concurrencia": concurrencia, "muestra_errores": errores[:3]}
+        ))
+    return resultados
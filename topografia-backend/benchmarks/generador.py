@@ -0,0 +1,160 @@
+"""
+Generador de proyectos sintéticos para benchmarks.
+
+Produce un Proyecto con sus estaciones teóricas, mediciones y lecturas usando
+inserciones masivas, de modo que generar decenas de miles de filas tarde
+segundos. La generación es determinista para una semilla dada.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import List
+import random
+import uuid
+
+from sqlalchemy import insert
+
+from models.proyecto import Proyecto
+from models.estacion import EstacionTeorica
+from models.medicion import MedicionEstacion
+from models.lectura import LecturaDivision
+
+# Tamaño de los lotes de inserción masiva
+TAMANO_LOTE = 5000
+
+
+@dataclass
+class ConfigSintetica:
+    """Parámetros del proyecto sintético"""
+    longitud_km: float = 1.0
+    km_inicial: float = 0.0
+    intervalo: float = 5.0
+    divisiones_izquierdas: List[float] = field(
+        default_factory=lambda: [-12.21, -10.7, -9, -6, -3, -1.3, 0]
+    )
+    divisiones_derechas: List[float] = field(
+        default_factory=lambda: [1.3, 3, 6, 9, 10.7, 12.21]
+    )
+    relleno: float = 0.5  # Fracción de estaciones con medición de campo
+    semilla: int = 42
+
+    @property
+    def km_final(self) -> float:
+        return self.km_inicial + self.longitud_km * 1000
+
+    @property
+    def total_estaciones(self) -> int:
+        return int(round(self.longitud_km * 1000 / self.intervalo)) + 1
+
+    def como_dict(self) -> dict:
+        return {
+            "longitud_km": self.longitud_km,
+            "km_inicial": self.km_inicial,
+            "intervalo": self.intervalo,
+            "divisiones": len(self.divisiones_izquierdas) + len(self.divisiones_derechas),
+            "relleno": self.relleno,
+            "semilla": self.semilla,
+        }
+
+
+def _d(valor: float, decimales: int) -> Decimal:
+    return Decimal(f"{valor:.{decimales}f}")
+
+
+def _insertar_por_lotes(db, modelo, filas):
+    for inicio in range(0, len(filas), TAMANO_LOTE):
+        db.execute(insert(modelo), filas[inicio:inicio + TAMANO_LOTE])
+
+
+def generar_proyecto(db, usuario_id: str, config: ConfigSintetica = None) -> int:
+    """
+    Crea un proyecto sintético completo y devuelve su id.
+
+    Cada estación teórica tiene una rasante con pendiente longitudinal suave;
+    una fracción `relleno` de ellas recibe una medición con una lectura por
+    división, con ruido de unos milímetros respecto al proyecto.
+    """
+    config = config or ConfigSintetica()
+    rng = random.Random(config.semilla)
+    divisiones = list(config.divisiones_izquierdas) + list(config.divisiones_derechas)
+
+    proyecto = Proyecto(
+        usuario_id=uuid.UUID(usuario_id),
+        nombre=f"Sintético {config.longitud_km:g} km",
+        tramo="BENCH",
+        cuerpo="A",
+        km_inicial=_d(config.km_inicial, 3),
+        km_final=_d(config.km_final, 3),
+        intervalo=_d(config.intervalo, 3),
+        espesor=Decimal("0.25"),
+        tolerancia_sct=Decimal("0.005"),
+        divisiones_izquierdas=list(config.divisiones_izquierdas),
+        divisiones_derechas=list(config.divisiones_derechas),
+        encargados=[],
+        estado="ACTIVO",
+    )
+    db.add(proyecto)
+    db.flush()
+
+    estaciones = []
+    rasantes = []
+    for i in range(config.total_estaciones):
+        km = config.km_inicial + i * config.intervalo
+        base_cl = 1886.140 + 0.003 * (km - config.km_inicial)
+        rasantes.append((km, base_cl))
+        estaciones.append({
+            "proyecto_id": proyecto.id,
+            "km": _d(km, 3),
+            "pendiente_derecha": Decimal("0.020000"),
+            "base_cl": _d(base_cl, 6),
+        })
+    _insertar_por_lotes(db, EstacionTeorica, estaciones)
+
+    medidas = [r for r in rasantes if rng.random() < config.relleno]
+    mediciones = []
+    for km, base_cl in medidas:
+        mediciones.append({
+            "proyecto_id": proyecto.id,
+            "estacion_km": _d(km, 3),
+            "bn_altura": _d(base_cl + rng.uniform(0.5, 1.5), 6),
+            "bn_lectura": _d(rng.uniform(1.0, 1.8), 6),
+            "operador": "bench",
+        })
+
+    medicion_ids = []
+    for inicio in range(0, len(mediciones), TAMANO_LOTE):
+        medicion_ids.extend(db.scalars(
+            insert(MedicionEstacion).returning(MedicionEstacion.id, sort_by_parameter_order=True),
+            mediciones[inicio:inicio + TAMANO_LOTE]
+        ).all())
+
+    lecturas = []
+    for medicion_id, fila, (km, base_cl) in zip(medicion_ids, mediciones, medidas):
+        altura_aparato = fila["bn_altura"] + fila["bn_lectura"]
+        for division in divisiones:
+            pendiente = 0.02 if division >= 0 else -0.02
+            elv_proyecto = base_cl - abs(division) * abs(pendiente)
+            lectura_mira = _d(float(altura_aparato) - elv_proyecto + rng.gauss(0, 0.004), 6)
+            lecturas.append({
+                "medicion_id": medicion_id,
+                "proyecto_id": proyecto.id,
+                "division_transversal": _d(division, 3),
+                "lectura_mira": lectura_mira,
+                "elv_base_real": altura_aparato - lectura_mira,
+                "calidad": "BUENA",
+            })
+    _insertar_por_lotes(db, LecturaDivision, lecturas)
+
+    db.commit()
+    return proyecto.id
+
+
+def divisiones_simetricas(cantidad: int, semiancho: float = 12.21):
+    """
+    Reparte `cantidad` divisiones transversales entre ambos lados del eje.
+    El eje (0) queda del lado izquierdo, como en la configuración por defecto.
+    """
+    por_lado = max(cantidad // 2, 1)
+    paso = semiancho / por_lado
+    derechas = [round(paso * (i + 1), 3) for i in range(por_lado)]
+    izquierdas = [-d for d in reversed(derechas[:cantidad - por_lado - 1])] + [0.0]
+    return izquierdas, derechas
@@ -0,0 +1,169 @@
+"""
+Micro-benchmarks de las rutas de cálculo.
+
+Cada benchmark se registra con @micro y recibe el Contexto; hace su
+preparación y devuelve la operación (sin argumentos) que se va a cronometrar.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable, Dict
+import time
+
+import numpy as np
+
+from benchmarks.generador import ConfigSintetica
+from benchmarks.resultados import resumir
+
+
+@dataclass
+class Contexto:
+    """Estado compartido por los benchmarks de una corrida"""
+    SessionLocal: Callable
+    proyecto_id: int
+    usuario_id: str
+    config: ConfigSintetica
+
+
+MICRO_BENCHMARKS: Dict[str, Callable] = {}
+
+
+def micro(nombre: str):
+    """Registra un micro-benchmark bajo `nombre`"""
+    def registrar(funcion):
+        MICRO_BENCHMARKS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def ejecutar_micro(ctx: Contexto, repeticiones: int = 50, calentamiento: int = 3, filtro: str = None):
+    resultados = []
+    for nombre, preparar in MICRO_BENCHMARKS.items():
+        if filtro and filtro not in nombre:
+            continue
+        operacion = preparar(ctx)
+        for _ in range(calentamiento):
+            operacion()
+
+        latencias = []
+        inicio_total = time.perf_counter()
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            operacion()
+            latencias.append(time.perf_counter() - inicio)
+        resultados.append(resumir(nombre, latencias, time.perf_counter() - inicio_total))
+    return resultados
+
+
+def _proyecto(db, ctx):
+    from models.proyecto import Proyecto
+    return db.query(Proyecto).filter(Proyecto.id == ctx.proyecto_id).first()
+
+
+@micro("calculo.elv_base_real_decimal")
+def bench_elv_base_real(ctx: Contexto):
+    """Resta Decimal altura_aparato - lectura_mira por elemento sobre todo el proyecto (referencia)"""
+    from models.lectura import LecturaDivision
+    from models.medicion import MedicionEstacion
+
+    with ctx.SessionLocal() as db:
+        pares = db.query(MedicionEstacion.altura_aparato, LecturaDivision.lectura_mira).join(
+            LecturaDivision, LecturaDivision.medicion_id == MedicionEstacion.id
+        ).filter(MedicionEstacion.proyecto_id == ctx.proyecto_id).all()
+
+    def operacion():
+        return [Decimal(altura) - Decimal(lectura) for altura, lectura in pares]
+    return operacion
+
+
+@micro("calculo.elv_base_real_punto_fijo")
+def bench_elv_base_real_punto_fijo(ctx: Contexto):
+    """
+    La misma resta con services/punto_fijo.py: la consulta devuelve micras
+    enteras (conversión exacta en la base de datos) y la resta es int64 vectorizada
+    """
+    from models.lectura import LecturaDivision
+    from models.medicion import MedicionEstacion
+    from services import punto_fijo
+
+    with ctx.SessionLocal() as db:
+        pares = db.query(
+            punto_fijo.columna(MedicionEstacion.altura_aparato, punto_fijo.MICRAS),
+            punto_fijo.columna(LecturaDivision.lectura_mira, punto_fijo.MICRAS),
+        ).join(
+            LecturaDivision, LecturaDivision.medicion_id == MedicionEstacion.id
+        ).filter(MedicionEstacion.proyecto_id == ctx.proyecto_id).all()
+    matriz = np.array(pares, dtype=np.int64).reshape(-1, 2)
+
+    def operacion():
+        return matriz[:, 0] - matriz[:, 1]
+    return operacion
+
+
+@micro("calculo.generacion_km_estaciones")
+def bench_generacion_km(ctx: Contexto):
+    """Bucle de km con float que usaba create_proyecto_completo (referencia), sin tocar la base de datos"""
+    from models.estacion import EstacionTeorica
+
+    km_inicial = ctx.config.km_inicial
+    km_final = ctx.config.km_final
+    intervalo = ctx.config.intervalo
+
+    def operacion():
+        estaciones = []
+        km_actual = km_inicial
+        while km_actual <= km_final:
+            estaciones.append(EstacionTeorica(
+                proyecto_id=ctx.proyecto_id,
+                km=Decimal(str(km_actual)),
+                pendiente_derecha=Decimal('0.02'),
+                base_cl=Decimal('1886.140'),
+            ))
+            km_actual += intervalo
+        return estaciones
+    return operacion
+
+
+@micro("calculo.km_estaciones_punto_fijo")
+def bench_km_estaciones_punto_fijo(ctx: Contexto):
+    """Km en milímetros enteros y filas para el INSERT de create_proyecto_completo"""
+    from services import punto_fijo
+    from services.alineamiento import km_estaciones
+
+    km_inicial = Decimal(str(ctx.config.km_inicial))
+    km_final = Decimal(str(ctx.config.km_final))
+    intervalo = Decimal(str(ctx.config.intervalo))
+
+    def operacion():
+        kms = km_estaciones(km_inicial, km_final, intervalo)
+        return [
+            {"proyecto_id": ctx.proyecto_id, "km": km,
+             "pendiente_derecha": Decimal('0.020000'), "base_cl": Decimal('1886.140000')}
+            for km in punto_fijo.a_decimales(kms, punto_fijo.MILIMETROS)
+        ]
+    return operacion
+
+
+@micro("serializacion.estaciones_proyecto")
+def bench_estaciones_proyecto(ctx: Contexto):
+    """Consulta y construcción de dicts de get_estaciones_proyecto"""
+    from routers.proyectos import get_estaciones_proyecto
+
+    limite = ctx.config.total_estaciones
+
+    def operacion():
+        with ctx.SessionLocal() as db:
+            return get_estaciones_proyecto(skip=0, limit=limite, proyecto=_proyecto(db, ctx), db=db)
+    return operacion
+
+
+@micro("serializacion.mediciones_proyecto")
+def bench_mediciones_proyecto(ctx: Contexto):
+    """Consulta y construcción de dicts de get_mediciones_proyecto"""
+    from routers.proyectos import get_mediciones_proyecto
+
+    limite = ctx.config.total_estaciones
+
+    def operacion():
+        with ctx.SessionLocal() as db:
+            return get_mediciones_proyecto(skip=0, limit=limite, proyecto=_proyecto(db, ctx), db=db)
+    return operacion
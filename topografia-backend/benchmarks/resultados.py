@@ -0,0 +1,100 @@
+"""
+Resumen estadístico, persistencia en JSON y comparación de resultados.
+"""
+from datetime import datetime
+from typing import List
+import json
+import os
+import platform
+import subprocess
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    """Percentil con interpolación lineal sobre una lista ya ordenada"""
+    if not ordenados:
+        return 0.0
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    fraccion = posicion - inferior
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * fraccion
+
+
+def resumir(nombre: str, latencias: List[float], duracion: float, errores: int = 0, extra: dict = None) -> dict:
+    """
+    Resume una serie de latencias (en segundos) en p50/p95/p99 (en ms)
+    y throughput (operaciones por segundo).
+    """
+    ordenados = sorted(latencias)
+    resultado = {
+        "nombre": nombre,
+        "operaciones": len(ordenados),
+        "errores": errores,
+        "duracion_s": round(duracion, 4),
+        "throughput_ops": round(len(ordenados) / duracion, 2) if duracion > 0 else 0.0,
+        "p50_ms": round(percentil(ordenados, 50) * 1000, 3),
+        "p95_ms": round(percentil(ordenados, 95) * 1000, 3),
+        "p99_ms": round(percentil(ordenados, 99) * 1000, 3),
+        "max_ms": round(ordenados[-1] * 1000, 3) if ordenados else 0.0,
+    }
+    if extra:
+        resultado.update(extra)
+    return resultado
+
+
+def _commit_actual() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).decode().strip()
+    except Exception:
+        return "desconocido"
+
+
+def metadatos(url_db: str, config: dict) -> dict:
+    """Información del entorno necesaria para que dos corridas sean comparables"""
+    return {
+        "commit": _commit_actual(),
+        "fecha": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "base_datos": url_db.split(":", 1)[0],
+        "proyecto_sintetico": config,
+    }
+
+
+def guardar(informe: dict, ruta: str):
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+
+
+def cargar(ruta: str) -> dict:
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def comparar(base: dict, actual: dict, umbral: float = 0.10) -> List[dict]:
+    """
+    Compara dos informes por nombre de benchmark. Marca como regresión
+    cualquier p95 que empeore más del `umbral` relativo.
+    """
+    previos = {r["nombre"]: r for r in base.get("resultados", [])}
+    filas = []
+    for resultado in actual.get("resultados", []):
+        previo = previos.get(resultado["nombre"])
+        if not previo or not previo["p95_ms"]:
+            continue
+        cambio = (resultado["p95_ms"] - previo["p95_ms"]) / previo["p95_ms"]
+        filas.append({
+            "nombre": resultado["nombre"],
+            "p95_base_ms": previo["p95_ms"],
+            "p95_actual_ms": resultado["p95_ms"],
+            "cambio": round(cambio, 4),
+            "regresion": cambio > umbral,
+        })
+    return filas
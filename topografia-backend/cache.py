@@ -0,0 +1,291 @@
+"""
+Caché compartida con backends intercambiables.
+
+- "memoria": LRU en proceso con límite de entradas y expiración por TTL.
+- "redis": almacén compartido por todos los workers (protocolo Redis; en
+  pruebas se puede pasar un cliente compatible como fakeredis). Los valores
+  se guardan como JSON (los bytes tal cual): sólo se cachean datos planos y
+  nada leído de Redis se ejecuta al deserializarlo.
+
+Las entradas pueden etiquetarse con un proyecto_id. `invalidar_proyecto`
+elimina todas las entradas de ese proyecto y, si hay REDIS_URL configurada,
+publica la invalidación para que los demás workers descarten también sus
+copias locales. Así ninguna escritura deja datos obsoletos en otro proceso.
+
+Aparte, `cache.respuestas` guarda respuestas JSON ya codificadas en memoria
+del proceso, con límite en bytes (ver services/respuestas.py).
+"""
+from collections import OrderedDict
+from typing import Any, Optional
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+CANAL_INVALIDACION = "topografia:invalidaciones"
+_PREFIJO = "topografia:cache:"
+# Marca de los valores bytes en Redis; un JSON nunca empieza por este byte
+_MARCA_BYTES = b"\x00"
+
+
+class MemoriaLRU:
+    """LRU en proceso, segura entre hilos, con TTL por entrada"""
+
+    def __init__(self, max_entradas: int = 10000):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()  # clave -> (expira, valor, proyecto_id)
+        self._por_proyecto = {}  # proyecto_id -> set de claves
+        self._candado = threading.Lock()
+
+    def _quitar(self, clave):
+        _, _, proyecto_id = self._datos.pop(clave)
+        if proyecto_id is not None:
+            claves = self._por_proyecto.get(proyecto_id)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._por_proyecto[proyecto_id]
+
+    def get(self, clave: str) -> Optional[Any]:
+        with self._candado:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            if entrada[0] < time.monotonic():
+                self._quitar(clave)
+                return None
+            self._datos.move_to_end(clave)
+            return entrada[1]
+
+    def set(self, clave: str, valor: Any, ttl: float, proyecto_id: int = None):
+        with self._candado:
+            if clave in self._datos:
+                self._quitar(clave)
+            self._datos[clave] = (time.monotonic() + ttl, valor, proyecto_id)
+            if proyecto_id is not None:
+                self._por_proyecto.setdefault(proyecto_id, set()).add(clave)
+            while len(self._datos) > self.max_entradas:
+                self._quitar(next(iter(self._datos)))
+
+    def delete(self, clave: str):
+        with self._candado:
+            if clave in self._datos:
+                self._quitar(clave)
+
+    def invalidar_proyecto(self, proyecto_id: int):
+        with self._candado:
+            for clave in list(self._por_proyecto.get(proyecto_id, ())):
+                self._quitar(clave)
+
+    def limpiar(self):
+        with self._candado:
+            self._datos.clear()
+            self._por_proyecto.clear()
+
+
+class RespuestasLRU:
+    """
+    Cuerpos de respuesta (bytes) por proceso, etiquetados por proyecto. El
+    límite es de bytes y no de entradas: las estaciones de un tramo de 20 km
+    pesan lo que cientos de proyectos pequeños.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._datos = OrderedDict()  # clave -> (cuerpo, proyecto_id)
+        self._por_proyecto = {}  # proyecto_id -> set de claves
+        self._candado = threading.Lock()
+
+    def _quitar(self, clave):
+        cuerpo, proyecto_id = self._datos.pop(clave)
+        self.bytes -= len(cuerpo)
+        claves = self._por_proyecto.get(proyecto_id)
+        if claves is not None:
+            claves.discard(clave)
+            if not claves:
+                del self._por_proyecto[proyecto_id]
+
+    def get(self, clave: str) -> Optional[bytes]:
+        with self._candado:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            self._datos.move_to_end(clave)
+            return entrada[0]
+
+    def set(self, clave: str, cuerpo: bytes, proyecto_id: int):
+        # Una sola respuesta no puede desplazar más de una cuarta parte de la caché
+        if len(cuerpo) > self.max_bytes // 4:
+            return
+        with self._candado:
+            if clave in self._datos:
+                self._quitar(clave)
+            self._datos[clave] = (cuerpo, proyecto_id)
+            self._por_proyecto.setdefault(proyecto_id, set()).add(clave)
+            self.bytes += len(cuerpo)
+            while self.bytes > self.max_bytes:
+                self._quitar(next(iter(self._datos)))
+
+    def invalidar_proyecto(self, proyecto_id: int):
+        with self._candado:
+            for clave in list(self._por_proyecto.get(proyecto_id, ())):
+                self._quitar(clave)
+
+    def limpiar(self):
+        with self._candado:
+            self._datos.clear()
+            self._por_proyecto.clear()
+            self.bytes = 0
+
+
+class RedisBackend:
+    """Almacén compartido en Redis; los valores se serializan como JSON"""
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    @staticmethod
+    def _serializar(valor: Any) -> bytes:
+        if isinstance(valor, bytes):
+            return _MARCA_BYTES + valor
+        return json.dumps(valor, separators=(",", ":")).encode()
+
+    @staticmethod
+    def _deserializar(crudo: bytes) -> Any:
+        if crudo.startswith(_MARCA_BYTES):
+            return crudo[len(_MARCA_BYTES):]
+        return json.loads(crudo)
+
+    @staticmethod
+    def _etiqueta(proyecto_id: int) -> str:
+        return f"{_PREFIJO}proyecto:{proyecto_id}"
+
+    def get(self, clave: str) -> Optional[Any]:
+        crudo = self.cliente.get(_PREFIJO + clave)
+        return self._deserializar(crudo) if crudo is not None else None
+
+    def set(self, clave: str, valor: Any, ttl: float, proyecto_id: int = None):
+        ttl_ms = max(int(ttl * 1000), 1)
+        pipe = self.cliente.pipeline()
+        pipe.set(_PREFIJO + clave, self._serializar(valor), px=ttl_ms)
+        if proyecto_id is not None:
+            etiqueta = self._etiqueta(proyecto_id)
+            pipe.sadd(etiqueta, _PREFIJO + clave)
+            # La etiqueta vive al menos tanto como la entrada más reciente
+            pipe.pexpire(etiqueta, ttl_ms, gt=True)
+            pipe.pexpire(etiqueta, ttl_ms, nx=True)
+        pipe.execute()
+
+    def delete(self, clave: str):
+        self.cliente.delete(_PREFIJO + clave)
+
+    def invalidar_proyecto(self, proyecto_id: int):
+        etiqueta = self._etiqueta(proyecto_id)
+        claves = self.cliente.smembers(etiqueta)
+        self.cliente.delete(etiqueta, *claves)
+
+    def limpiar(self):
+        claves = list(self.cliente.scan_iter(f"{_PREFIJO}*"))
+        if claves:
+            self.cliente.delete(*claves)
+
+
+class Cache:
+    """
+    Punto de acceso único. Cada uso crea un espacio de nombres con su TTL:
+
+        tokens = cache.espacio("token", ttl=60)
+        tokens.set(clave, valor)
+    """
+
+    def __init__(self, backend, cliente_pubsub=None):
+        self.backend = backend
+        self.respuestas = RespuestasLRU(settings.respuestas_max_bytes)
+        # Identifica a este worker para ignorar sus propias invalidaciones
+        self._origen = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._cliente_pubsub = cliente_pubsub
+        self._hilo_pubsub = None
+        if cliente_pubsub is not None:
+            self._suscribirse()
+
+    def espacio(self, nombre: str, ttl: float = None) -> "EspacioCache":
+        return EspacioCache(self, nombre, ttl if ttl is not None else settings.cache_ttl_segundos)
+
+    def invalidar_proyecto(self, proyecto_id: int):
+        """Invalida en este proceso y avisa a los demás workers"""
+        self.backend.invalidar_proyecto(proyecto_id)
+        self.respuestas.invalidar_proyecto(proyecto_id)
+        if self._cliente_pubsub is not None:
+            try:
+                self._cliente_pubsub.publish(CANAL_INVALIDACION, json.dumps({
+                    "proyecto_id": proyecto_id,
+                    "origen": self._origen,
+                }))
+            except Exception as e:
+                logger.error(f"No se pudo publicar la invalidación del proyecto {proyecto_id}: {e}")
+
+    def _al_recibir(self, mensaje):
+        try:
+            datos = json.loads(mensaje["data"])
+        except (TypeError, ValueError):
+            return
+        if datos.get("origen") != self._origen:
+            self.backend.invalidar_proyecto(datos["proyecto_id"])
+            self.respuestas.invalidar_proyecto(datos["proyecto_id"])
+
+    def _suscribirse(self):
+        pubsub = self._cliente_pubsub.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{CANAL_INVALIDACION: self._al_recibir})
+        self._hilo_pubsub = pubsub.run_in_thread(sleep_time=0.5, daemon=True)
+
+
+class EspacioCache:
+    """Vista de la caché con prefijo y TTL propios"""
+
+    def __init__(self, cache: Cache, nombre: str, ttl: float):
+        self.cache = cache
+        self.nombre = nombre
+        self.ttl = ttl
+
+    def _clave(self, clave) -> str:
+        return f"{self.nombre}:{clave}"
+
+    def get(self, clave) -> Optional[Any]:
+        return self.cache.backend.get(self._clave(clave))
+
+    def set(self, clave, valor, ttl: float = None, proyecto_id: int = None):
+        self.cache.backend.set(self._clave(clave), valor, ttl if ttl is not None else self.ttl, proyecto_id)
+
+    def delete(self, clave):
+        self.cache.backend.delete(self._clave(clave))
+
+
+def crear_cache(backend: str = None, redis_url: str = None, cliente_redis=None) -> Cache:
+    """
+    Construye la caché según la configuración. `cliente_redis` permite
+    inyectar un cliente compatible (p. ej. fakeredis) sin servidor real.
+    """
+    backend = backend or settings.cache_backend
+    redis_url = redis_url if redis_url is not None else settings.redis_url
+
+    if cliente_redis is None and redis_url:
+        import redis
+        cliente_redis = redis.Redis.from_url(redis_url)
+
+    if backend == "redis":
+        if cliente_redis is None:
+            raise ValueError("CACHE_BACKEND=redis requiere REDIS_URL")
+        return Cache(RedisBackend(cliente_redis), cliente_pubsub=cliente_redis)
+
+    # LRU por proceso; si hay Redis se usa sólo como bus de invalidación
+    return Cache(MemoriaLRU(settings.cache_max_entradas), cliente_pubsub=cliente_redis)
+
+
+cache = crear_cache()
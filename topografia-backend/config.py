@@ -10,6 +10,9 @@ class Settings(BaseSettings):
     # Configuración de base de datos
     database_url: str
     database_password: str = ""
+    # Réplica de lectura opcional para los GET; vacía = todo va al primario
+    database_read_url: str = ""
+    replica_fijar_segundos: float = 5.0  # Tras escribir, el usuario lee del primario este tiempo
     
     # Configuración de Supabase
     supabase_url: str
@@ -22,6 +25,55 @@ class Settings(BaseSettings):
     secret_key: str = "dev-secret-key"
     log_level: str = "INFO"
     
+    # Administración: emails (separados por comas) con acceso a /admin
+    admin_emails: str = ""
+    
+    # Registro de consultas lentas
+    slow_query_threshold_ms: float = 500.0
+    slow_query_sample_rate: float = 1.0  # Fracción de consultas lentas que se registran
+    slow_query_buffer_size: int = 200
+    slow_query_explain: bool = True  # Capturar EXPLAIN (ANALYZE, BUFFERS) de las registradas
+    
+    # Caché compartida: "memoria" (LRU por worker) o "redis" (compartida, Redis >= 7)
+    cache_backend: str = "memoria"
+    redis_url: str = ""  # Con backend "memoria" se usa sólo para propagar invalidaciones
+    cache_max_entradas: int = 10000
+    cache_ttl_segundos: float = 60.0
+    acceso_ttl_segundos: float = 30.0  # Propiedad de proyectos/mediciones y perfiles
+    plantillas_max: int = 512  # Plantillas de sección transversal en memoria por worker
+    respuestas_max_bytes: int = 64 * 1024 * 1024  # Respuestas JSON de proyecto ya codificadas, por worker
+    
+    # Contención de escrituras por usuario y worker (0 desactiva cada límite)
+    escritura_tasa: float = 10.0  # Escrituras por segundo sostenidas
+    escritura_rafaga: int = 30  # Escrituras seguidas permitidas antes de limitar
+    escritura_concurrencia: int = 4  # Escrituras simultáneas
+    
+    # Purga en segundo plano de proyectos eliminados (filas de lecturas por transacción)
+    purga_lote: int = 5000
+    
+    # Pool de procesos para cálculos que usan CPU (procesos.py); 0 = en el hilo de la petición
+    calculo_procesos: int = 2  # Procesos por worker
+    calculo_cola: int = 8  # Trabajos en espera antes de responder 503
+    calculo_timeout_segundos: float = 120.0
+    calculo_umbral_lecturas: int = 20000  # Recálculos de alertas más grandes van al pool
+    
+    # Espera antes de recalcular las alertas de una medición tras sus escrituras
+    alertas_espera_segundos: float = 0.5
+    
+    # Reportes de liberación generados en el servidor (PDF/XLSX), renderizados en el pool
+    reportes_timeout_segundos: float = 300.0
+    
+    # POST /batch: sub-peticiones por lote
+    lote_max_peticiones: int = 50
+    
+    # Ventana máxima (en metros de cadenamiento) de GET /proyectos/{id}/tramo
+    tramo_max_metros: float = 5000.0
+    
+    # Perfilado de peticiones (cabecera X-Profile para admins o muestreo)
+    profiling_sample_rate: float = 0.0  # Dejar en 0 en producción
+    profiling_buffer_size: int = 50
+    profiling_top_n: int = 30
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from contextvars import ContextVar
 import os
 from dotenv import load_dotenv
 
@@ -22,9 +24,47 @@ engine = create_engine(
     echo=False,  # Cambia a True para debug de SQL queries
 )
 
+# Registro muestreado de consultas lentas (con EXPLAIN en segundo plano)
+from slow_queries import instalar_registro_consultas_lentas
+instalar_registro_consultas_lentas(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Réplica de lectura opcional (p. ej. réplica de lectura de Supabase). Sin
+# DATABASE_READ_URL las sesiones de lectura usan el mismo engine del primario.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
+if DATABASE_READ_URL:
+    read_engine = create_engine(
+        DATABASE_READ_URL,
+        pool_pre_ping=True,
+        echo=False,
+    )
+    instalar_registro_consultas_lentas(read_engine)
+else:
+    read_engine = engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
+def insert_con_conflicto(db, modelo):
+    """
+    INSERT del dialecto de la sesión, con soporte para ON CONFLICT ... DO UPDATE.
+    PostgreSQL en producción; SQLite sólo en los benchmarks locales.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(modelo)
+    return postgresql.insert(modelo)
+
+# Sesión compartida por las sub-peticiones de POST /batch (routers/lotes.py):
+# mientras está fijada, get_db y get_read_db la devuelven en lugar de abrir otra
+sesion_lote: ContextVar = ContextVar("sesion_lote", default=None)
+
+def en_transaccion_de_lote() -> bool:
+    """Hay un lote transaccional en curso: lo que se lee aún puede deshacerse"""
+    db = sesion_lote.get()
+    return db is not None and db.info.get("transaccion_lote", False)
+
 def get_db():
     """
     Generador de sesiones de base de datos. Esta función se usa como dependencia
@@ -32,7 +72,12 @@ def get_db():
     
     El patrón try/finally asegura que la sesión se cierre correctamente
     incluso si ocurre una excepción durante el procesamiento.
+    Dentro de un lote se usa la sesión del lote, que cierra quien la abrió.
     """
+    compartida = sesion_lote.get()
+    if compartida is not None:
+        yield compartida
+        return
     db = SessionLocal()
     try:
         yield db
@@ -1,10 +1,125 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, SessionLocal, ReadSessionLocal, sesion_lote
 from auth import get_supabase_user, CurrentUser
 from models.usuario import PerfilUsuario
 from models.proyecto import Proyecto
+from models.medicion import MedicionEstacion
+from config import settings
+from cache import cache
+from metrics import ESCRITURAS_LIMITADAS
+from typing import Optional
+from datetime import datetime
 import uuid
+import limites
+import replica
+
+# Caché de propiedad: (usuario, proyecto) -> permitido y (usuario, medición) -> proyecto_id.
+# Dos niveles: db.info (dura lo que la request) y la caché compartida con TTL corto.
+# Las entradas se etiquetan con el proyecto para que borrarlo o transferirlo las invalide.
+_acceso = cache.espacio("acceso", ttl=settings.acceso_ttl_segundos)
+_perfiles = cache.espacio("perfil", ttl=settings.acceso_ttl_segundos)
+
+# Marca de "medición denegada" (0 nunca es un proyecto_id válido)
+_DENEGADO = 0
+
+def _acceso_en_peticion(db: Session) -> dict:
+    return db.info.setdefault("acceso", {})
+
+def usuario_tiene_proyecto(db: Session, usuario_id: str, proyecto_id: int) -> bool:
+    """Indica si el proyecto pertenece al usuario, sin join en caso de acierto"""
+    clave = f"proyecto:{usuario_id}:{proyecto_id}"
+    local = _acceso_en_peticion(db)
+    if clave in local:
+        return local[clave]
+    
+    permitido = _acceso.get(clave)
+    if permitido is None:
+        permitido = db.query(Proyecto.id).filter(
+            Proyecto.id == proyecto_id,
+            Proyecto.usuario_id == usuario_id,
+            Proyecto.eliminado_en.is_(None)
+        ).first() is not None
+        _acceso.set(clave, permitido, proyecto_id=proyecto_id)
+    
+    local[clave] = permitido
+    return permitido
+
+def obtener_medicion_autorizada(db: Session, usuario_id: str, medicion_id: int) -> Optional[MedicionEstacion]:
+    """
+    Devuelve la medición si pertenece a un proyecto del usuario, o None.
+    Con la propiedad ya en caché es una lectura por clave primaria sin join.
+    """
+    clave = f"medicion:{usuario_id}:{medicion_id}"
+    local = _acceso_en_peticion(db)
+    proyecto_id = local.get(clave)
+    if proyecto_id is None:
+        proyecto_id = _acceso.get(clave)
+    
+    if proyecto_id == _DENEGADO:
+        return None
+    if proyecto_id is not None:
+        local[clave] = proyecto_id
+        return db.get(MedicionEstacion, medicion_id)
+    
+    medicion = db.query(MedicionEstacion).join(Proyecto).filter(
+        MedicionEstacion.id == medicion_id,
+        Proyecto.usuario_id == usuario_id,
+        Proyecto.eliminado_en.is_(None)
+    ).first()
+    registrar_medicion(db, usuario_id, medicion_id, medicion.proyecto_id if medicion else _DENEGADO)
+    return medicion
+
+def proyecto_de_medicion(db: Session, usuario_id: str, medicion_id: int) -> Optional[int]:
+    """proyecto_id de la medición si pertenece al usuario, o None; en caso de acierto no consulta"""
+    clave = f"medicion:{usuario_id}:{medicion_id}"
+    proyecto_id = _acceso_en_peticion(db).get(clave)
+    if proyecto_id is None:
+        proyecto_id = _acceso.get(clave)
+    if proyecto_id is None:
+        medicion = obtener_medicion_autorizada(db, usuario_id, medicion_id)
+        return medicion.proyecto_id if medicion else None
+    _acceso_en_peticion(db)[clave] = proyecto_id
+    return proyecto_id if proyecto_id != _DENEGADO else None
+
+def medicion_autorizada(db: Session, usuario_id: str, medicion_id: int) -> bool:
+    """Como obtener_medicion_autorizada, pero en caso de acierto no consulta la base de datos"""
+    return proyecto_de_medicion(db, usuario_id, medicion_id) is not None
+
+def registrar_medicion(db: Session, usuario_id: str, medicion_id: int, proyecto_id: int):
+    """Guarda la propiedad de una medición (recién creada o recién verificada)"""
+    clave = f"medicion:{usuario_id}:{medicion_id}"
+    _acceso_en_peticion(db)[clave] = proyecto_id
+    _acceso.set(clave, proyecto_id, proyecto_id=proyecto_id or None)
+
+def olvidar_medicion(usuario_id: str, medicion_id: int):
+    """Descarta la propiedad cacheada de una medición eliminada"""
+    _acceso.delete(f"medicion:{usuario_id}:{medicion_id}")
+
+def olvidar_perfil(usuario_id):
+    """Descarta el perfil cacheado tras actualizarlo o desactivarlo"""
+    _perfiles.delete(str(usuario_id))
+
+def _perfil_a_cache(perfil: PerfilUsuario) -> dict:
+    """Columnas del perfil como datos JSON (UUID y fechas en texto)"""
+    datos = {}
+    for columna in PerfilUsuario.__table__.columns:
+        valor = getattr(perfil, columna.key)
+        if isinstance(valor, datetime):
+            valor = valor.isoformat()
+        elif isinstance(valor, uuid.UUID):
+            valor = str(valor)
+        datos[columna.key] = valor
+    return datos
+
+def _perfil_de_cache(datos: dict) -> PerfilUsuario:
+    """Reconstruye el perfil cacheado con sus tipos originales"""
+    datos = dict(datos)
+    datos["id"] = uuid.UUID(datos["id"])
+    for clave in ("fecha_registro", "fecha_actualizacion"):
+        if datos.get(clave) is not None:
+            datos[clave] = datetime.fromisoformat(datos[clave])
+    return PerfilUsuario(**datos)
 
 def get_current_user_profile(
     current_user: CurrentUser = Depends(get_supabase_user),
@@ -13,7 +128,12 @@ def get_current_user_profile(
     """
     Obtiene el perfil completo del usuario actual desde la base de datos.
     Si el usuario no existe en la tabla perfiles_usuario, lo crea automáticamente.
+    El perfil se sirve desde caché durante ACCESO_TTL_SEGUNDOS.
     """
+    datos = _perfiles.get(current_user.id)
+    if datos is not None:
+        return _perfil_de_cache(datos)
+    
     user_profile = db.query(PerfilUsuario).filter(PerfilUsuario.id == current_user.id).first()
     
     if not user_profile:
@@ -27,8 +147,53 @@ def get_current_user_profile(
         db.commit()
         db.refresh(user_profile)
     
+    _perfiles.set(current_user.id, _perfil_a_cache(user_profile))
     return user_profile
 
+def get_read_db(current_user: CurrentUser = Depends(get_supabase_user)):
+    """
+    Sesión para endpoints de sólo lectura. Con DATABASE_READ_URL va a la
+    réplica, salvo que el usuario haya escrito hace menos de
+    REPLICA_FIJAR_SEGUNDOS: entonces lee del primario y ve sus propios cambios.
+    Dentro de un lote (POST /batch) usa la sesión del lote, que ve lo escrito
+    por las sub-peticiones anteriores.
+    """
+    compartida = sesion_lote.get()
+    if compartida is not None:
+        yield compartida
+        return
+    db = ReadSessionLocal() if replica.usar_replica(current_user.id) else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def limitar_escrituras(request: Request, current_user: CurrentUser = Depends(get_supabase_user)):
+    """
+    Rechaza con 429 y Retry-After las escrituras del usuario que superan
+    ESCRITURA_TASA o ESCRITURA_CONCURRENCIA (limites.py). Se declara en
+    `dependencies=` del decorador, que FastAPI resuelve antes que get_db.
+    """
+    limitador = limites.activo()
+    if limitador is None:
+        yield
+        return
+    
+    rechazo = limitador.entrar(current_user.id)
+    if rechazo is not None:
+        motivo, espera = rechazo
+        ESCRITURAS_LIMITADAS.labels(getattr(request.scope.get("route"), "path", "sin_ruta"), motivo).inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiadas escrituras seguidas; reintenta en unos segundos" if motivo == "tasa"
+                   else "Demasiadas escrituras simultáneas; espera a que terminen las anteriores",
+            headers={"Retry-After": limites.segundos_reintento(espera)}
+        )
+    try:
+        yield
+    finally:
+        limitador.salir(current_user.id)
+
 def get_user_project(
     proyecto_id: int,
     current_user: CurrentUser = Depends(get_supabase_user),
@@ -38,10 +203,20 @@ def get_user_project(
     Obtiene un proyecto específico verificando que pertenezca al usuario actual.
     Esto aprovecha el Row Level Security de Supabase para seguridad adicional.
     """
-    proyecto = db.query(Proyecto).filter(
-        Proyecto.id == proyecto_id,
-        Proyecto.usuario_id == current_user.id
-    ).first()
+    return _proyecto_del_usuario(db, current_user, proyecto_id)
+
+def get_user_project_lectura(
+    proyecto_id: int,
+    current_user: CurrentUser = Depends(get_supabase_user),
+    db: Session = Depends(get_read_db)
+) -> Proyecto:
+    """Como get_user_project, con la sesión de lectura que usa el propio endpoint"""
+    return _proyecto_del_usuario(db, current_user, proyecto_id)
+
+def _proyecto_del_usuario(db: Session, current_user: CurrentUser, proyecto_id: int) -> Proyecto:
+    proyecto = None
+    if usuario_tiene_proyecto(db, current_user.id, proyecto_id):
+        proyecto = db.get(Proyecto, proyecto_id)
     
     if not proyecto:
         raise HTTPException(
@@ -49,4 +224,24 @@ def get_user_project(
             detail=f"Proyecto {proyecto_id} no encontrado o no tienes permisos para accederlo"
         )
     
-    return proyecto
\ No newline at end of file
+    return proyecto
+
+def es_administrador(current_user: CurrentUser) -> bool:
+    """Indica si el email del usuario está en ADMIN_EMAILS"""
+    admins = {email.strip().lower() for email in settings.admin_emails.split(",") if email.strip()}
+    return bool(current_user.email) and current_user.email.lower() in admins
+
+def get_admin_user(
+    current_user: CurrentUser = Depends(get_supabase_user)
+) -> CurrentUser:
+    """
+    Verifica que el usuario actual sea administrador (su email está en
+    ADMIN_EMAILS). Protege los endpoints de diagnóstico bajo /admin.
+    """
+    if not es_administrador(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Se requieren permisos de administrador"
+        )
+    
+    return current_user
\ No newline at end of file
@@ -0,0 +1,101 @@
+"""
+Contención por usuario en las rutas de escritura (autosave de Campo.jsx).
+
+Cada usuario tiene un cubo de tokens (ESCRITURA_TASA escrituras por segundo,
+con ráfagas de hasta ESCRITURA_RAFAGA) y un máximo de ESCRITURA_CONCURRENCIA
+escrituras en curso. Si se supera cualquiera de los dos la petición recibe 429
+con Retry-After antes de abrir la sesión de base de datos, así que una tableta
+con el debounce atascado no agota el pool de conexiones de las demás cuadrillas.
+
+El estado es por worker, igual que el pool de conexiones que protege: con N
+workers un usuario puede llegar como mucho a N × ESCRITURA_TASA.
+"""
+from collections import OrderedDict
+from typing import Optional
+import math
+import threading
+import time
+
+from config import settings
+
+
+class CuboTokens:
+    """Cubo de tokens que se rellena a `tasa` por segundo hasta `capacidad`"""
+
+    __slots__ = ("tokens", "actualizado", "en_curso")
+
+    def __init__(self, capacidad: float):
+        self.tokens = capacidad
+        self.actualizado = time.monotonic()
+        self.en_curso = 0
+
+
+class LimitadorUsuarios:
+    """Cubos de tokens y escrituras en curso por usuario, seguro entre hilos"""
+
+    def __init__(self, tasa: float, rafaga: int, concurrencia: int, max_usuarios: int = 10000):
+        self.tasa = tasa
+        self.capacidad = max(rafaga, 1)
+        self.concurrencia = concurrencia
+        self.max_usuarios = max_usuarios
+        self._cubos = OrderedDict()  # usuario_id -> CuboTokens
+        self._candado = threading.Lock()
+
+    def _cubo(self, usuario_id: str) -> CuboTokens:
+        cubo = self._cubos.get(usuario_id)
+        if cubo is None:
+            cubo = self._cubos[usuario_id] = CuboTokens(self.capacidad)
+            # Se descartan los cubos más antiguos sin escrituras en curso
+            while len(self._cubos) > self.max_usuarios:
+                antiguo, primero = next(iter(self._cubos.items()))
+                if primero.en_curso:
+                    break
+                del self._cubos[antiguo]
+        else:
+            self._cubos.move_to_end(usuario_id)
+        return cubo
+
+    def entrar(self, usuario_id: str):
+        """
+        Reserva una escritura. Devuelve None si se permite, o (motivo, segundos
+        de espera) si hay que rechazarla; motivo es "tasa" o "concurrencia".
+        """
+        ahora = time.monotonic()
+        with self._candado:
+            cubo = self._cubo(usuario_id)
+            if self.tasa > 0:
+                cubo.tokens = min(self.capacidad, cubo.tokens + (ahora - cubo.actualizado) * self.tasa)
+                cubo.actualizado = ahora
+                if cubo.tokens < 1:
+                    return "tasa", (1 - cubo.tokens) / self.tasa
+            if self.concurrencia > 0 and cubo.en_curso >= self.concurrencia:
+                return "concurrencia", 1.0
+            if self.tasa > 0:
+                cubo.tokens -= 1
+            cubo.en_curso += 1
+            return None
+
+    def salir(self, usuario_id: str):
+        with self._candado:
+            cubo = self._cubos.get(usuario_id)
+            if cubo is not None and cubo.en_curso > 0:
+                cubo.en_curso -= 1
+
+
+def segundos_reintento(espera: float) -> str:
+    """Valor de Retry-After: segundos enteros, al menos 1"""
+    return str(max(1, math.ceil(espera)))
+
+
+limitador_escrituras = LimitadorUsuarios(
+    tasa=settings.escritura_tasa,
+    rafaga=settings.escritura_rafaga,
+    concurrencia=settings.escritura_concurrencia,
+)
+
+
+def activo() -> Optional[LimitadorUsuarios]:
+    """El limitador de escrituras, o None si ambos límites están en 0"""
+    if limitador_escrituras.tasa <= 0 and limitador_escrituras.concurrencia <= 0:
+        return None
+    return limitador_escrituras
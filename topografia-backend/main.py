@@ -1,9 +1,15 @@
 from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from routers import usuarios, proyectos, estaciones, mediciones, lecturas
+from routers import usuarios, proyectos, estaciones, mediciones, lecturas, admin, lotes
 from config import settings
-from database import engine, Base
+from database import engine, read_engine, Base
+from metrics import MetricsMiddleware, instrumentar_engine, metrics_endpoint
+from profiling import ProfilingMiddleware
+from replica import FijarPrimarioMiddleware
+from services import alertas
+from services.purga import iniciar_purga_pendientes
+from procesos import CalculoAgotado, PoolSaturado, REINTENTO_SEGUNDOS, pool_calculo
 import logging
 from datetime import datetime
 
@@ -36,6 +42,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas de Prometheus: latencia por ruta, consultas SQL por petición y Server-Timing
+app.add_middleware(MetricsMiddleware)
+instrumentar_engine(engine)
+if read_engine is not engine:
+    instrumentar_engine(read_engine)
+app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+
+# Perfilado bajo demanda (cabecera X-Profile de un admin o muestreo configurable)
+app.add_middleware(ProfilingMiddleware)
+
+# Réplica de lectura: tras una escritura el usuario lee del primario unos segundos
+app.add_middleware(FijarPrimarioMiddleware)
+
+# Retomar purgas de proyectos eliminados en segundo plano que no terminaron
+@app.on_event("startup")
+def retomar_purgas():
+    iniciar_purga_pendientes()
+
+# Alertas de mediciones aún en cola de recálculo (services/alertas.py)
+@app.on_event("shutdown")
+def recalcular_alertas_en_cola():
+    alertas.recalcular_diferidas()
+
+# Los procesos del pool de cálculo no sobreviven al worker
+@app.on_event("shutdown")
+def cerrar_pool_calculo():
+    pool_calculo.cerrar()
+
+# Pool de cálculo sin cupo o cálculo que superó su límite de tiempo
+@app.exception_handler(PoolSaturado)
+async def pool_saturado_handler(request, exc):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(REINTENTO_SEGUNDOS)}
+    )
+
+@app.exception_handler(CalculoAgotado)
+async def calculo_agotado_handler(request, exc):
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": str(exc)}
+    )
+
 # Manejador global de errores
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -76,6 +126,18 @@ app.include_router(
     tags=["lecturas"]
 )
 
+app.include_router(
+    admin.router,
+    prefix="/admin",
+    tags=["admin"]
+)
+
+app.include_router(
+    lotes.router,
+    prefix="/batch",
+    tags=["batch"]
+)
+
 # Endpoint de salud
 @app.get("/")
 def root():
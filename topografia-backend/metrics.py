@@ -0,0 +1,215 @@
+"""
+Métricas de Prometheus y cabeceras Server-Timing.
+
+El middleware registra por ruta (la plantilla, p. ej. `/mediciones/{medicion_id}/lecturas/`)
+la latencia, el tamaño de respuesta y las peticiones en curso. Los eventos de
+SQLAlchemy cuentan las consultas y el tiempo de base de datos de cada petición,
+de modo que los patrones N+1 se ven directamente en los paneles.
+
+Con varios workers de uvicorn se debe definir PROMETHEUS_MULTIPROC_DIR para que
+/metrics agregue los contadores de todos los procesos.
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+import os
+import time
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+LATENCIA_PETICION = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de las peticiones HTTP por ruta",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PETICIONES_EN_CURSO = Gauge(
+    "http_requests_in_progress",
+    "Peticiones HTTP en curso",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+TAMANO_RESPUESTA = Histogram(
+    "http_response_size_bytes",
+    "Tamaño del cuerpo de respuesta por ruta",
+    ["method", "route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+CONSULTAS_POR_PETICION = Histogram(
+    "db_queries_per_request",
+    "Número de consultas SQL ejecutadas por petición",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 500),
+)
+TIEMPO_DB_POR_PETICION = Histogram(
+    "db_time_per_request_seconds",
+    "Tiempo acumulado en la base de datos por petición",
+    ["method", "route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+CONSULTAS_TOTALES = Counter(
+    "db_queries_total",
+    "Consultas SQL ejecutadas (incluye las que ocurren fuera de una petición)",
+)
+
+SESIONES_LECTURA = Counter(
+    "db_read_sessions_total",
+    "Sesiones de endpoints de sólo lectura por destino (replica o primario)",
+    ["destino"],
+)
+
+ESCRITURAS_LIMITADAS = Counter(
+    "http_requests_throttled_total",
+    "Escrituras rechazadas con 429 por ruta y motivo (tasa o concurrencia)",
+    ["route", "motivo"],
+)
+
+RESPUESTAS_CACHE = Counter(
+    "response_cache_requests_total",
+    "Lecturas de proyecto servidas desde la caché de respuestas (acierto) o construidas (fallo)",
+    ["endpoint", "resultado"],
+)
+
+CALCULO_EN_CURSO = Gauge(
+    "cpu_pool_jobs_running",
+    "Cálculos ejecutándose en el pool de procesos",
+    multiprocess_mode="livesum",
+)
+CALCULO_EN_COLA = Gauge(
+    "cpu_pool_queue_depth",
+    "Cálculos esperando un proceso libre del pool",
+    multiprocess_mode="livesum",
+)
+CALCULOS = Counter(
+    "cpu_pool_jobs_total",
+    "Cálculos enviados al pool de procesos por núcleo y resultado (ok, timeout, saturado, error)",
+    ["kernel", "resultado"],
+)
+CALCULO_DURACION = Histogram(
+    "cpu_pool_job_duration_seconds",
+    "Duración de los cálculos del pool de procesos, incluida la espera en cola",
+    ["kernel"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+# Rutas que no se instrumentan para no medir el propio scraping
+RUTAS_EXCLUIDAS = {"/metrics"}
+
+
+@dataclass
+class EstadisticasPeticion:
+    """Acumulador de la petición en curso; lo comparten los hilos del threadpool"""
+    metodo: str = ""
+    ruta: str = ""
+    consultas: int = 0
+    tiempo_db: float = 0.0
+
+
+_estadisticas_actuales: ContextVar[Optional[EstadisticasPeticion]] = ContextVar(
+    "estadisticas_peticion", default=None
+)
+
+
+def estadisticas_actuales() -> Optional[EstadisticasPeticion]:
+    """Estadísticas de la petición en curso, o None fuera de una petición"""
+    return _estadisticas_actuales.get()
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    # En el contexto de ejecución: una sentencia que falla no deja restos en la conexión
+    context._inicio_consulta = time.perf_counter()
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - context._inicio_consulta
+    CONSULTAS_TOTALES.inc()
+    estadisticas = _estadisticas_actuales.get()
+    if estadisticas is not None:
+        estadisticas.consultas += 1
+        estadisticas.tiempo_db += duracion
+
+
+def instrumentar_engine(engine):
+    """Registra los eventos de cursor que cuentan consultas y tiempo de DB"""
+    event.listen(engine, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(engine, "after_cursor_execute", _despues_de_ejecutar)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro (sin BaseHTTPMiddleware, que añade una tarea por petición).
+    Añade la cabecera Server-Timing con el tiempo total, el de base de datos y
+    el número de consultas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._rutas_por_endpoint = None
+
+    def _plantilla_ruta(self, scope) -> str:
+        if self._rutas_por_endpoint is None:
+            self._rutas_por_endpoint = {
+                getattr(ruta, "endpoint", None): ruta.path
+                for ruta in scope["app"].routes
+            }
+        # Tras el enrutamiento Starlette deja el endpoint en el scope
+        return self._rutas_por_endpoint.get(scope.get("endpoint"), "sin_ruta")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in RUTAS_EXCLUIDAS:
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        # Las sub-peticiones de POST /batch también cuentan en el lote que las contiene
+        externa = _estadisticas_actuales.get()
+        estadisticas = EstadisticasPeticion(metodo=metodo, ruta=scope["path"])
+        token = _estadisticas_actuales.set(estadisticas)
+        inicio = time.perf_counter()
+        estado = {"codigo": 500, "bytes": 0}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+                total_ms = (time.perf_counter() - inicio) * 1000
+                server_timing = (
+                    f'app;dur={total_ms:.1f}, '
+                    f'db;dur={estadisticas.tiempo_db * 1000:.1f};desc="{estadisticas.consultas} consultas"'
+                )
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [
+                    (b"server-timing", server_timing.encode())
+                ]
+            elif mensaje["type"] == "http.response.body":
+                estado["bytes"] += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        PETICIONES_EN_CURSO.labels(metodo).inc()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            PETICIONES_EN_CURSO.labels(metodo).dec()
+            _estadisticas_actuales.reset(token)
+            if externa is not None:
+                externa.consultas += estadisticas.consultas
+                externa.tiempo_db += estadisticas.tiempo_db
+            ruta = self._plantilla_ruta(scope)
+            LATENCIA_PETICION.labels(metodo, ruta, str(estado["codigo"])).observe(time.perf_counter() - inicio)
+            TAMANO_RESPUESTA.labels(metodo, ruta).observe(estado["bytes"])
+            CONSULTAS_POR_PETICION.labels(metodo, ruta).observe(estadisticas.consultas)
+            TIEMPO_DB_POR_PETICION.labels(metodo, ruta).observe(estadisticas.tiempo_db)
+
+
+def metrics_endpoint():
+    """Exposición en formato Prometheus (agregando workers si hay modo multiproceso)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        contenido = generate_latest(registro)
+    else:
+        contenido = generate_latest()
+    return Response(content=contenido, media_type=CONTENT_TYPE_LATEST)
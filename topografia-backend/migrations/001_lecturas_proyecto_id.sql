@@ -0,0 +1,60 @@
+-- Copia proyecto_id en lecturas_divisiones para que las consultas por proyecto
+-- (estadísticas, exportaciones, recálculos, borrados) y la verificación de
+-- acceso no tengan que pasar por mediciones_estacion.
+--
+-- Ejecutar con: psql "$DATABASE_URL" -f migrations/001_lecturas_proyecto_id.sql
+-- No va dentro de una transacción porque el índice se crea CONCURRENTLY.
+
+ALTER TABLE lecturas_divisiones
+    ADD COLUMN IF NOT EXISTS proyecto_id integer;
+
+-- Mantener la columna consistente en cualquier escritura, venga de la API o no
+CREATE OR REPLACE FUNCTION lecturas_asignar_proyecto() RETURNS trigger AS $$
+BEGIN
+    SELECT m.proyecto_id INTO NEW.proyecto_id
+    FROM mediciones_estacion m
+    WHERE m.id = NEW.medicion_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_lecturas_asignar_proyecto ON lecturas_divisiones;
+CREATE TRIGGER trg_lecturas_asignar_proyecto
+    BEFORE INSERT OR UPDATE OF medicion_id, proyecto_id ON lecturas_divisiones
+    FOR EACH ROW EXECUTE FUNCTION lecturas_asignar_proyecto();
+
+CREATE OR REPLACE FUNCTION mediciones_propagar_proyecto() RETURNS trigger AS $$
+BEGIN
+    UPDATE lecturas_divisiones
+    SET proyecto_id = NEW.proyecto_id
+    WHERE medicion_id = NEW.id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_mediciones_propagar_proyecto ON mediciones_estacion;
+CREATE TRIGGER trg_mediciones_propagar_proyecto
+    AFTER UPDATE OF proyecto_id ON mediciones_estacion
+    FOR EACH ROW WHEN (OLD.proyecto_id IS DISTINCT FROM NEW.proyecto_id)
+    EXECUTE FUNCTION mediciones_propagar_proyecto();
+
+-- Backfill de las filas existentes (los triggers ya cubren las nuevas)
+UPDATE lecturas_divisiones l
+SET proyecto_id = m.proyecto_id
+FROM mediciones_estacion m
+WHERE m.id = l.medicion_id
+  AND l.proyecto_id IS DISTINCT FROM m.proyecto_id;
+
+ALTER TABLE lecturas_divisiones
+    ALTER COLUMN proyecto_id SET NOT NULL;
+
+ALTER TABLE lecturas_divisiones
+    DROP CONSTRAINT IF EXISTS lecturas_divisiones_proyecto_id_fkey;
+ALTER TABLE lecturas_divisiones
+    ADD CONSTRAINT lecturas_divisiones_proyecto_id_fkey
+    FOREIGN KEY (proyecto_id) REFERENCES proyectos(id) ON DELETE CASCADE;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_lecturas_proyecto_medicion_division
+    ON lecturas_divisiones (proyecto_id, medicion_id, division_transversal);
+
+ANALYZE lecturas_divisiones;
@@ -0,0 +1,18 @@
+-- Borrado diferido de proyectos: DELETE /proyectos/{id}?en_segundo_plano=true
+-- marca eliminado_en y una purga en segundo plano borra las filas por lotes.
+-- Los hijos se eliminan con el ON DELETE CASCADE de las claves foráneas.
+--
+-- Ejecutar con: psql "$DATABASE_URL" -f migrations/002_proyectos_eliminado_en.sql
+
+ALTER TABLE proyectos
+    ADD COLUMN IF NOT EXISTS eliminado_en timestamptz;
+
+-- Las consultas de la API sólo ven proyectos activos del usuario
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_proyectos_usuario_activos
+    ON proyectos (usuario_id)
+    WHERE eliminado_en IS NULL;
+
+-- Proyectos pendientes de purga (se retoman al arrancar la API)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_proyectos_eliminados
+    ON proyectos (eliminado_en)
+    WHERE eliminado_en IS NOT NULL;
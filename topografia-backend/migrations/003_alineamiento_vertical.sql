@@ -0,0 +1,31 @@
+-- Diseño compacto por proyecto: rasante definida por PVI con curvas verticales
+-- parabólicas y pendiente transversal por puntos de transición. Las
+-- estaciones teóricas pasan a ser virtuales; sólo se guardan filas en
+-- estaciones_teoricas donde el diseñador sobrescribe el valor calculado.
+--
+-- Ejecutar con: psql "$DATABASE_URL" -f migrations/003_alineamiento_vertical.sql
+
+CREATE TABLE IF NOT EXISTS pvis_proyecto (
+    id serial PRIMARY KEY,
+    proyecto_id integer NOT NULL REFERENCES proyectos(id) ON DELETE CASCADE,
+    km numeric(10, 3) NOT NULL,
+    elevacion numeric(10, 6) NOT NULL,
+    longitud_curva numeric(8, 3) NOT NULL DEFAULT 0 CHECK (longitud_curva >= 0),
+    CONSTRAINT _pvi_proyecto_km_uc UNIQUE (proyecto_id, km)
+);
+
+CREATE TABLE IF NOT EXISTS puntos_bombeo (
+    id serial PRIMARY KEY,
+    proyecto_id integer NOT NULL REFERENCES proyectos(id) ON DELETE CASCADE,
+    km numeric(10, 3) NOT NULL,
+    pendiente_derecha numeric(8, 6) NOT NULL,
+    CONSTRAINT _bombeo_proyecto_km_uc UNIQUE (proyecto_id, km)
+);
+
+ALTER TABLE pvis_proyecto ENABLE ROW LEVEL SECURITY;
+ALTER TABLE puntos_bombeo ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY pvis_proyecto_propietario ON pvis_proyecto
+    USING (EXISTS (SELECT 1 FROM proyectos p WHERE p.id = proyecto_id AND p.usuario_id = auth.uid()));
+CREATE POLICY puntos_bombeo_propietario ON puntos_bombeo
+    USING (EXISTS (SELECT 1 FROM proyectos p WHERE p.id = proyecto_id AND p.usuario_id = auth.uid()));
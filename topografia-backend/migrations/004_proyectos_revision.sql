@@ -0,0 +1,8 @@
+-- Revisión de la configuración del proyecto. Cada actualización del proyecto la
+-- incrementa; los objetos derivados que se guardan en memoria (plantilla de
+-- sección transversal) se indexan por (proyecto, revisión) y nunca quedan obsoletos.
+--
+-- Ejecutar con: psql "$DATABASE_URL" -f migrations/004_proyectos_revision.sql
+
+ALTER TABLE proyectos
+    ADD COLUMN IF NOT EXISTS revision integer NOT NULL DEFAULT 1;
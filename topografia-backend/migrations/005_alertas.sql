@@ -0,0 +1,34 @@
+-- Alertas abiertas por proyecto (fuera de tolerancia, calidad, divisiones
+-- faltantes, lecturas atípicas, estación sin diseño y recálculo pendiente).
+-- La API las mantiene en cada escritura de lecturas y mediciones; la pantalla
+-- de Alertas las pagina por (severidad, km, id) sin recorrer las lecturas.
+--
+-- Ejecutar con: psql "$DATABASE_URL" -f migrations/005_alertas.sql
+-- Después, poblarlas con POST /proyectos/{id}/alertas/recalcular por proyecto.
+
+CREATE TABLE IF NOT EXISTS alertas (
+    id serial PRIMARY KEY,
+    proyecto_id integer NOT NULL REFERENCES proyectos(id) ON DELETE CASCADE,
+    medicion_id integer REFERENCES mediciones_estacion(id) ON DELETE CASCADE,
+    clave varchar(80) NOT NULL,
+    tipo varchar(30) NOT NULL,
+    severidad smallint NOT NULL,
+    estacion_km numeric(10, 3) NOT NULL,
+    division_transversal numeric(8, 3),
+    valor numeric(10, 6),
+    detalle text,
+    creada_en timestamptz DEFAULT now(),
+    CONSTRAINT _alerta_proyecto_clave_uc UNIQUE (proyecto_id, clave)
+);
+
+CREATE INDEX IF NOT EXISTS ix_alertas_proyecto_orden
+    ON alertas (proyecto_id, severidad, estacion_km, id);
+
+-- El borrado de mediciones también elimina sus alertas
+CREATE INDEX IF NOT EXISTS ix_alertas_medicion
+    ON alertas (medicion_id);
+
+ALTER TABLE alertas ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY alertas_propietario ON alertas
+    USING (EXISTS (SELECT 1 FROM proyectos p WHERE p.id = proyecto_id AND p.usuario_id = auth.uid()));
@@ -0,0 +1,27 @@
+-- Trabajos de reporte de liberación (PDF/XLSX) y sus artefactos.
+-- POST /proyectos/{id}/reportes reutiliza la fila de la misma versión de
+-- datos (revisión del proyecto + huella de lecturas) y formato; al terminar
+-- un reporte se borran los artefactos anteriores del mismo formato.
+--
+-- Ejecutar con: psql "$DATABASE_URL" -f migrations/006_reportes.sql
+
+CREATE TABLE IF NOT EXISTS reportes (
+    id serial PRIMARY KEY,
+    proyecto_id integer NOT NULL REFERENCES proyectos(id) ON DELETE CASCADE,
+    formato varchar(10) NOT NULL,
+    revision integer NOT NULL,
+    huella varchar(64) NOT NULL,
+    estado varchar(20) NOT NULL DEFAULT 'pendiente',
+    progreso smallint NOT NULL DEFAULT 0,
+    error text,
+    contenido bytea,
+    tamano integer,
+    creado_en timestamptz DEFAULT now(),
+    terminado_en timestamptz,
+    CONSTRAINT _reporte_version_uc UNIQUE (proyecto_id, formato, revision, huella)
+);
+
+ALTER TABLE reportes ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY reportes_propietario ON reportes
+    USING (EXISTS (SELECT 1 FROM proyectos p WHERE p.id = proyecto_id AND p.usuario_id = auth.uid()));
@@ -4,11 +4,18 @@ from .proyecto import Proyecto
 from .estacion import EstacionTeorica
 from .medicion import MedicionEstacion
 from .lectura import LecturaDivision
+from .alineamiento import PVIProyecto, PuntoBombeo
+from .alerta import Alerta
+from .reporte import Reporte
 
 __all__ = [
     "PerfilUsuario",
     "Proyecto", 
     "EstacionTeorica",
     "MedicionEstacion",
-    "LecturaDivision"
+    "LecturaDivision",
+    "PVIProyecto",
+    "PuntoBombeo",
+    "Alerta",
+    "Reporte"
 ]
\ No newline at end of file
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, DECIMAL, DateTime, Text, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from database import Base
+
+class Alerta(Base):
+    """
+    Modelo SQLAlchemy para la tabla alertas.
+    Alertas abiertas del proyecto, mantenidas en cada escritura de lecturas y
+    mediciones (services/alertas.py). Una alerta resuelta se elimina.
+    """
+    __tablename__ = "alertas"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    proyecto_id = Column(Integer, ForeignKey("proyectos.id", ondelete="CASCADE"), nullable=False)
+    medicion_id = Column(Integer, ForeignKey("mediciones_estacion.id", ondelete="CASCADE"), nullable=True)
+    # Identifica la alerta dentro del proyecto: tipo:medicion[:division en mm]
+    clave = Column(String(80), nullable=False)
+    tipo = Column(String(30), nullable=False)
+    severidad = Column(SmallInteger, nullable=False)  # 0 crítica, 1 advertencia, 2 info
+    estacion_km = Column(DECIMAL(10, 3), nullable=False)
+    division_transversal = Column(DECIMAL(8, 3), nullable=True)
+    valor = Column(DECIMAL(10, 6), nullable=True)  # Diferencia en m o cantidad, según el tipo
+    detalle = Column(Text, nullable=True)
+    creada_en = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Paginación por (severidad, km, id) como recorrido de rango del índice
+    __table_args__ = (
+        UniqueConstraint('proyecto_id', 'clave', name='_alerta_proyecto_clave_uc'),
+        Index('ix_alertas_proyecto_orden', 'proyecto_id', 'severidad', 'estacion_km', 'id'),
+        Index('ix_alertas_medicion', 'medicion_id'),
+    )
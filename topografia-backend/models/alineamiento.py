@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, DECIMAL, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from database import Base
+
+class PVIProyecto(Base):
+    """
+    Modelo SQLAlchemy para la tabla pvis_proyecto.
+    Punto de inflexión vertical de la rasante de diseño, con su curva vertical
+    parabólica (longitud 0 = quiebre sin curva).
+    """
+    __tablename__ = "pvis_proyecto"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    proyecto_id = Column(Integer, ForeignKey("proyectos.id", ondelete="CASCADE"), nullable=False)
+    km = Column(DECIMAL(10, 3), nullable=False)
+    elevacion = Column(DECIMAL(10, 6), nullable=False)
+    longitud_curva = Column(DECIMAL(8, 3), nullable=False, default=0)
+    
+    # Relaciones
+    proyecto = relationship("Proyecto", back_populates="pvis")
+    
+    __table_args__ = (UniqueConstraint('proyecto_id', 'km', name='_pvi_proyecto_km_uc'),)
+
+class PuntoBombeo(Base):
+    """
+    Modelo SQLAlchemy para la tabla puntos_bombeo.
+    Pendiente transversal derecha en un km; entre puntos la transición es lineal.
+    """
+    __tablename__ = "puntos_bombeo"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    proyecto_id = Column(Integer, ForeignKey("proyectos.id", ondelete="CASCADE"), nullable=False)
+    km = Column(DECIMAL(10, 3), nullable=False)
+    pendiente_derecha = Column(DECIMAL(8, 6), nullable=False)
+    
+    # Relaciones
+    proyecto = relationship("Proyecto", back_populates="puntos_bombeo")
+    
+    __table_args__ = (UniqueConstraint('proyecto_id', 'km', name='_bombeo_proyecto_km_uc'),)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DECIMAL, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, DECIMAL, String, Boolean, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base
@@ -12,6 +12,9 @@ class LecturaDivision(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     medicion_id = Column(Integer, ForeignKey("mediciones_estacion.id", ondelete="CASCADE"), nullable=False)
+    # Copia de mediciones_estacion.proyecto_id (migrations/001): permite filtrar por
+    # proyecto sin join. La mantiene el trigger de la migración y create_lectura.
+    proyecto_id = Column(Integer, ForeignKey("proyectos.id", ondelete="CASCADE"), nullable=False)
     division_transversal = Column(DECIMAL(8, 3), nullable=False)
     lectura_mira = Column(DECIMAL(8, 6), nullable=False)
     elv_base_real = Column(DECIMAL(10, 6), nullable=True)
@@ -25,4 +28,10 @@ class LecturaDivision(Base):
     fecha_calculo = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relaciones
-    medicion = relationship("MedicionEstacion", back_populates="lecturas")
\ No newline at end of file
+    medicion = relationship("MedicionEstacion", back_populates="lecturas")
+    
+    # Recorridos por proyecto como un rango del índice, ya ordenados por medición y división
+    __table_args__ = (
+        UniqueConstraint('medicion_id', 'division_transversal', name='_medicion_division_uc'),
+        Index('ix_lecturas_proyecto_medicion_division', 'proyecto_id', 'medicion_id', 'division_transversal'),
+    )
\ No newline at end of file
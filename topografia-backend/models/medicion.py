@@ -23,7 +23,7 @@ class MedicionEstacion(Base):
     
     # Relaciones
     proyecto = relationship("Proyecto", back_populates="mediciones")
-    lecturas = relationship("LecturaDivision", back_populates="medicion", cascade="all, delete-orphan")
+    lecturas = relationship("LecturaDivision", back_populates="medicion", cascade="all, delete-orphan", passive_deletes=True)
     
     # Restricción única para proyecto_id y estacion_km
     __table_args__ = (UniqueConstraint('proyecto_id', 'estacion_km', name='_proyecto_estacion_uc'),)
\ No newline at end of file
@@ -30,8 +30,18 @@ class Proyecto(Base):
     fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
     fecha_modificacion = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     estado = Column(String(20), default="CONFIGURACION")
+    # Borrado diferido: el proyecto deja de ser visible y una purga en segundo plano lo elimina
+    eliminado_en = Column(DateTime(timezone=True), nullable=True)
+    # Se incrementa en cada actualización; clave de los derivados en memoria (services/seccion.py)
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relaciones
     usuario = relationship("PerfilUsuario", back_populates="proyectos")
-    estaciones = relationship("EstacionTeorica", back_populates="proyecto", cascade="all, delete-orphan")
-    mediciones = relationship("MedicionEstacion", back_populates="proyecto", cascade="all, delete-orphan")
\ No newline at end of file
+    # passive_deletes: el ON DELETE CASCADE de la base de datos borra los hijos sin cargarlos
+    estaciones = relationship("EstacionTeorica", back_populates="proyecto", cascade="all, delete-orphan", passive_deletes=True)
+    mediciones = relationship("MedicionEstacion", back_populates="proyecto", cascade="all, delete-orphan", passive_deletes=True)
+    # Diseño compacto: rasante por PVI y transiciones de bombeo (estaciones virtuales)
+    pvis = relationship("PVIProyecto", back_populates="proyecto", cascade="all, delete-orphan",
+                        passive_deletes=True, order_by="PVIProyecto.km")
+    puntos_bombeo = relationship("PuntoBombeo", back_populates="proyecto", cascade="all, delete-orphan",
+                                 passive_deletes=True, order_by="PuntoBombeo.km")
\ No newline at end of file
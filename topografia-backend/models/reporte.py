@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Text, LargeBinary, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from sqlalchemy.orm import deferred
+from database import Base
+
+class Reporte(Base):
+    """
+    Modelo SQLAlchemy para la tabla reportes.
+    Trabajos de generación del reporte de liberación (PDF/XLSX) y su artefacto,
+    identificados por la versión de los datos del proyecto (services/reportes.py).
+    """
+    __tablename__ = "reportes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    proyecto_id = Column(Integer, ForeignKey("proyectos.id", ondelete="CASCADE"), nullable=False)
+    formato = Column(String(10), nullable=False)  # pdf | xlsx
+    # Versión de los datos: revisión del proyecto y huella de sus lecturas
+    revision = Column(Integer, nullable=False)
+    huella = Column(String(64), nullable=False)
+    estado = Column(String(20), nullable=False, default="pendiente")  # pendiente, reuniendo, renderizando, listo, error
+    progreso = Column(SmallInteger, nullable=False, default=0)  # 0-100
+    error = Column(Text, nullable=True)
+    # Diferido: las consultas de progreso no traen el artefacto
+    contenido = deferred(Column(LargeBinary, nullable=True))
+    tamano = Column(Integer, nullable=True)
+    creado_en = Column(DateTime(timezone=True), server_default=func.now())
+    terminado_en = Column(DateTime(timezone=True), nullable=True)
+    
+    # Un único trabajo (y artefacto) por versión de datos y formato
+    __table_args__ = (
+        UniqueConstraint('proyecto_id', 'formato', 'revision', 'huella', name='_reporte_version_uc'),
+    )
@@ -0,0 +1,245 @@
+"""
+Pool de procesos acotado para núcleos de cálculo que usan CPU.
+
+Un cálculo largo dentro de una ruta síncrona ocupa un hilo del threadpool y
+retiene el GIL, así que frena las demás peticiones del worker (el autosave de
+Campo.jsx entre ellas). `pool_calculo.ejecutar(funcion, ...)` lo manda a uno
+de CALCULO_PROCESOS procesos:
+
+- Los arreglos NumPy grandes de los argumentos (y los que devuelve el núcleo)
+  viajan por memoria compartida (multiprocessing.shared_memory): sólo se
+  serializa su descripción, no los datos.
+- Como mucho CALCULO_PROCESOS + CALCULO_COLA trabajos a la vez por worker; si
+  no hay cupo se lanza PoolSaturado (las rutas responden 503 con Retry-After).
+- Cada trabajo tiene un límite de tiempo. Un proceso no se puede interrumpir a
+  mitad de un trabajo, así que al vencer el pool se recicla: se terminan sus
+  procesos y los trabajos que compartían ese pool se reintentan una vez en el
+  nuevo.
+- Métricas: trabajos en cola y en curso, duración y resultado por núcleo.
+
+Con CALCULO_PROCESOS=0 los núcleos se ejecutan en el hilo que los llama.
+
+Los procesos se crean con `spawn` (el proceso de la API tiene hilos y un fork
+podría heredar un candado tomado): el núcleo debe ser una función de nivel de
+módulo y un script que monte la aplicación debe arrancarla dentro de
+`if __name__ == "__main__":`.
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TiempoAgotado
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Optional
+import logging
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+
+from config import settings
+from metrics import CALCULO_DURACION, CALCULO_EN_COLA, CALCULO_EN_CURSO, CALCULOS
+
+logger = logging.getLogger(__name__)
+
+# Arreglos más pequeños se serializan: crear un bloque compartido cuesta más
+MIN_BYTES_COMPARTIDOS = 64 * 1024
+REINTENTO_SEGUNDOS = 2  # Retry-After de las respuestas 503 por pool saturado
+
+
+class PoolSaturado(Exception):
+    """No hay cupo en el pool de cálculo"""
+
+
+class CalculoAgotado(Exception):
+    """El cálculo superó su límite de tiempo"""
+
+
+class CalculoFallido(Exception):
+    """El proceso del cálculo terminó inesperadamente (p. ej. sin memoria)"""
+
+
+class ArregloCompartido:
+    """Descripción serializable de un arreglo NumPy guardado en memoria compartida"""
+
+    __slots__ = ("nombre", "forma", "dtype")
+
+    def __init__(self, nombre: str, forma: tuple, dtype: str):
+        self.nombre = nombre
+        self.forma = forma
+        self.dtype = dtype
+
+    def __getstate__(self):
+        return self.nombre, self.forma, self.dtype
+
+    def __setstate__(self, estado):
+        self.nombre, self.forma, self.dtype = estado
+
+
+def _a_memoria_compartida(arreglo: np.ndarray, bloques: list) -> ArregloCompartido:
+    bloque = shared_memory.SharedMemory(create=True, size=max(arreglo.nbytes, 1))
+    bloques.append(bloque)
+    np.ndarray(arreglo.shape, dtype=arreglo.dtype, buffer=bloque.buf)[...] = arreglo
+    return ArregloCompartido(bloque.name, arreglo.shape, arreglo.dtype.str)
+
+
+def _compartir(valor, bloques: list):
+    """Sustituye los arreglos grandes (también dentro de tuplas, listas y dicts) por su descripción"""
+    if isinstance(valor, np.ndarray) and valor.dtype != object and valor.nbytes >= MIN_BYTES_COMPARTIDOS:
+        return _a_memoria_compartida(valor, bloques)
+    if isinstance(valor, (tuple, list)):
+        return type(valor)(_compartir(v, bloques) for v in valor)
+    if isinstance(valor, dict):
+        return {k: _compartir(v, bloques) for k, v in valor.items()}
+    return valor
+
+
+def _abrir(valor, bloques: list, copiar: bool):
+    """Inverso de _compartir. Sin copia, las vistas son válidas mientras los bloques sigan abiertos"""
+    if isinstance(valor, ArregloCompartido):
+        bloque = shared_memory.SharedMemory(name=valor.nombre)
+        bloques.append(bloque)
+        vista = np.ndarray(valor.forma, dtype=np.dtype(valor.dtype), buffer=bloque.buf)
+        if copiar:
+            return vista.copy()
+        vista.setflags(write=False)
+        return vista
+    if isinstance(valor, (tuple, list)):
+        return type(valor)(_abrir(v, bloques, copiar) for v in valor)
+    if isinstance(valor, dict):
+        return {k: _abrir(v, bloques, copiar) for k, v in valor.items()}
+    return valor
+
+
+def _cerrar(bloques: list, eliminar: bool):
+    for bloque in bloques:
+        try:
+            bloque.close()
+            if eliminar:
+                bloque.unlink()
+        except (BufferError, FileNotFoundError):
+            pass
+
+
+def _en_proceso(funcion, args, kwargs):
+    """Se ejecuta en el proceso del pool: abre las entradas, llama al núcleo y comparte el resultado"""
+    entradas = []
+    try:
+        resultado = funcion(*_abrir(args, entradas, copiar=False), **_abrir(kwargs, entradas, copiar=False))
+        # El resultado no puede apuntar a los bloques de entrada, que el padre elimina
+        salidas = []
+        try:
+            resultado = _compartir(resultado, salidas)
+        finally:
+            # El padre copia y elimina los bloques de salida
+            _cerrar(salidas, eliminar=False)
+        return resultado
+    finally:
+        _cerrar(entradas, eliminar=False)
+
+
+class PoolCalculo:
+    """ProcessPoolExecutor acotado, con límite de tiempo por trabajo y métricas"""
+
+    def __init__(self, procesos: int, cola: int, timeout: float):
+        self.procesos = procesos
+        self.timeout = timeout
+        self._cupos = threading.BoundedSemaphore(max(procesos + cola, 1))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._candado = threading.Lock()
+        self._pendientes = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._candado:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.procesos,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _reciclar(self, pool: ProcessPoolExecutor):
+        """Descarta `pool` (si sigue siendo el actual) y termina sus procesos"""
+        with self._candado:
+            if self._pool is pool:
+                self._pool = None
+        # ProcessPoolExecutor no expone sus procesos; es la única forma de parar un trabajo
+        for proceso in list((getattr(pool, "_processes", None) or {}).values()):
+            proceso.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _contar(self, delta: int):
+        with self._candado:
+            self._pendientes += delta
+            pendientes = self._pendientes
+        CALCULO_EN_CURSO.set(min(pendientes, self.procesos))
+        CALCULO_EN_COLA.set(max(pendientes - self.procesos, 0))
+
+    def ejecutar(self, funcion, *args, nombre: str = None, timeout: float = None,
+                 esperar: float = 0, **kwargs):
+        """
+        Ejecuta funcion(*args, **kwargs) en el pool y devuelve su resultado.
+        `esperar`: segundos que se espera un cupo antes de lanzar PoolSaturado.
+        """
+        nombre = nombre or funcion.__name__
+        timeout = timeout or self.timeout
+        if self.procesos <= 0:
+            return funcion(*args, **kwargs)
+
+        adquirido = self._cupos.acquire(timeout=esperar) if esperar > 0 else self._cupos.acquire(blocking=False)
+        if not adquirido:
+            CALCULOS.labels(nombre, "saturado").inc()
+            raise PoolSaturado("El servidor está ocupado con otros cálculos; reintenta en unos segundos")
+
+        entradas = []
+        inicio = time.perf_counter()
+        resultado_metrica = "error"
+        self._contar(1)
+        try:
+            args_compartidos = _compartir(args, entradas)
+            kwargs_compartidos = _compartir(kwargs, entradas)
+            reintentado = False
+            while True:
+                pool = self._executor()
+                futuro = pool.submit(_en_proceso, funcion, args_compartidos, kwargs_compartidos)
+                try:
+                    restante = max(timeout - (time.perf_counter() - inicio), 0.001)
+                    resultado = futuro.result(timeout=restante)
+                    break
+                except TiempoAgotado:
+                    resultado_metrica = "timeout"
+                    logger.warning(f"Cálculo {nombre} superó {timeout:g} s; se recicla el pool de procesos")
+                    self._reciclar(pool)
+                    raise CalculoAgotado(f"El cálculo superó el límite de {timeout:g} s")
+                except BrokenProcessPool:
+                    # Si otro trabajo recicló este pool se reintenta una vez en el nuevo
+                    if not reintentado and self._pool is not pool:
+                        reintentado = True
+                        continue
+                    self._reciclar(pool)
+                    raise CalculoFallido("El proceso de cálculo terminó inesperadamente")
+
+            salidas = []
+            try:
+                resultado = _abrir(resultado, salidas, copiar=True)
+            finally:
+                _cerrar(salidas, eliminar=True)
+            resultado_metrica = "ok"
+            return resultado
+        finally:
+            _cerrar(entradas, eliminar=True)
+            self._contar(-1)
+            self._cupos.release()
+            CALCULOS.labels(nombre, resultado_metrica).inc()
+            CALCULO_DURACION.labels(nombre).observe(time.perf_counter() - inicio)
+
+    def cerrar(self):
+        with self._candado:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+pool_calculo = PoolCalculo(
+    procesos=settings.calculo_procesos,
+    cola=settings.calculo_cola,
+    timeout=settings.calculo_timeout_segundos,
+)
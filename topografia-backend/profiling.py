@@ -0,0 +1,224 @@
+"""
+Perfilado bajo demanda de peticiones individuales (pensado para staging).
+
+Una petición se perfila si un administrador envía la cabecera `X-Profile: 1`
+o si cae en la fracción muestreada `profiling_sample_rate`. Para esas
+peticiones se ejecuta el handler bajo cProfile y tracemalloc, y el resultado
+(estadísticas, archivo .prof y las N líneas que más memoria asignan) queda
+disponible en /admin/perfiles/{request_id}. El id se devuelve en la cabecera
+`X-Profile-Id`.
+
+cProfile sólo mide el hilo en el que se activa y los endpoints síncronos corren
+en el threadpool. La primera petición perfilada envuelve la función de cada
+ruta de la aplicación (`dependant.call`) para que active el perfil en el hilo
+que la ejecuta: los endpoints siguen en el threadpool y el event loop no se
+bloquea mientras se perfila.
+"""
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+import asyncio
+import cProfile
+import functools
+import io
+import marshal
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from fastapi.security import HTTPAuthorizationCredentials
+
+from config import settings
+
+CABECERA_PERFIL = "x-profile"
+CABECERA_ID = "x-profile-id"
+
+
+@dataclass
+class Perfil:
+    """Perfil de una petición en curso"""
+    request_id: str
+    metodo: str
+    ruta: str
+    motivo: str
+    profiler: cProfile.Profile = field(default_factory=cProfile.Profile)
+    # Un endpoint ya lo tiene activo (p. ej. las sub-peticiones de POST /batch)
+    activo: bool = False
+
+
+_perfil_actual: ContextVar[Optional[Perfil]] = ContextVar("perfil_actual", default=None)
+
+_resultados = OrderedDict()
+_candado = threading.Lock()
+_perfiles_activos = 0  # Sólo se modifica desde el event loop
+
+
+def _es_admin_por_token(headers: dict) -> bool:
+    """Valida el Bearer token como get_supabase_user y comprueba que sea admin"""
+    from auth import get_supabase_user
+    from dependencies import es_administrador
+
+    autorizacion = headers.get(b"authorization", b"").decode()
+    if not autorizacion.lower().startswith("bearer "):
+        return False
+    try:
+        usuario = get_supabase_user(HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials=autorizacion[7:]
+        ))
+    except HTTPException:
+        return False
+    return es_administrador(usuario)
+
+
+def _guardar(perfil: Perfil, duracion: float, asignaciones):
+    salida = io.StringIO()
+    estadisticas = pstats.Stats(perfil.profiler, stream=salida)
+    estadisticas.sort_stats("cumulative").print_stats(settings.profiling_top_n)
+
+    resultado = {
+        "request_id": perfil.request_id,
+        "metodo": perfil.metodo,
+        "ruta": perfil.ruta,
+        "motivo": perfil.motivo,
+        "fecha": datetime.now().isoformat(),
+        "duracion_ms": round(duracion * 1000, 2),
+        "estadisticas": salida.getvalue(),
+        "asignaciones": asignaciones,
+        # Formato de pstats.dump_stats: se abre con snakeviz, flameprof o gprof2dot
+        "prof": marshal.dumps(estadisticas.stats),
+    }
+    with _candado:
+        _resultados[perfil.request_id] = resultado
+        while len(_resultados) > settings.profiling_buffer_size:
+            _resultados.popitem(last=False)
+
+
+class ProfilingMiddleware:
+    """Decide qué peticiones se perfilan y mide su memoria con tracemalloc"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _perfiles_activos
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # cProfile y tracemalloc son globales al hilo/proceso: un perfil a la vez
+        if _perfiles_activos:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(CABECERA_PERFIL.encode()) and _es_admin_por_token(headers):
+            motivo = "cabecera"
+        elif settings.profiling_sample_rate and random.random() < settings.profiling_sample_rate:
+            motivo = "muestreo"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        instalar_perfilado(scope["app"])
+        perfil = Perfil(
+            request_id=uuid.uuid4().hex,
+            metodo=scope["method"],
+            ruta=scope["path"],
+            motivo=motivo,
+        )
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [
+                    (CABECERA_ID.encode(), perfil.request_id.encode())
+                ]
+            await send(mensaje)
+
+        _perfiles_activos += 1
+        tracemalloc.start(10)
+        token = _perfil_actual.set(perfil)
+        antes = tracemalloc.take_snapshot()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            _perfil_actual.reset(token)
+            diferencias = tracemalloc.take_snapshot().compare_to(antes, "lineno")
+            tracemalloc.stop()
+            _perfiles_activos -= 1
+            asignaciones = [
+                {"linea": str(d.traceback), "bytes": d.size_diff, "bloques": d.count_diff}
+                for d in diferencias[:settings.profiling_top_n]
+            ]
+            _guardar(perfil, duracion, asignaciones)
+
+
+def _activar(perfil: Optional[Perfil]) -> bool:
+    if perfil is None or perfil.activo:
+        return False
+    perfil.activo = True
+    perfil.profiler.enable()
+    return True
+
+
+def _desactivar(perfil: Perfil):
+    perfil.profiler.disable()
+    perfil.activo = False
+
+
+def _llamada_perfilable(llamada):
+    """Envuelve el endpoint para activar cProfile en el hilo que lo ejecuta"""
+    if asyncio.iscoroutinefunction(llamada):
+        @functools.wraps(llamada)
+        async def envoltura(*args, **kwargs):
+            perfil = _perfil_actual.get()
+            if not _activar(perfil):
+                return await llamada(*args, **kwargs)
+            try:
+                return await llamada(*args, **kwargs)
+            finally:
+                _desactivar(perfil)
+    else:
+        @functools.wraps(llamada)
+        def envoltura(*args, **kwargs):
+            # FastAPI la ejecuta en el threadpool, con el contexto de la petición
+            perfil = _perfil_actual.get()
+            if not _activar(perfil):
+                return llamada(*args, **kwargs)
+            try:
+                return llamada(*args, **kwargs)
+            finally:
+                _desactivar(perfil)
+    envoltura.perfilable = True
+    return envoltura
+
+
+def instalar_perfilado(app):
+    """Envuelve una vez los endpoints de todas las rutas de la aplicación"""
+    if getattr(app.state, "perfilado_instalado", False):
+        return
+    for ruta in app.routes:
+        if isinstance(ruta, APIRoute) and not getattr(ruta.dependant.call, "perfilable", False):
+            ruta.dependant.call = _llamada_perfilable(ruta.dependant.call)
+    app.state.perfilado_instalado = True
+
+
+def listar_perfiles():
+    with _candado:
+        return [
+            {k: v for k, v in r.items() if k not in ("estadisticas", "asignaciones", "prof")}
+            for r in reversed(_resultados.values())
+        ]
+
+
+def obtener_perfil(request_id: str) -> Optional[dict]:
+    with _candado:
+        return _resultados.get(request_id)
@@ -0,0 +1,70 @@
+"""
+Enrutamiento de lecturas a la réplica con lectura de las propias escrituras.
+
+Los GET pesados (listas, tramos, alertas, exportaciones) usan `get_read_db`,
+que abre la sesión contra DATABASE_READ_URL. La réplica va unos instantes
+por detrás del primario, así que después de una escritura correcta
+(POST/PUT/PATCH/DELETE con estado < 400) el usuario queda fijado al primario
+durante REPLICA_FIJAR_SEGUNDOS: el autosave seguido de un refresco nunca ve
+datos anteriores a su propio guardado.
+
+La marca se guarda en la caché compartida; con varios workers hace falta
+CACHE_BACKEND=redis para que la vean todos.
+"""
+from cache import cache
+from config import settings
+from database import engine, read_engine
+from metrics import SESIONES_LECTURA
+
+METODOS_ESCRITURA = {"POST", "PUT", "PATCH", "DELETE"}
+
+_escrituras_recientes = cache.espacio("primario", ttl=settings.replica_fijar_segundos)
+
+
+def hay_replica() -> bool:
+    return read_engine is not engine
+
+
+def registrar_escritura(usuario_id):
+    """Fija al usuario al primario durante REPLICA_FIJAR_SEGUNDOS"""
+    if hay_replica():
+        _escrituras_recientes.set(str(usuario_id), True)
+
+
+def usar_replica(usuario_id) -> bool:
+    """Indica si las lecturas del usuario pueden ir a la réplica"""
+    if not hay_replica():
+        return False
+    if usuario_id is not None and _escrituras_recientes.get(str(usuario_id)) is not None:
+        SESIONES_LECTURA.labels("primario").inc()
+        return False
+    SESIONES_LECTURA.labels("replica").inc()
+    return True
+
+
+class FijarPrimarioMiddleware:
+    """
+    Middleware ASGI puro. `get_supabase_user` deja el id del usuario en
+    request.state; al empezar una respuesta correcta a una escritura se
+    registra antes de que el cliente la reciba.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METODOS_ESCRITURA or not hay_replica():
+            await self.app(scope, receive, send)
+            return
+
+        # request.state se guarda en scope["state"]; se crea aquí para compartir el mismo dict
+        estado = scope.setdefault("state", {})
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start" and mensaje["status"] < 400:
+                usuario_id = estado.get("usuario_id")
+                if usuario_id is not None:
+                    registrar_escritura(usuario_id)
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
@@ -4,11 +4,15 @@ from . import proyectos
 from . import estaciones
 from . import mediciones
 from . import lecturas
+from . import admin
+from . import lotes
 
 __all__ = [
     "usuarios",
     "proyectos", 
     "estaciones",
     "mediciones",
-    "lecturas"
+    "lecturas",
+    "admin",
+    "lotes"
 ]
\ No newline at end of file
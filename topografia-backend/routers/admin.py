@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from auth import CurrentUser
+from dependencies import get_admin_user
+from slow_queries import obtener_registros, limpiar_registros
+from profiling import listar_perfiles, obtener_perfil
+
+router = APIRouter()
+
+@router.get("/consultas-lentas")
+def get_consultas_lentas(
+    limit: int = 50,
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    """Consultas lentas muestreadas, las más recientes primero, con su plan de ejecución"""
+    return obtener_registros(limit)
+
+@router.delete("/consultas-lentas")
+def delete_consultas_lentas(
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    """Vaciar el buffer de consultas lentas"""
+    limpiar_registros()
+    return {"message": "Registro de consultas lentas vaciado"}
+
+
+@router.get("/perfiles")
+def get_perfiles(
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    """Peticiones perfiladas disponibles, las más recientes primero"""
+    return listar_perfiles()
+
+@router.get("/perfiles/{request_id}")
+def get_perfil(
+    request_id: str,
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    """Estadísticas de cProfile y top de asignaciones de memoria de una petición"""
+    perfil = obtener_perfil(request_id)
+    if not perfil:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Perfil no encontrado (puede haber sido descartado del buffer)"
+        )
+    return {k: v for k, v in perfil.items() if k != "prof"}
+
+@router.get("/perfiles/{request_id}/prof")
+def get_perfil_prof(
+    request_id: str,
+    admin: CurrentUser = Depends(get_admin_user)
+):
+    """Archivo .prof (formato pstats) para generar el flame graph con snakeviz o flameprof"""
+    perfil = obtener_perfil(request_id)
+    if not perfil:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Perfil no encontrado (puede haber sido descartado del buffer)"
+        )
+    return Response(
+        content=perfil["prof"],
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{request_id}.prof"'}
+    )
\ No newline at end of file
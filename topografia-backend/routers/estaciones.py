@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
@@ -6,21 +7,34 @@ from auth import get_supabase_user, CurrentUser
 from schemas import estacion as schemas
 from models.estacion import EstacionTeorica
 from models.proyecto import Proyecto
+from models.medicion import MedicionEstacion
+from dependencies import get_read_db, limitar_escrituras, usuario_tiene_proyecto
+from services import alertas, respuestas
+from cache import cache
 
 router = APIRouter()
 
+def programar_alertas(db: Session, proyecto_id: int, *kms):
+    """
+    La estación cambia el diseño de su km: las mediciones de ese km se
+    recalculan tras el commit, en la misma cola que las lecturas
+    """
+    medicion_ids = db.scalars(select(MedicionEstacion.id).where(
+        MedicionEstacion.proyecto_id == proyecto_id,
+        MedicionEstacion.estacion_km.in_(set(kms))
+    ))
+    for medicion_id in medicion_ids:
+        alertas.programar_recalculo(db, proyecto_id, medicion_id)
+
 def verify_estacion_access(
     estacion_id: int,
     current_user: CurrentUser,
     db: Session
 ) -> EstacionTeorica:
     """Verificar que el usuario tenga acceso a la estación"""
-    estacion = db.query(EstacionTeorica).join(Proyecto).filter(
-        EstacionTeorica.id == estacion_id,
-        Proyecto.usuario_id == current_user.id
-    ).first()
+    estacion = db.get(EstacionTeorica, estacion_id)
     
-    if not estacion:
+    if not estacion or not usuario_tiene_proyecto(db, current_user.id, estacion.proyecto_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Estación no encontrada o no tienes permisos para accederla"
@@ -34,15 +48,19 @@ def get_estaciones(
     skip: int = 0,
     limit: int = 100,
     current_user: CurrentUser = Depends(get_supabase_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Listar estaciones, opcionalmente filtradas por proyecto"""
-    query = db.query(EstacionTeorica).join(Proyecto).filter(
-        Proyecto.usuario_id == current_user.id
-    )
-    
     if proyecto_id:
-        query = query.filter(EstacionTeorica.proyecto_id == proyecto_id)
+        # Con la propiedad verificada (y cacheada) basta con filtrar por proyecto
+        if not usuario_tiene_proyecto(db, current_user.id, proyecto_id):
+            return []
+        query = db.query(EstacionTeorica).filter(EstacionTeorica.proyecto_id == proyecto_id)
+    else:
+        query = db.query(EstacionTeorica).join(Proyecto).filter(
+            Proyecto.usuario_id == current_user.id,
+            Proyecto.eliminado_en.is_(None)
+        )
     
     estaciones = query.order_by(EstacionTeorica.km).offset(skip).limit(limit).all()
     return estaciones
@@ -51,13 +69,13 @@ def get_estaciones(
 def get_estacion(
     estacion_id: int,
     current_user: CurrentUser = Depends(get_supabase_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Obtener estación específica"""
     estacion = verify_estacion_access(estacion_id, current_user, db)
     return estacion
 
-@router.post("/", response_model=schemas.EstacionTeoricaResponse)
+@router.post("/", response_model=schemas.EstacionTeoricaResponse, dependencies=[Depends(limitar_escrituras)])
 def create_estacion(
     estacion: schemas.EstacionTeoricaCreate,
     current_user: CurrentUser = Depends(get_supabase_user),
@@ -65,12 +83,7 @@ def create_estacion(
 ):
     """Crear nueva estación"""
     # Verificar que el proyecto pertenezca al usuario
-    proyecto = db.query(Proyecto).filter(
-        Proyecto.id == estacion.proyecto_id,
-        Proyecto.usuario_id == current_user.id
-    ).first()
-    
-    if not proyecto:
+    if not usuario_tiene_proyecto(db, current_user.id, estacion.proyecto_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Proyecto no encontrado o no tienes permisos"
@@ -90,11 +103,15 @@ def create_estacion(
     
     db_estacion = EstacionTeorica(**estacion.dict())
     db.add(db_estacion)
+    programar_alertas(db, estacion.proyecto_id, estacion.km)
+    # Revisión nueva: ningún worker vuelve a servir las respuestas cacheadas anteriores
+    respuestas.incrementar_revision(db, estacion.proyecto_id)
     db.commit()
     db.refresh(db_estacion)
+    cache.respuestas.invalidar_proyecto(estacion.proyecto_id)
     return db_estacion
 
-@router.put("/{estacion_id}", response_model=schemas.EstacionTeoricaResponse)
+@router.put("/{estacion_id}", response_model=schemas.EstacionTeoricaResponse, dependencies=[Depends(limitar_escrituras)])
 def update_estacion(
     estacion_id: int,
     estacion_update: schemas.EstacionTeoricaUpdate,
@@ -120,14 +137,20 @@ def update_estacion(
                 detail=f"Ya existe otra estación en el km {update_data['km']}"
             )
     
+    km_anterior = db_estacion.km
     for field, value in update_data.items():
         setattr(db_estacion, field, value)
     
+    # Si cambia el km, quedan afectadas las mediciones del km anterior y las del nuevo
+    db.flush()
+    programar_alertas(db, db_estacion.proyecto_id, km_anterior, db_estacion.km)
+    respuestas.incrementar_revision(db, db_estacion.proyecto_id)
     db.commit()
     db.refresh(db_estacion)
+    cache.respuestas.invalidar_proyecto(db_estacion.proyecto_id)
     return db_estacion
 
-@router.patch("/{estacion_id}", response_model=schemas.EstacionTeoricaResponse)
+@router.patch("/{estacion_id}", response_model=schemas.EstacionTeoricaResponse, dependencies=[Depends(limitar_escrituras)])
 def patch_estacion(
     estacion_id: int,
     estacion_update: schemas.EstacionTeoricaUpdate,
@@ -137,7 +160,7 @@ def patch_estacion(
     """Actualizar estación parcial"""
     return update_estacion(estacion_id, estacion_update, current_user, db)
 
-@router.delete("/{estacion_id}")
+@router.delete("/{estacion_id}", dependencies=[Depends(limitar_escrituras)])
 def delete_estacion(
     estacion_id: int,
     current_user: CurrentUser = Depends(get_supabase_user),
@@ -145,8 +168,13 @@ def delete_estacion(
 ):
     """Eliminar estación"""
     db_estacion = verify_estacion_access(estacion_id, current_user, db)
+    proyecto_id = db_estacion.proyecto_id
     
     db.delete(db_estacion)
+    # Sin estación el km queda con el alineamiento o con sin_estacion
+    programar_alertas(db, proyecto_id, db_estacion.km)
+    respuestas.incrementar_revision(db, proyecto_id)
     db.commit()
+    cache.respuestas.invalidar_proyecto(proyecto_id)
     
     return {"message": "Estación eliminada correctamente"}
\ No newline at end of file
@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func, literal, select
 from sqlalchemy.orm import Session
 from typing import List
-from database import get_db
+from database import get_db, insert_con_conflicto
 from auth import get_supabase_user, CurrentUser
 from schemas import lectura as schemas
 from models.lectura import LecturaDivision
 from models.medicion import MedicionEstacion
 from models.proyecto import Proyecto
+from dependencies import get_read_db, limitar_escrituras, obtener_medicion_autorizada, medicion_autorizada, proyecto_de_medicion, usuario_tiene_proyecto
+from services import punto_fijo
+from services import alertas
 
 router = APIRouter()
 
@@ -16,14 +20,9 @@ def verify_lectura_access(
     db: Session
 ) -> LecturaDivision:
     """Verificar que el usuario tenga acceso a la lectura"""
-    lectura = db.query(LecturaDivision).join(
-        MedicionEstacion
-    ).join(Proyecto).filter(
-        LecturaDivision.id == lectura_id,
-        Proyecto.usuario_id == current_user.id
-    ).first()
+    lectura = db.get(LecturaDivision, lectura_id)
     
-    if not lectura:
+    if not lectura or not usuario_tiene_proyecto(db, current_user.id, lectura.proyecto_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Lectura no encontrada o no tienes permisos para accederla"
@@ -37,10 +36,7 @@ def verify_medicion_access(
     db: Session
 ) -> MedicionEstacion:
     """Verificar que el usuario tenga acceso a la medición"""
-    medicion = db.query(MedicionEstacion).join(Proyecto).filter(
-        MedicionEstacion.id == medicion_id,
-        Proyecto.usuario_id == current_user.id
-    ).first()
+    medicion = obtener_medicion_autorizada(db, current_user.id, medicion_id)
     
     if not medicion:
         raise HTTPException(
@@ -53,97 +49,107 @@ def verify_medicion_access(
 @router.get("/", response_model=List[schemas.LecturaDivisionResponse])
 def get_lecturas(
     medicion_id: int = None,
+    proyecto_id: int = None,
     skip: int = 0,
     limit: int = 100,
     current_user: CurrentUser = Depends(get_supabase_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Listar lecturas, opcionalmente filtradas por medición"""
-    query = db.query(LecturaDivision).join(
-        MedicionEstacion
-    ).join(Proyecto).filter(
-        Proyecto.usuario_id == current_user.id
-    )
-    
+    """Listar lecturas, opcionalmente filtradas por medición o por proyecto"""
     if medicion_id:
-        query = query.filter(LecturaDivision.medicion_id == medicion_id)
+        # Con la propiedad verificada (y cacheada) basta con filtrar por medición
+        if not medicion_autorizada(db, current_user.id, medicion_id):
+            return []
+        query = db.query(LecturaDivision).filter(LecturaDivision.medicion_id == medicion_id)
+        if proyecto_id:
+            query = query.filter(LecturaDivision.proyecto_id == proyecto_id)
+        query = query.order_by(LecturaDivision.division_transversal)
+    elif proyecto_id:
+        # Rango de ix_lecturas_proyecto_medicion_division, sin join ni ordenación extra
+        if not usuario_tiene_proyecto(db, current_user.id, proyecto_id):
+            return []
+        query = db.query(LecturaDivision).filter(
+            LecturaDivision.proyecto_id == proyecto_id
+        ).order_by(LecturaDivision.medicion_id, LecturaDivision.division_transversal)
+    else:
+        query = db.query(LecturaDivision).join(Proyecto).filter(
+            Proyecto.usuario_id == current_user.id,
+            Proyecto.eliminado_en.is_(None)
+        ).order_by(LecturaDivision.division_transversal)
     
-    lecturas = query.order_by(LecturaDivision.division_transversal).offset(skip).limit(limit).all()
+    lecturas = query.offset(skip).limit(limit).all()
     return lecturas
 
 @router.get("/{lectura_id}", response_model=schemas.LecturaDivisionResponse)
 def get_lectura(
     lectura_id: int,
     current_user: CurrentUser = Depends(get_supabase_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Obtener lectura específica"""
     lectura = verify_lectura_access(lectura_id, current_user, db)
     return lectura
 
-@router.post("/", response_model=schemas.LecturaDivisionResponse)
+@router.post("/", response_model=schemas.LecturaDivisionResponse, dependencies=[Depends(limitar_escrituras)])
 def create_lectura(
     lectura: schemas.LecturaDivisionCreate,
     current_user: CurrentUser = Depends(get_supabase_user),
     db: Session = Depends(get_db)
 ):
-    """Crear nueva lectura o actualizar existente (UPSERT)"""
-    # Verificar que la medición pertenezca al usuario
-    medicion = verify_medicion_access(lectura.medicion_id, current_user, db)
+    """
+    Crear nueva lectura o actualizar existente (UPSERT).
+    Una sola sentencia INSERT ... SELECT ... ON CONFLICT DO UPDATE ... RETURNING:
+    elv_base_real y proyecto_id salen de la medición dentro de la propia consulta,
+    así que no hay lectura previa ni carrera entre escritores de la misma división.
+    """
+    # Verificar que la medición pertenezca al usuario (cacheado: sin consulta en el autosave)
+    proyecto_id = proyecto_de_medicion(db, current_user.id, lectura.medicion_id)
+    if proyecto_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Medición no encontrada o no tienes permisos para accederla"
+        )
     
-    # Buscar si ya existe una lectura para esta medición y división
-    lectura_existente = db.query(LecturaDivision).filter(
-        LecturaDivision.medicion_id == lectura.medicion_id,
-        LecturaDivision.division_transversal == lectura.division_transversal
-    ).first()
+    valores = select(
+        MedicionEstacion.id,
+        MedicionEstacion.proyecto_id,
+        literal(lectura.division_transversal, LecturaDivision.division_transversal.type),
+        literal(lectura.lectura_mira, LecturaDivision.lectura_mira.type),
+        MedicionEstacion.altura_aparato - literal(lectura.lectura_mira, LecturaDivision.lectura_mira.type),
+        literal(lectura.calidad, LecturaDivision.calidad.type),
+    ).where(MedicionEstacion.id == lectura.medicion_id)
     
-    if lectura_existente:
-        # Actualizar lectura existente (comportamiento UPSERT)
-        lectura_existente.lectura_mira = lectura.lectura_mira
-        
-        # Recalcular elv_base_real si tenemos la información necesaria
-        if medicion.altura_aparato:
-            lectura_existente.elv_base_real = medicion.altura_aparato - lectura.lectura_mira
-        
-        db.commit()
-        db.refresh(lectura_existente)
-        return lectura_existente
-    else:
-        # Crear nueva lectura
-        db_lectura = LecturaDivision(**lectura.dict())
-        
-        # Calcular elv_base_real si tenemos la información necesaria
-        if medicion.altura_aparato:
-            db_lectura.elv_base_real = medicion.altura_aparato - lectura.lectura_mira
-        
-        try:
-            db.add(db_lectura)
-            db.commit()
-            db.refresh(db_lectura)
-            return db_lectura
-        except Exception as e:
-            db.rollback()
-            # Si falla por constraint único, intentar actualizar en su lugar
-            if "unique constraint" in str(e).lower() or "duplicate key" in str(e).lower():
-                lectura_existente = db.query(LecturaDivision).filter(
-                    LecturaDivision.medicion_id == lectura.medicion_id,
-                    LecturaDivision.division_transversal == lectura.division_transversal
-                ).first()
-                
-                if lectura_existente:
-                    lectura_existente.lectura_mira = lectura.lectura_mira
-                    if medicion.altura_aparato:
-                        lectura_existente.elv_base_real = medicion.altura_aparato - lectura.lectura_mira
-                    db.commit()
-                    db.refresh(lectura_existente)
-                    return lectura_existente
-            
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Error creando lectura: {str(e)}"
-            )
+    insercion = insert_con_conflicto(db, LecturaDivision).from_select(
+        ["medicion_id", "proyecto_id", "division_transversal", "lectura_mira", "elv_base_real", "calidad"],
+        valores
+    )
+    upsert = insercion.on_conflict_do_update(
+        index_elements=[LecturaDivision.medicion_id, LecturaDivision.division_transversal],
+        set_={
+            "lectura_mira": insercion.excluded.lectura_mira,
+            "elv_base_real": insercion.excluded.elv_base_real,
+            # Parte de la huella de los reportes (services/reportes.py)
+            "fecha_calculo": func.now(),
+        }
+    ).returning(LecturaDivision)
+    
+    db_lectura = db.scalars(upsert, execution_options={"populate_existing": True}).first()
+    if db_lectura is None:
+        # La medición se eliminó entre la verificación y la escritura
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Medición no encontrada o no tienes permisos para accederla"
+        )
+    
+    # Fuera de la sesión el commit no la expira: la respuesta no vuelve a consultar
+    db.expunge(db_lectura)
+    # Las alertas de la medición se recalculan fuera del autosave, tras el commit
+    alertas.programar_recalculo(db, proyecto_id, lectura.medicion_id)
+    db.commit()
+    return db_lectura
 
-@router.put("/{lectura_id}", response_model=schemas.LecturaDivisionResponse)
+@router.put("/{lectura_id}", response_model=schemas.LecturaDivisionResponse, dependencies=[Depends(limitar_escrituras)])
 def update_lectura(
     lectura_id: int,
     lectura_update: schemas.LecturaDivisionUpdate,
@@ -165,13 +171,20 @@ def update_lectura(
         ).first()
         
         if medicion and medicion.altura_aparato:
-            db_lectura.elv_base_real = medicion.altura_aparato - db_lectura.lectura_mira
+            # Resta exacta en micras, con la escala de la columna
+            db_lectura.elv_base_real = punto_fijo.a_decimal(
+                punto_fijo.a_entero(medicion.altura_aparato, punto_fijo.MICRAS)
+                - punto_fijo.a_entero(db_lectura.lectura_mira, punto_fijo.MICRAS),
+                punto_fijo.MICRAS
+            )
     
+    db_lectura.fecha_calculo = func.now()
+    alertas.programar_recalculo(db, db_lectura.proyecto_id, db_lectura.medicion_id)
     db.commit()
     db.refresh(db_lectura)
     return db_lectura
 
-@router.patch("/{lectura_id}", response_model=schemas.LecturaDivisionResponse)
+@router.patch("/{lectura_id}", response_model=schemas.LecturaDivisionResponse, dependencies=[Depends(limitar_escrituras)])
 def patch_lectura(
     lectura_id: int,
     lectura_update: schemas.LecturaDivisionUpdate,
@@ -181,7 +194,7 @@ def patch_lectura(
     """Actualizar lectura parcial"""
     return update_lectura(lectura_id, lectura_update, current_user, db)
 
-@router.delete("/{lectura_id}")
+@router.delete("/{lectura_id}", dependencies=[Depends(limitar_escrituras)])
 def delete_lectura(
     lectura_id: int,
     current_user: CurrentUser = Depends(get_supabase_user),
@@ -189,8 +202,10 @@ def delete_lectura(
 ):
     """Eliminar lectura"""
     db_lectura = verify_lectura_access(lectura_id, current_user, db)
+    proyecto_id, medicion_id = db_lectura.proyecto_id, db_lectura.medicion_id
     
     db.delete(db_lectura)
+    alertas.programar_recalculo(db, proyecto_id, medicion_id)
     db.commit()
     
     return {"message": "Lectura eliminada correctamente"}
\ No newline at end of file
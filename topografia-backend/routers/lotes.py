@@ -0,0 +1,200 @@
+"""
+POST /batch: varias peticiones a la API en un solo viaje de red.
+
+Las tabletas de campo pagan un RTT completo por llamada y guardar una
+estación son varias (la medición, sus lecturas y una relectura). El lote
+ejecuta las sub-peticiones en orden contra la propia aplicación ASGI, con
+la cabecera Authorization del lote, así que pasan por la misma validación,
+dependencias, límites de escritura y métricas que si llegaran por separado.
+
+Todas comparten una sesión de base de datos (`database.sesion_lote`). Con
+`transaccion` la sesión trabaja sobre una transacción externa y los commit
+de las rutas sólo liberan un SAVEPOINT: si una sub-petición responde >= 400
+las siguientes no se ejecutan (424) y se deshace todo el lote. Las rutas con
+tareas en segundo plano (recálculo de alertas, purga, reportes) abren su
+propia sesión y no verían la transacción, así que no se admiten en un lote
+transaccional; el recálculo de alertas de lecturas y mediciones sí se admite
+porque se programa al confirmarse la transacción externa. Sin `transaccion`
+cada sub-petición confirma sus cambios y un error no detiene las siguientes.
+
+Las tareas en segundo plano de una sub-petición se ejecutan antes de pasar a
+la siguiente.
+"""
+from typing import Optional
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from starlette.routing import Match
+
+from auth import get_supabase_user, CurrentUser
+from config import settings
+from database import SessionLocal, engine, sesion_lote
+from schemas import lote as schemas
+from services import alertas
+
+router = APIRouter()
+
+# Cabeceras de las sub-respuestas que se devuelven al cliente
+CABECERAS_DEVUELTAS = ("retry-after", "etag", "content-disposition")
+
+
+def _scope(request: Request, peticion: schemas.SubPeticion, cuerpo: bytes) -> dict:
+    """Scope ASGI de la sub-petición, con la autorización del lote"""
+    ruta, _, consulta = peticion.ruta.partition("?")
+    cabeceras = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(cuerpo)).encode()),
+    ]
+    autorizacion = request.headers.get("authorization")
+    if autorizacion:
+        cabeceras.append((b"authorization", autorizacion.encode()))
+    return {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": peticion.metodo,
+        "scheme": request.scope.get("scheme", "http"),
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": ruta,
+        "raw_path": ruta.encode(),
+        "query_string": consulta.encode(),
+        "headers": cabeceras,
+    }
+
+
+def _ruta_de(request: Request, scope: dict):
+    """Ruta de la aplicación que atendería el scope, o None"""
+    for ruta in request.app.router.routes:
+        coincidencia, _ = ruta.matches(scope)
+        if coincidencia == Match.FULL:
+            return ruta
+    return None
+
+
+async def _despachar(request: Request, scope: dict, cuerpo: bytes) -> schemas.SubRespuesta:
+    """Ejecuta la sub-petición en la aplicación y recoge su respuesta"""
+    inicio = {}
+    partes = []
+    recibido = False
+
+    async def recibir():
+        nonlocal recibido
+        if recibido:
+            return {"type": "http.disconnect"}
+        recibido = True
+        return {"type": "http.request", "body": cuerpo, "more_body": False}
+
+    async def enviar(mensaje):
+        if mensaje["type"] == "http.response.start":
+            inicio["estado"] = mensaje["status"]
+            inicio["cabeceras"] = {
+                clave.decode("latin-1").lower(): valor.decode("latin-1")
+                for clave, valor in mensaje.get("headers", [])
+            }
+        elif mensaje["type"] == "http.response.body":
+            partes.append(mensaje.get("body", b""))
+
+    try:
+        await request.app(scope, recibir, enviar)
+    except Exception:
+        # ServerErrorMiddleware relanza la excepción después de enviar el 500
+        if "estado" not in inicio:
+            raise
+
+    cabeceras = inicio.get("cabeceras", {})
+    contenido = b"".join(partes)
+    if not contenido:
+        cuerpo_respuesta = None
+    elif "json" in cabeceras.get("content-type", ""):
+        cuerpo_respuesta = json.loads(contenido)
+    else:
+        cuerpo_respuesta = contenido.decode("utf-8", "replace")
+    return schemas.SubRespuesta(
+        estado=inicio.get("estado", status.HTTP_500_INTERNAL_SERVER_ERROR),
+        cuerpo=cuerpo_respuesta,
+        cabeceras={c: cabeceras[c] for c in CABECERAS_DEVUELTAS if c in cabeceras},
+    )
+
+
+@router.post("", response_model=schemas.LoteResponse)
+async def ejecutar_lote(
+    lote: schemas.LoteCreate,
+    request: Request,
+    current_user: CurrentUser = Depends(get_supabase_user)
+):
+    """Ejecutar varias sub-peticiones en orden, con una sesión de base de datos compartida"""
+    if len(lote.peticiones) > settings.lote_max_peticiones:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Un lote admite como mucho {settings.lote_max_peticiones} peticiones"
+        )
+
+    preparadas = []
+    for i, peticion in enumerate(lote.peticiones):
+        cuerpo = b"" if peticion.cuerpo is None else json.dumps(peticion.cuerpo).encode()
+        scope = _scope(request, peticion, cuerpo)
+        if lote.transaccion:
+            ruta = _ruta_de(request, scope)
+            if ruta is not None and getattr(getattr(ruta, "dependant", None), "background_tasks_param_name", None):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"La petición {i} ({peticion.metodo} {peticion.ruta}) usa tareas en segundo plano "
+                           "y no puede ejecutarse en un lote transaccional"
+                )
+        preparadas.append((scope, cuerpo))
+
+    conexion = None
+    transaccion = None
+    if lote.transaccion:
+        conexion = await run_in_threadpool(engine.connect)
+        transaccion = await run_in_threadpool(conexion.begin)
+        if conexion.dialect.name == "sqlite":
+            # pysqlite no emite BEGIN hasta la primera escritura: el primer SAVEPOINT
+            # abriría la transacción y su RELEASE la confirmaría (sólo benchmarks)
+            await run_in_threadpool(conexion.exec_driver_sql, "BEGIN")
+        db = Session(bind=conexion, autoflush=False, join_transaction_mode="create_savepoint")
+        db.info["transaccion_lote"] = True
+    else:
+        db = SessionLocal()
+
+    respuestas = []
+    confirmado: Optional[bool] = None
+    token = sesion_lote.set(db)
+    try:
+        for i, (scope, cuerpo) in enumerate(preparadas):
+            respuesta = await _despachar(request, scope, cuerpo)
+            respuestas.append(respuesta)
+            # La caché de permisos de db.info vale para una petición, no para el lote
+            db.info.pop("acceso", None)
+            if respuesta.estado < 400:
+                continue
+            if lote.transaccion:
+                respuestas.extend(
+                    schemas.SubRespuesta(
+                        estado=status.HTTP_424_FAILED_DEPENDENCY,
+                        cuerpo={"detail": f"No se ejecutó: la petición {i} del lote falló"},
+                    )
+                    for _ in preparadas[i + 1:]
+                )
+                break
+            await run_in_threadpool(db.rollback)
+
+        if lote.transaccion:
+            confirmado = all(r.estado < 400 for r in respuestas)
+            await run_in_threadpool(transaccion.commit if confirmado else transaccion.rollback)
+            # Los recálculos de alertas anotados por las sub-peticiones esperan al commit real
+            if confirmado:
+                alertas.confirmar_programados(db)
+            else:
+                alertas.descartar_programados(db)
+    finally:
+        sesion_lote.reset(token)
+        await run_in_threadpool(db.close)
+        if conexion is not None:
+            await run_in_threadpool(conexion.close)
+
+    return schemas.LoteResponse(respuestas=respuestas, transaccion=lote.transaccion, confirmado=confirmado)
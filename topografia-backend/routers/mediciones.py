@@ -6,6 +6,12 @@ from auth import get_supabase_user, CurrentUser
 from schemas import medicion as schemas
 from models.medicion import MedicionEstacion
 from models.proyecto import Proyecto
+from dependencies import get_read_db, limitar_escrituras, obtener_medicion_autorizada, usuario_tiene_proyecto, registrar_medicion, olvidar_medicion
+from services.recalculo import recalcular_elv_base_real
+from services.seccion import plantilla_proyecto
+from services import alertas
+from services import respuestas
+from cache import cache
 from decimal import Decimal
 
 router = APIRouter()
@@ -16,10 +22,7 @@ def verify_medicion_access(
     db: Session
 ) -> MedicionEstacion:
     """Verificar que el usuario tenga acceso a la medición"""
-    medicion = db.query(MedicionEstacion).join(Proyecto).filter(
-        MedicionEstacion.id == medicion_id,
-        Proyecto.usuario_id == current_user.id
-    ).first()
+    medicion = obtener_medicion_autorizada(db, current_user.id, medicion_id)
     
     if not medicion:
         raise HTTPException(
@@ -35,15 +38,19 @@ def get_mediciones(
     skip: int = 0,
     limit: int = 100,
     current_user: CurrentUser = Depends(get_supabase_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Listar mediciones, opcionalmente filtradas por proyecto"""
-    query = db.query(MedicionEstacion).join(Proyecto).filter(
-        Proyecto.usuario_id == current_user.id
-    )
-    
     if proyecto_id:
-        query = query.filter(MedicionEstacion.proyecto_id == proyecto_id)
+        # Con la propiedad verificada (y cacheada) basta con filtrar por proyecto
+        if not usuario_tiene_proyecto(db, current_user.id, proyecto_id):
+            return []
+        query = db.query(MedicionEstacion).filter(MedicionEstacion.proyecto_id == proyecto_id)
+    else:
+        query = db.query(MedicionEstacion).join(Proyecto).filter(
+            Proyecto.usuario_id == current_user.id,
+            Proyecto.eliminado_en.is_(None)
+        )
     
     mediciones = query.order_by(MedicionEstacion.estacion_km).offset(skip).limit(limit).all()
     return mediciones
@@ -52,13 +59,13 @@ def get_mediciones(
 def get_medicion(
     medicion_id: int,
     current_user: CurrentUser = Depends(get_supabase_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Obtener medición específica"""
     medicion = verify_medicion_access(medicion_id, current_user, db)
     return medicion
 
-@router.post("/", response_model=schemas.MedicionEstacionResponse)
+@router.post("/", response_model=schemas.MedicionEstacionResponse, dependencies=[Depends(limitar_escrituras)])
 def create_medicion(
     medicion: schemas.MedicionEstacionCreate,
     current_user: CurrentUser = Depends(get_supabase_user),
@@ -66,12 +73,7 @@ def create_medicion(
 ):
     """Crear nueva medición"""
     # Verificar que el proyecto pertenezca al usuario
-    proyecto = db.query(Proyecto).filter(
-        Proyecto.id == medicion.proyecto_id,
-        Proyecto.usuario_id == current_user.id
-    ).first()
-    
-    if not proyecto:
+    if not usuario_tiene_proyecto(db, current_user.id, medicion.proyecto_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Proyecto no encontrado o no tienes permisos"
@@ -95,11 +97,18 @@ def create_medicion(
     
     db_medicion = MedicionEstacion(**medicion_data)
     db.add(db_medicion)
+    db.flush()
+    # Sin lecturas todavía: abre las alertas de divisiones faltantes tras el commit
+    alertas.programar_recalculo(db, db_medicion.proyecto_id, db_medicion.id)
+    # Revisión nueva: ningún worker vuelve a servir las respuestas cacheadas anteriores
+    respuestas.incrementar_revision(db, db_medicion.proyecto_id)
     db.commit()
     db.refresh(db_medicion)
+    cache.respuestas.invalidar_proyecto(db_medicion.proyecto_id)
+    registrar_medicion(db, current_user.id, db_medicion.id, db_medicion.proyecto_id)
     return db_medicion
 
-@router.put("/{medicion_id}", response_model=schemas.MedicionEstacionResponse)
+@router.put("/{medicion_id}", response_model=schemas.MedicionEstacionResponse, dependencies=[Depends(limitar_escrituras)])
 def update_medicion(
     medicion_id: int,
     medicion_update: schemas.MedicionEstacionUpdate,
@@ -131,11 +140,19 @@ def update_medicion(
     
     # NO recalcular altura_aparato - se calcula automáticamente en DB como GENERATED column
     
+    # Si cambia el banco de nivel, propagar la nueva altura a las lecturas en la misma transacción
+    db.flush()
+    if 'bn_altura' in update_data or 'bn_lectura' in update_data:
+        recalcular_elv_base_real(db, medicion_id)
+    alertas.programar_recalculo(db, db_medicion.proyecto_id, medicion_id)
+    respuestas.incrementar_revision(db, db_medicion.proyecto_id)
+    
     db.commit()
     db.refresh(db_medicion)
+    cache.respuestas.invalidar_proyecto(db_medicion.proyecto_id)
     return db_medicion
 
-@router.patch("/{medicion_id}", response_model=schemas.MedicionEstacionResponse)
+@router.patch("/{medicion_id}", response_model=schemas.MedicionEstacionResponse, dependencies=[Depends(limitar_escrituras)])
 def patch_medicion(
     medicion_id: int,
     medicion_update: schemas.MedicionEstacionUpdate,
@@ -145,7 +162,7 @@ def patch_medicion(
     """Actualizar medición parcial"""
     return update_medicion(medicion_id, medicion_update, current_user, db)
 
-@router.delete("/{medicion_id}")
+@router.delete("/{medicion_id}", dependencies=[Depends(limitar_escrituras)])
 def delete_medicion(
     medicion_id: int,
     current_user: CurrentUser = Depends(get_supabase_user),
@@ -153,12 +170,45 @@ def delete_medicion(
 ):
     """Eliminar medición"""
     db_medicion = verify_medicion_access(medicion_id, current_user, db)
+    proyecto_id = db_medicion.proyecto_id
     
     db.delete(db_medicion)
+    respuestas.incrementar_revision(db, proyecto_id)
     db.commit()
+    olvidar_medicion(current_user.id, medicion_id)
+    cache.respuestas.invalidar_proyecto(proyecto_id)
     
     return {"message": "Medición eliminada correctamente"}
 
+@router.get("/{medicion_id}/completitud", response_model=schemas.MedicionCompletitud)
+def get_completitud_medicion(
+    medicion_id: int,
+    current_user: CurrentUser = Depends(get_supabase_user),
+    db: Session = Depends(get_read_db)
+):
+    """Divisiones de la sección transversal del proyecto que aún no tienen lectura"""
+    from models.lectura import LecturaDivision
+    
+    medicion = verify_medicion_access(medicion_id, current_user, db)
+    plantilla = plantilla_proyecto(db, medicion.proyecto_id)
+    
+    capturadas = [
+        division for (division,) in db.query(LecturaDivision.division_transversal).filter(
+            LecturaDivision.medicion_id == medicion_id
+        )
+    ]
+    fuera = [float(d) for d in capturadas if not plantilla.contiene(d)]
+    faltantes = plantilla.faltantes(capturadas)
+    
+    return {
+        "medicion_id": medicion_id,
+        "total_divisiones": len(plantilla),
+        "capturadas": len(capturadas) - len(fuera),
+        "completa": not faltantes,
+        "faltantes": faltantes,
+        "fuera_de_seccion": fuera,
+    }
+
 # ✅ CORREGIDO: Endpoint para obtener lecturas de una medición
 @router.get("/{medicion_id}/lecturas/")
 def get_lecturas_medicion(
@@ -166,7 +216,7 @@ def get_lecturas_medicion(
     skip: int = 0,
     limit: int = 100,
     current_user: CurrentUser = Depends(get_supabase_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Obtener todas las lecturas de una medición"""
     from models.lectura import LecturaDivision
@@ -216,7 +266,7 @@ def get_lecturas_medicion(
 @router.get("/debug/estructura")
 def debug_estructura_medicion(
     current_user: CurrentUser = Depends(get_supabase_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Endpoint temporal para debuguear estructura de mediciones"""
     
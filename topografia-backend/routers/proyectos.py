@@ -1,14 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Response, UploadFile, status
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
 from auth import get_supabase_user, CurrentUser
-from dependencies import get_current_user_profile, get_user_project
+from dependencies import get_current_user_profile, get_user_project, get_user_project_lectura, get_read_db
 from schemas import proyecto as schemas
 from schemas import estacion as estacion_schemas
 from schemas import medicion as medicion_schemas
+from schemas import alineamiento as alineamiento_schemas
+from schemas import alerta as alerta_schemas
+from schemas import reporte as reporte_schemas
 from models.proyecto import Proyecto
 from models.estacion import EstacionTeorica
+from models.reporte import Reporte
+from cache import cache
+from services.purga import marcar_eliminado, purgar_proyecto
+from services.clonado import clonar_proyecto
+from services.diseno import ErrorRango, actualizar_rango
+from services import importacion_diseno
+from services import alineamiento as alineamiento_service
+from services import punto_fijo
+from services import tramo as tramo_service
+from services import alertas as alertas_service
+from services import respuestas
+from services import reportes as reportes_service
+from services import portafolio
+from config import settings
 import uuid
 from decimal import Decimal
 
@@ -19,11 +37,12 @@ def get_proyectos(
     skip: int = 0,
     limit: int = 100,
     current_user: CurrentUser = Depends(get_supabase_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Listar proyectos del usuario actual con TODOS los campos"""
     proyectos = db.query(Proyecto).filter(
-        Proyecto.usuario_id == current_user.id
+        Proyecto.usuario_id == current_user.id,
+        Proyecto.eliminado_en.is_(None)
     ).offset(skip).limit(limit).all()
     
     # ✅ CONVERSIÓN MANUAL para asegurar tipos correctos
@@ -49,36 +68,49 @@ def get_proyectos(
             "longitud_proyecto": float(proyecto.longitud_proyecto) if proyecto.longitud_proyecto else 0.0,
             "fecha_creacion": proyecto.fecha_creacion,
             "fecha_modificacion": proyecto.fecha_modificacion,
-            "estado": proyecto.estado or "CONFIGURACION"
+            "estado": proyecto.estado or "CONFIGURACION",
+            "revision": proyecto.revision or 1
         }
         proyectos_completos.append(proyecto_dict)
     
     return proyectos_completos
 
+@router.get("/resumen", response_model=List[schemas.ProyectoResumen])
+def get_resumen_proyectos(
+    current_user: CurrentUser = Depends(get_supabase_user),
+    db: Session = Depends(get_read_db)
+):
+    """Avance, cumplimiento y última actividad de todos los proyectos del usuario en una sola consulta"""
+    return portafolio.resumen_usuario(db, current_user.id)
+
 @router.get("/{proyecto_id}", response_model=schemas.ProyectoCompleto)  # ✅ CAMBIO: Schema completo
 def get_proyecto(
-    proyecto: Proyecto = Depends(get_user_project)
+    proyecto: Proyecto = Depends(get_user_project_lectura)
 ):
-    """Obtener proyecto específico con TODOS los campos"""
-    return {
-        "id": proyecto.id,
-        "usuario_id": str(proyecto.usuario_id),
-        "nombre": proyecto.nombre,
-        "tramo": proyecto.tramo,
-        "cuerpo": proyecto.cuerpo,
-        "km_inicial": float(proyecto.km_inicial) if proyecto.km_inicial else 0.0,
-        "km_final": float(proyecto.km_final) if proyecto.km_final else 0.0,
-        "intervalo": float(proyecto.intervalo) if proyecto.intervalo else 5.0,
-        "espesor": float(proyecto.espesor) if proyecto.espesor else 0.25,
-        "tolerancia_sct": float(proyecto.tolerancia_sct) if proyecto.tolerancia_sct else 0.005,
-        "divisiones_izquierdas": proyecto.divisiones_izquierdas or [],
-        "divisiones_derechas": proyecto.divisiones_derechas or [],
-        "total_estaciones": proyecto.total_estaciones,
-        "longitud_proyecto": float(proyecto.longitud_proyecto) if proyecto.longitud_proyecto else 0.0,
-        "fecha_creacion": proyecto.fecha_creacion,
-        "fecha_modificacion": proyecto.fecha_modificacion,
-        "estado": proyecto.estado or "CONFIGURACION"
-    }
+    """Obtener proyecto específico con TODOS los campos (cacheado por revisión)"""
+    def construir():
+        return schemas.ProyectoCompleto(**{
+            "id": proyecto.id,
+            "usuario_id": str(proyecto.usuario_id),
+            "nombre": proyecto.nombre,
+            "tramo": proyecto.tramo,
+            "cuerpo": proyecto.cuerpo,
+            "km_inicial": float(proyecto.km_inicial) if proyecto.km_inicial else 0.0,
+            "km_final": float(proyecto.km_final) if proyecto.km_final else 0.0,
+            "intervalo": float(proyecto.intervalo) if proyecto.intervalo else 5.0,
+            "espesor": float(proyecto.espesor) if proyecto.espesor else 0.25,
+            "tolerancia_sct": float(proyecto.tolerancia_sct) if proyecto.tolerancia_sct else 0.005,
+            "divisiones_izquierdas": proyecto.divisiones_izquierdas or [],
+            "divisiones_derechas": proyecto.divisiones_derechas or [],
+            "total_estaciones": proyecto.total_estaciones,
+            "longitud_proyecto": float(proyecto.longitud_proyecto) if proyecto.longitud_proyecto else 0.0,
+            "fecha_creacion": proyecto.fecha_creacion,
+            "fecha_modificacion": proyecto.fecha_modificacion,
+            "estado": proyecto.estado or "CONFIGURACION",
+            "revision": proyecto.revision or 1
+        })
+    
+    return respuestas.respuesta_json(proyecto, "proyecto", {}, construir)
 
 @router.post("/", response_model=schemas.ProyectoCompleto)  # ✅ CAMBIO: Schema completo
 def create_proyecto(
@@ -103,6 +135,8 @@ def create_proyecto(
     db.add(db_proyecto)
     db.commit()
     db.refresh(db_proyecto)
+    # Descarta denegaciones cacheadas para este id (p. ej. de una secuencia reiniciada)
+    cache.invalidar_proyecto(db_proyecto.id)
     
     # ✅ DEVOLVER con conversión correcta
     return get_proyecto(db_proyecto)
@@ -115,14 +149,9 @@ def create_proyecto_completo(
 ):
     """Crear proyecto completo con estaciones automáticas"""
     # Crear el proyecto base - EXCLUIR campos generados
-    proyecto_data = proyecto.dict(exclude={'generar_estaciones', 'total_estaciones', 'longitud_proyecto'})
+    proyecto_data = proyecto.dict(exclude={'generar_estaciones', 'alineamiento', 'total_estaciones', 'longitud_proyecto'})
     proyecto_data['usuario_id'] = uuid.UUID(current_user.id)
     
-    # ✅ Obtener valores para la creación de estaciones
-    km_inicial = float(proyecto_data['km_inicial'])
-    km_final = float(proyecto_data['km_final'])
-    intervalo = float(proyecto_data['intervalo'])
-    
     # ✅ ASEGURAR valores por defecto
     if 'espesor' not in proyecto_data or proyecto_data['espesor'] is None:
         proyecto_data['espesor'] = Decimal('0.25')
@@ -135,22 +164,27 @@ def create_proyecto_completo(
     db.add(db_proyecto)
     db.commit()
     db.refresh(db_proyecto)
+    cache.invalidar_proyecto(db_proyecto.id)
     
+    # Con alineamiento las estaciones son virtuales: sólo se guardan PVI y bombeo
+    if proyecto.alineamiento is not None:
+        alineamiento_service.guardar_alineamiento(db, db_proyecto.id, proyecto.alineamiento)
+        db.commit()
     # Generar estaciones automáticamente si se solicita
-    if proyecto.generar_estaciones:
-        km_actual = km_inicial
-        
-        while km_actual <= km_final:
-            estacion = EstacionTeorica(
-                proyecto_id=db_proyecto.id,
-                km=Decimal(str(km_actual)),
-                pendiente_derecha=Decimal('0.02'),  # Valor por defecto
-                base_cl=Decimal('1886.140'),  # Valor por defecto basado en tus datos
-                # ✅ NO incluir pendiente_izquierda - es generada automáticamente como (- pendiente_derecha)
-            )
-            db.add(estacion)
-            km_actual += intervalo
-        
+    elif proyecto.generar_estaciones:
+        # Km en milímetros enteros (services/punto_fijo.py): sin deriva de float y un solo INSERT
+        kms = alineamiento_service.km_estaciones(db_proyecto.km_inicial, db_proyecto.km_final, db_proyecto.intervalo)
+        if len(kms):
+            db.execute(insert(EstacionTeorica), [
+                {
+                    "proyecto_id": db_proyecto.id,
+                    "km": km,
+                    "pendiente_derecha": Decimal('0.020000'),  # Valor por defecto
+                    "base_cl": Decimal('1886.140000'),  # Valor por defecto basado en tus datos
+                    # ✅ NO incluir pendiente_izquierda - es generada automáticamente como (- pendiente_derecha)
+                }
+                for km in punto_fijo.a_decimales(kms, punto_fijo.MILIMETROS)
+            ])
         db.commit()
     
     # ✅ DEVOLVER con conversión correcta
@@ -159,6 +193,7 @@ def create_proyecto_completo(
 @router.put("/{proyecto_id}", response_model=schemas.ProyectoCompleto)
 def update_proyecto(
     proyecto_update: schemas.ProyectoUpdate,
+    background_tasks: BackgroundTasks,
     proyecto: Proyecto = Depends(get_user_project),
     db: Session = Depends(get_db)
 ):
@@ -170,12 +205,23 @@ def update_proyecto(
     
     for field, value in update_data.items():
         setattr(proyecto, field, value)
+    # Incremento atómico en la base de datos: dos actualizaciones simultáneas no comparten revisión
+    proyecto.revision = Proyecto.revision + 1
+    
+    # La tolerancia y la sección cambian las alertas de todas las mediciones
+    cambia_alertas = any(field in update_data for field in ['tolerancia_sct', 'divisiones_izquierdas', 'divisiones_derechas'])
+    if cambia_alertas:
+        db.flush()
+        alertas_service.marcar_recalculo_pendiente(db, proyecto.id)
     
     # ✅ NO recalcular campos generados - PostgreSQL los actualiza automáticamente
     # Los campos total_estaciones y longitud_proyecto son GENERATED ALWAYS
     
     db.commit()
     db.refresh(proyecto)
+    cache.invalidar_proyecto(proyecto.id)
+    if cambia_alertas:
+        background_tasks.add_task(alertas_service.recalcular_en_segundo_plano, proyecto.id)
     
     # ✅ DEVOLVER con conversión correcta
     return get_proyecto(proyecto)
@@ -183,98 +229,439 @@ def update_proyecto(
 @router.patch("/{proyecto_id}", response_model=schemas.ProyectoCompleto)
 def patch_proyecto(
     proyecto_update: schemas.ProyectoUpdate,
+    background_tasks: BackgroundTasks,
     proyecto: Proyecto = Depends(get_user_project),
     db: Session = Depends(get_db)
 ):
     """Actualizar proyecto parcial"""
-    return update_proyecto(proyecto_update, proyecto, db)
+    return update_proyecto(proyecto_update, background_tasks, proyecto, db)
 
 @router.delete("/{proyecto_id}")
 def delete_proyecto(
+    background_tasks: BackgroundTasks,
+    en_segundo_plano: bool = False,
     proyecto: Proyecto = Depends(get_user_project),
     db: Session = Depends(get_db)
 ):
-    """Eliminar proyecto"""
+    """
+    Eliminar proyecto. Estaciones, mediciones y lecturas las borra el ON DELETE
+    CASCADE de la base de datos, sin cargarlas. Con `en_segundo_plano=true` el
+    proyecto se oculta al instante y se purga por lotes tras responder.
+    """
+    proyecto_id = proyecto.id
+    if en_segundo_plano:
+        marcar_eliminado(db, proyecto)
+        cache.invalidar_proyecto(proyecto_id)
+        background_tasks.add_task(purgar_proyecto, proyecto_id)
+        return {"message": "Proyecto marcado para eliminación; se purgará en segundo plano"}
+    
     db.delete(proyecto)
     db.commit()
+    cache.invalidar_proyecto(proyecto_id)
     return {"message": "Proyecto eliminado correctamente"}
 
+@router.post("/{proyecto_id}/clonar", response_model=schemas.ProyectoCompleto)
+def clonar(
+    opciones: schemas.ProyectoClonar,
+    background_tasks: BackgroundTasks,
+    proyecto: Proyecto = Depends(get_user_project),
+    current_user: CurrentUser = Depends(get_supabase_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Clonar un proyecto como plantilla: configuración y estaciones de diseño
+    (opcionalmente también mediciones y lecturas), con desplazamiento de km y
+    subconjunto de rango. La copia se hace con INSERT ... SELECT en la base de datos.
+    """
+    if opciones.km_desde is not None and opciones.km_desde >= proyecto.km_final:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="km_desde está fuera del rango del proyecto"
+        )
+    if opciones.km_hasta is not None and opciones.km_hasta <= proyecto.km_inicial:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="km_hasta está fuera del rango del proyecto"
+        )
+    
+    nuevo = clonar_proyecto(db, proyecto, opciones, uuid.UUID(current_user.id))
+    db.commit()
+    db.refresh(nuevo)
+    cache.invalidar_proyecto(nuevo.id)
+    if opciones.incluir_campo:
+        background_tasks.add_task(alertas_service.recalcular_en_segundo_plano, nuevo.id)
+    
+    return get_proyecto(nuevo)
+
 # ✅ CORREGIDO: Endpoint para obtener estaciones de un proyecto
 @router.get("/{proyecto_id}/estaciones/")
 def get_estaciones_proyecto(
     skip: int = 0,
     limit: int = 100,
+    proyecto: Proyecto = Depends(get_user_project_lectura),
+    db: Session = Depends(get_read_db)
+):
+    """Obtener todas las estaciones de un proyecto con conversión manual (cacheado por revisión)"""
+    def construir():
+        estaciones = db.query(EstacionTeorica).filter(
+            EstacionTeorica.proyecto_id == proyecto.id
+        ).order_by(EstacionTeorica.km).offset(skip).limit(limit).all()
+        
+        # ✅ CONVERSIÓN MANUAL para asegurar tipos correctos
+        return [
+            {
+                "id": estacion.id,
+                "proyecto_id": estacion.proyecto_id,
+                "km": float(estacion.km) if estacion.km else 0.0,
+                "base_cl": float(estacion.base_cl) if estacion.base_cl else 0.0,
+                "pendiente_derecha": float(estacion.pendiente_derecha) if estacion.pendiente_derecha else 0.0,
+                "pendiente_izquierda": float(estacion.pendiente_izquierda) if estacion.pendiente_izquierda else 0.0,
+                "fecha_captura": estacion.fecha_captura,
+                "observaciones": estacion.observaciones,
+                # ✅ CAMPOS ADICIONALES para compatibilidad
+                "coordenada_x": 0.0,  # Valores por defecto
+                "coordenada_y": 0.0,
+                "elevacion": float(estacion.base_cl) if estacion.base_cl else 0.0,
+                "kilometraje": float(estacion.km) if estacion.km else 0.0,
+            }
+            for estacion in estaciones
+        ]
+    
+    return respuestas.respuesta_json(proyecto, "estaciones", {"skip": skip, "limit": limit}, construir)
+
+@router.patch("/{proyecto_id}/estaciones/rango", response_model=estacion_schemas.EstacionesRangoResultado)
+def patch_estaciones_rango(
+    cambios: estacion_schemas.EstacionesRangoUpdate,
+    background_tasks: BackgroundTasks,
     proyecto: Proyecto = Depends(get_user_project),
     db: Session = Depends(get_db)
 ):
-    """Obtener todas las estaciones de un proyecto con conversión manual"""
-    estaciones = db.query(EstacionTeorica).filter(
-        EstacionTeorica.proyecto_id == proyecto.id
-    ).order_by(EstacionTeorica.km).offset(skip).limit(limit).all()
+    """
+    Editar pendiente_derecha y/o base_cl de todas las estaciones en [km_desde, km_hasta]
+    con un valor constante, una rampa lineal entre extremos o una lista explícita
+    (un valor por estación en orden de km). Se aplica en un único UPDATE; con
+    alineamiento, las estaciones virtuales del rango se guardan antes como filas.
+    """
+    try:
+        actualizadas = actualizar_rango(db, proyecto, cambios)
+    except ErrorRango as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    # ✅ CONVERSIÓN MANUAL para asegurar tipos correctos
-    return [
-        {
-            "id": estacion.id,
-            "proyecto_id": estacion.proyecto_id,
-            "km": float(estacion.km) if estacion.km else 0.0,
-            "base_cl": float(estacion.base_cl) if estacion.base_cl else 0.0,
-            "pendiente_derecha": float(estacion.pendiente_derecha) if estacion.pendiente_derecha else 0.0,
-            "pendiente_izquierda": float(estacion.pendiente_izquierda) if estacion.pendiente_izquierda else 0.0,
-            "fecha_captura": estacion.fecha_captura,
-            "observaciones": estacion.observaciones,
-            # ✅ CAMPOS ADICIONALES para compatibilidad
-            "coordenada_x": 0.0,  # Valores por defecto
-            "coordenada_y": 0.0,
-            "elevacion": float(estacion.base_cl) if estacion.base_cl else 0.0,
-            "kilometraje": float(estacion.km) if estacion.km else 0.0,
-        }
-        for estacion in estaciones
-    ]
+    alertas_service.marcar_recalculo_pendiente(db, proyecto.id, cambios.km_desde, cambios.km_hasta)
+    respuestas.incrementar_revision(db, proyecto.id)
+    db.commit()
+    cache.invalidar_proyecto(proyecto.id)
+    background_tasks.add_task(alertas_service.recalcular_en_segundo_plano, proyecto.id, cambios.km_desde, cambios.km_hasta)
+    return {"actualizadas": actualizadas, "km_desde": cambios.km_desde, "km_hasta": cambios.km_hasta}
+
+@router.post("/{proyecto_id}/diseno/importar", response_model=estacion_schemas.ImportacionDisenoResultado)
+def importar_diseno(
+    background_tasks: BackgroundTasks,
+    archivo: UploadFile = File(..., description="LandXML (.xml) o CSV con km, base_cl y pendiente_derecha"),
+    formato: str = None,
+    alineamiento: str = None,
+    estaciones: str = "intervalo",
+    simulacion: bool = False,
+    unidad_pendiente: str = None,
+    proyecto: Proyecto = Depends(get_user_project),
+    db: Session = Depends(get_db)
+):
+    """
+    Importar base_cl y pendiente_derecha desde LandXML o CSV. El archivo se lee
+    de forma incremental y se evalúa en cada `intervalo` del proyecto
+    (estaciones=intervalo) o en las estaciones ya existentes (estaciones=existentes).
+    Con simulacion=true sólo devuelve el diff, sin escribir. En CSV,
+    unidad_pendiente (porcentaje o m/m) fija la unidad de la pendiente para
+    todo el archivo; sin ella se toma del encabezado o de la columna completa.
+    """
+    formato = (formato or ("csv" if (archivo.filename or "").lower().endswith(".csv") else "landxml")).lower()
+    if formato not in ("landxml", "csv"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El formato debe ser landxml o csv"
+        )
+    if estaciones not in ("intervalo", "existentes"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="estaciones debe ser intervalo o existentes"
+        )
+    
+    objetivos = importacion_diseno.km_objetivo(db, proyecto, estaciones)
+    try:
+        if formato == "csv":
+            datos = None
+            puntos = importacion_diseno.evaluar_csv(importacion_diseno.leer_csv(archivo.file, unidad_pendiente), objetivos)
+        else:
+            datos = importacion_diseno.leer_landxml(archivo.file, alineamiento)
+            puntos = importacion_diseno.evaluar_landxml(datos, objetivos)
+        resumen = importacion_diseno.importar(db, proyecto, puntos, simulacion=simulacion)
+    except importacion_diseno.ErrorImportacion as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if not simulacion:
+        alertas_service.marcar_recalculo_pendiente(db, proyecto.id)
+        respuestas.incrementar_revision(db, proyecto.id)
+        db.commit()
+        cache.invalidar_proyecto(proyecto.id)
+        background_tasks.add_task(alertas_service.recalcular_en_segundo_plano, proyecto.id)
+    
+    return {
+        "formato": formato,
+        "alineamiento": datos.alineamiento if datos else None,
+        "simulacion": simulacion,
+        **resumen
+    }
+
+@router.get("/{proyecto_id}/alineamiento", response_model=alineamiento_schemas.AlineamientoResponse)
+def get_alineamiento(
+    proyecto: Proyecto = Depends(get_user_project_lectura)
+):
+    """Obtener la rasante (PVI) y los puntos de bombeo del proyecto"""
+    return {"pvis": proyecto.pvis, "bombeo": proyecto.puntos_bombeo}
+
+@router.put("/{proyecto_id}/alineamiento", response_model=alineamiento_schemas.AlineamientoResponse)
+def put_alineamiento(
+    alineamiento: alineamiento_schemas.AlineamientoUpdate,
+    background_tasks: BackgroundTasks,
+    proyecto: Proyecto = Depends(get_user_project),
+    db: Session = Depends(get_db)
+):
+    """
+    Reemplazar la rasante y el bombeo del proyecto. Las estaciones guardadas
+    en estaciones_teoricas se conservan y siguen sobrescribiendo el diseño.
+    """
+    alineamiento_service.guardar_alineamiento(db, proyecto.id, alineamiento)
+    alertas_service.marcar_recalculo_pendiente(db, proyecto.id)
+    respuestas.incrementar_revision(db, proyecto.id)
+    db.commit()
+    cache.invalidar_proyecto(proyecto.id)
+    background_tasks.add_task(alertas_service.recalcular_en_segundo_plano, proyecto.id)
+    return {"pvis": proyecto.pvis, "bombeo": proyecto.puntos_bombeo}
+
+@router.get("/{proyecto_id}/estaciones/virtuales", response_model=List[alineamiento_schemas.EstacionVirtual])
+def get_estaciones_virtuales(
+    km_desde: Decimal = None,
+    km_hasta: Decimal = None,
+    proyecto: Proyecto = Depends(get_user_project_lectura),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Estaciones cada `intervalo` evaluadas desde el alineamiento, con las filas
+    de estaciones_teoricas como sobrescrituras (origen=estacion).
+    """
+    try:
+        alineamiento = alineamiento_service.cargar_alineamiento(db, proyecto.id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if alineamiento is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="El proyecto no tiene alineamiento definido"
+        )
+    
+    return alineamiento_service.estaciones_virtuales(db, proyecto, alineamiento, km_desde, km_hasta)
+
+@router.get("/{proyecto_id}/tramo")
+def get_tramo(
+    km_desde: Decimal,
+    km_hasta: Decimal,
+    incluir: str = None,
+    campos: str = None,
+    proyecto: Proyecto = Depends(get_user_project_lectura),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Estaciones, mediciones y lecturas de la ventana [km_desde, km_hasta] para
+    vistas que muestran sólo una parte del cadenamiento.
+    - incluir: entidades separadas por comas (estaciones, mediciones, lecturas); por defecto todas.
+    - campos: proyección "entidad.campo,..." (p. ej. estaciones.km,estaciones.base_cl);
+      los ids se incluyen siempre.
+    """
+    if km_hasta < km_desde:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="km_hasta debe ser mayor o igual que km_desde"
+        )
+    if km_hasta - km_desde > Decimal(str(settings.tramo_max_metros)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"La ventana no puede superar {settings.tramo_max_metros:g} m"
+        )
+    try:
+        entidades = tramo_service.parsear_incluir(incluir)
+        proyeccion = tramo_service.parsear_campos(campos)
+    except tramo_service.ErrorTramo as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return tramo_service.consultar_tramo(db, proyecto.id, km_desde, km_hasta, entidades, proyeccion)
+
+@router.get("/{proyecto_id}/alertas", response_model=alerta_schemas.AlertasPagina)
+def get_alertas(
+    severidad: str = None,
+    tipo: str = None,
+    cursor: str = None,
+    limit: int = 50,
+    proyecto: Proyecto = Depends(get_user_project_lectura),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Alertas abiertas ordenadas por severidad (críticas primero), km e id.
+    Paginación por cursor: pasar `siguiente` de la respuesta como `cursor`.
+    """
+    try:
+        alertas, siguiente = alertas_service.pagina(
+            db, proyecto.id, limite=max(1, min(limit, 500)), cursor=cursor, severidad=severidad, tipo=tipo
+        )
+    except alertas_service.ErrorAlertas as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return {"alertas": alertas, "siguiente": siguiente}
+
+@router.get("/{proyecto_id}/alertas/resumen", response_model=alerta_schemas.AlertasResumen)
+def get_alertas_resumen(
+    proyecto: Proyecto = Depends(get_user_project_lectura),
+    db: Session = Depends(get_read_db)
+):
+    """Conteo de alertas abiertas por severidad y tipo"""
+    return alertas_service.resumen(db, proyecto.id)
+
+@router.post("/{proyecto_id}/alertas/recalcular", response_model=alerta_schemas.AlertasResumen)
+def recalcular_alertas(
+    proyecto: Proyecto = Depends(get_user_project),
+    db: Session = Depends(get_db)
+):
+    """Reconstruir todas las alertas del proyecto (p. ej. tras aplicar migrations/005)"""
+    alertas_service.recalcular(db, proyecto.id)
+    db.commit()
+    return alertas_service.resumen(db, proyecto.id)
+
+@router.post("/{proyecto_id}/reportes", response_model=reporte_schemas.ReporteResponse, status_code=status.HTTP_202_ACCEPTED)
+def solicitar_reporte(
+    solicitud: reporte_schemas.ReporteCreate,
+    background_tasks: BackgroundTasks,
+    proyecto: Proyecto = Depends(get_user_project),
+    db: Session = Depends(get_db)
+):
+    """
+    Encolar el reporte de liberación (PDF o XLSX). Si ya existe para la versión
+    actual de los datos se devuelve ese trabajo (listo o en curso) sin repetirlo.
+    """
+    try:
+        reporte, encolar = reportes_service.solicitar(db, proyecto.id, solicitud.formato)
+    except reportes_service.ErrorReporte as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if encolar:
+        background_tasks.add_task(reportes_service.generar_en_segundo_plano, reporte.id)
+    return reporte
+
+def _reporte_del_proyecto(db: Session, proyecto_id: int, reporte_id: int, *columnas):
+    reporte = db.query(*(columnas or (Reporte,))).filter(
+        Reporte.id == reporte_id,
+        Reporte.proyecto_id == proyecto_id
+    ).first()
+    if not reporte:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reporte no encontrado o no tienes permisos para accederlo"
+        )
+    return reporte
+
+# Progreso y descarga desde el primario: la tarea escribe ahí y la réplica puede ir atrasada
+@router.get("/{proyecto_id}/reportes/{reporte_id}", response_model=reporte_schemas.ReporteResponse)
+def get_reporte(
+    reporte_id: int,
+    proyecto: Proyecto = Depends(get_user_project_lectura),
+    db: Session = Depends(get_db)
+):
+    """Estado y progreso de un trabajo de reporte"""
+    return _reporte_del_proyecto(db, proyecto.id, reporte_id)
+
+@router.get("/{proyecto_id}/reportes/{reporte_id}/descarga")
+def descargar_reporte(
+    reporte_id: int,
+    proyecto: Proyecto = Depends(get_user_project_lectura),
+    db: Session = Depends(get_db)
+):
+    """Descargar el artefacto de un reporte terminado"""
+    estado, formato, contenido = _reporte_del_proyecto(
+        db, proyecto.id, reporte_id, Reporte.estado, Reporte.formato, Reporte.contenido
+    )
+    if estado != "listo" or contenido is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El reporte aún no está listo"
+        )
+    return Response(
+        content=contenido,
+        media_type=reportes_service.FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{reportes_service.nombre_archivo(proyecto.id, formato)}"'}
+    )
 
 # ✅ CORREGIDO: Endpoint para obtener mediciones de un proyecto
 @router.get("/{proyecto_id}/mediciones/")
 def get_mediciones_proyecto(
     skip: int = 0,
     limit: int = 100,
-    proyecto: Proyecto = Depends(get_user_project),
-    db: Session = Depends(get_db)
+    proyecto: Proyecto = Depends(get_user_project_lectura),
+    db: Session = Depends(get_read_db)
 ):
-    """Obtener todas las mediciones de un proyecto con conversión manual"""
-    from models.medicion import MedicionEstacion
-    
-    mediciones = db.query(MedicionEstacion).filter(
-        MedicionEstacion.proyecto_id == proyecto.id
-    ).order_by(MedicionEstacion.estacion_km).offset(skip).limit(limit).all()
+    """Obtener todas las mediciones de un proyecto con conversión manual (cacheado por revisión)"""
+    def construir():
+        from models.medicion import MedicionEstacion
+        
+        mediciones = db.query(MedicionEstacion).filter(
+            MedicionEstacion.proyecto_id == proyecto.id
+        ).order_by(MedicionEstacion.estacion_km).offset(skip).limit(limit).all()
+        
+        # ✅ CONVERSIÓN MANUAL USANDO LOS CAMPOS REALES DEL MODELO
+        return [
+            {
+                "id": medicion.id,
+                "proyecto_id": medicion.proyecto_id,
+                "estacion_km": float(medicion.estacion_km) if medicion.estacion_km else 0.0,
+                "bn_altura": float(medicion.bn_altura) if medicion.bn_altura else 0.0,
+                "bn_lectura": float(medicion.bn_lectura) if medicion.bn_lectura else 0.0,
+                "altura_aparato": float(medicion.altura_aparato) if medicion.altura_aparato else 0.0,
+                "fecha_medicion": medicion.fecha_medicion,
+                "operador": medicion.operador,
+                "condiciones_clima": medicion.condiciones_clima,
+                "observaciones": medicion.observaciones,
+                # ✅ CAMPOS ADICIONALES para compatibilidad con frontend
+                "kilometraje": float(medicion.estacion_km) if medicion.estacion_km else 0.0,
+                "coordenada_x": 0.0,  # Valores por defecto por ahora
+                "coordenada_y": 0.0,
+                "elevacion": float(medicion.altura_aparato) if medicion.altura_aparato else 0.0,
+                "numero_medicion": f"M-{medicion.id:04d}",  # Generar número de medición
+            }
+            for medicion in mediciones
+        ]
     
-    # ✅ CONVERSIÓN MANUAL USANDO LOS CAMPOS REALES DEL MODELO
-    return [
-        {
-            "id": medicion.id,
-            "proyecto_id": medicion.proyecto_id,
-            "estacion_km": float(medicion.estacion_km) if medicion.estacion_km else 0.0,
-            "bn_altura": float(medicion.bn_altura) if medicion.bn_altura else 0.0,
-            "bn_lectura": float(medicion.bn_lectura) if medicion.bn_lectura else 0.0,
-            "altura_aparato": float(medicion.altura_aparato) if medicion.altura_aparato else 0.0,
-            "fecha_medicion": medicion.fecha_medicion,
-            "operador": medicion.operador,
-            "condiciones_clima": medicion.condiciones_clima,
-            "observaciones": medicion.observaciones,
-            # ✅ CAMPOS ADICIONALES para compatibilidad con frontend
-            "kilometraje": float(medicion.estacion_km) if medicion.estacion_km else 0.0,
-            "coordenada_x": 0.0,  # Valores por defecto por ahora
-            "coordenada_y": 0.0,
-            "elevacion": float(medicion.altura_aparato) if medicion.altura_aparato else 0.0,
-            "numero_medicion": f"M-{medicion.id:04d}",  # Generar número de medición
-        }
-        for medicion in mediciones
-    ]
+    return respuestas.respuesta_json(proyecto, "mediciones", {"skip": skip, "limit": limit}, construir)
 
 # ✅ NUEVO: Endpoint para diagnóstico de datos
 @router.get("/{proyecto_id}/debug/")
 def debug_proyecto(
-    proyecto: Proyecto = Depends(get_user_project),
-    db: Session = Depends(get_db)
+    proyecto: Proyecto = Depends(get_user_project_lectura),
+    db: Session = Depends(get_read_db)
 ):
     """Endpoint para debugging - ver toda la información del proyecto"""
     from models.medicion import MedicionEstacion
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from database import get_db
 from auth import get_supabase_user, CurrentUser
-from dependencies import get_current_user_profile
+from dependencies import get_current_user_profile, olvidar_perfil
 from schemas import usuario as schemas
 from models.usuario import PerfilUsuario
 import uuid
@@ -62,6 +62,7 @@ def create_usuario(
     db.add(db_usuario)
     db.commit()
     db.refresh(db_usuario)
+    olvidar_perfil(db_usuario.id)
     return db_usuario
 
 @router.put("/{usuario_id}", response_model=schemas.PerfilUsuarioResponse)
@@ -92,6 +93,7 @@ def update_usuario(
     
     db.commit()
     db.refresh(db_usuario)
+    olvidar_perfil(usuario_id)
     return db_usuario
 
 @router.patch("/{usuario_id}", response_model=schemas.PerfilUsuarioResponse)
@@ -128,5 +130,6 @@ def delete_usuario(
     # Soft delete
     db_usuario.activo = False
     db.commit()
+    olvidar_perfil(usuario_id)
     
     return {"message": "Usuario desactivado correctamente"}
\ No newline at end of file
@@ -13,7 +13,8 @@ from .proyecto import (
     ProyectoUpdate,
     ProyectoResponse,
     ProyectoCompletoCreate,
-    ProyectoSimple
+    ProyectoSimple,
+    ProyectoResumen
 )
 
 from .estacion import (
@@ -29,7 +30,34 @@ from .medicion import (
     MedicionEstacionCreate,
     MedicionEstacionUpdate,
     MedicionEstacionResponse,
-    MedicionEstacionSimple
+    MedicionEstacionSimple,
+    MedicionCompletitud
+)
+
+from .alineamiento import (
+    PVI,
+    PuntoBombeo,
+    AlineamientoUpdate,
+    AlineamientoResponse,
+    EstacionVirtual
+)
+
+from .alerta import (
+    AlertaResponse,
+    AlertasPagina,
+    AlertasResumen
+)
+
+from .reporte import (
+    ReporteCreate,
+    ReporteResponse
+)
+
+from .lote import (
+    SubPeticion,
+    LoteCreate,
+    SubRespuesta,
+    LoteResponse
 )
 
 from .lectura import (
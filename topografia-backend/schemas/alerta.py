@@ -0,0 +1,34 @@
+from pydantic import BaseModel, Field, validator
+from typing import Dict, List, Optional
+from datetime import datetime
+
+_NOMBRES_SEVERIDAD = {0: "critica", 1: "advertencia", 2: "info"}
+
+# Schema para respuesta
+class AlertaResponse(BaseModel):
+    id: int
+    medicion_id: Optional[int] = None
+    tipo: str
+    severidad: str
+    estacion_km: float
+    division_transversal: Optional[float] = None
+    valor: Optional[float] = None
+    detalle: Optional[str] = None
+    creada_en: Optional[datetime] = None
+
+    @validator('severidad', pre=True)
+    def validate_severidad(cls, v):
+        return _NOMBRES_SEVERIDAD.get(v, v)
+
+    class Config:
+        from_attributes = True
+
+# Página de alertas abiertas; `siguiente` es el cursor de la próxima página
+class AlertasPagina(BaseModel):
+    alertas: List[AlertaResponse]
+    siguiente: Optional[str] = Field(None, description="Cursor para la siguiente página (None = última)")
+
+class AlertasResumen(BaseModel):
+    total: int
+    por_severidad: Dict[str, int]
+    por_tipo: Dict[str, int]
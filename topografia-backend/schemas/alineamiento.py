@@ -0,0 +1,61 @@
+from pydantic import BaseModel, Field, validator
+from typing import List, Optional
+from decimal import Decimal
+
+# Punto de inflexión vertical de la rasante
+class PVI(BaseModel):
+    km: Decimal = Field(..., description="Kilómetro del PVI")
+    elevacion: Decimal = Field(..., description="Elevación de la rasante en el PVI")
+    longitud_curva: Decimal = Field(0, description="Longitud de la curva vertical parabólica (0 = sin curva)")
+
+    @validator('longitud_curva')
+    def validate_longitud_curva(cls, v):
+        if v < 0:
+            raise ValueError('La longitud de curva no puede ser negativa')
+        return v
+
+    class Config:
+        from_attributes = True
+
+# Punto de transición de la pendiente transversal
+class PuntoBombeo(BaseModel):
+    km: Decimal = Field(..., description="Kilómetro del punto de transición")
+    pendiente_derecha: Decimal = Field(..., description="Pendiente transversal derecha (m/m)")
+
+    class Config:
+        from_attributes = True
+
+# Schema para definir (o reemplazar) el alineamiento de un proyecto
+class AlineamientoUpdate(BaseModel):
+    pvis: List[PVI] = Field(..., description="PVI de la rasante (al menos dos)")
+    bombeo: List[PuntoBombeo] = Field(default=[], description="Transiciones de bombeo; vacío = 2% constante")
+
+    @validator('pvis')
+    def validate_pvis(cls, v):
+        if len(v) < 2:
+            raise ValueError('La rasante necesita al menos dos PVI')
+        kms = [p.km for p in v]
+        if len(set(kms)) != len(kms):
+            raise ValueError('Los PVI deben tener km distintos')
+        return sorted(v, key=lambda p: p.km)
+
+    @validator('bombeo')
+    def validate_bombeo(cls, v):
+        kms = [p.km for p in v]
+        if len(set(kms)) != len(kms):
+            raise ValueError('Los puntos de bombeo deben tener km distintos')
+        return sorted(v, key=lambda p: p.km)
+
+# Schema para respuesta
+class AlineamientoResponse(BaseModel):
+    pvis: List[PVI]
+    bombeo: List[PuntoBombeo]
+
+# Estación evaluada desde el alineamiento o sobrescrita en estaciones_teoricas
+class EstacionVirtual(BaseModel):
+    km: float
+    base_cl: Optional[float] = None
+    pendiente_derecha: float
+    pendiente_izquierda: float
+    estacion_id: Optional[int] = None
+    origen: str  # diseno o estacion
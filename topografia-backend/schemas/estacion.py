@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, root_validator
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
@@ -40,4 +40,65 @@ class EstacionTeoricaSimple(BaseModel):
     fecha_captura: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Valores para un campo en la edición por rango
+class ValorRango(BaseModel):
+    modo: str = Field(..., description="constante, rampa o lista")
+    valor: Optional[Decimal] = Field(None, description="Valor para el modo constante")
+    inicio: Optional[Decimal] = Field(None, description="Valor en km_desde para el modo rampa")
+    fin: Optional[Decimal] = Field(None, description="Valor en km_hasta para el modo rampa")
+    valores: Optional[List[Decimal]] = Field(None, description="Un valor por estación, en orden de km, para el modo lista")
+
+    @root_validator(skip_on_failure=True)
+    def validate_modo(cls, values):
+        modo = values.get('modo')
+        if modo == 'constante' and values.get('valor') is None:
+            raise ValueError('El modo constante requiere valor')
+        if modo == 'rampa' and (values.get('inicio') is None or values.get('fin') is None):
+            raise ValueError('El modo rampa requiere inicio y fin')
+        if modo == 'lista' and not values.get('valores'):
+            raise ValueError('El modo lista requiere valores')
+        if modo not in ('constante', 'rampa', 'lista'):
+            raise ValueError('El modo debe ser constante, rampa o lista')
+        return values
+
+# Schema para editar datos de diseño de un rango de estaciones
+class EstacionesRangoUpdate(BaseModel):
+    km_desde: Decimal = Field(..., description="Primer km del rango (incluido)")
+    km_hasta: Decimal = Field(..., description="Último km del rango (incluido)")
+    pendiente_derecha: Optional[ValorRango] = None
+    base_cl: Optional[ValorRango] = None
+
+    @root_validator(skip_on_failure=True)
+    def validate_rango(cls, values):
+        if values['km_hasta'] <= values['km_desde']:
+            raise ValueError('km_hasta debe ser mayor que km_desde')
+        if values.get('pendiente_derecha') is None and values.get('base_cl') is None:
+            raise ValueError('Indica al menos pendiente_derecha o base_cl')
+        return values
+
+# Resultado de la edición por rango
+class EstacionesRangoResultado(BaseModel):
+    actualizadas: int
+    km_desde: Decimal
+    km_hasta: Decimal
+
+# Cambio de una estación en la importación de diseño
+class CambioDiseno(BaseModel):
+    km: Decimal
+    accion: str  # nueva o modificada
+    base_cl: Decimal
+    pendiente_derecha: Decimal
+    base_cl_anterior: Optional[Decimal] = None
+    pendiente_derecha_anterior: Optional[Decimal] = None
+
+# Resultado (o simulación) de la importación de diseño
+class ImportacionDisenoResultado(BaseModel):
+    formato: str
+    alineamiento: Optional[str] = None
+    simulacion: bool
+    nuevas: int
+    modificadas: int
+    sin_cambios: int
+    diferencias: List[CambioDiseno] = Field(..., description="Primeros cambios (máximo 200)")
@@ -42,6 +42,7 @@ class LecturaDivisionUpdate(BaseModel):
 class LecturaDivisionResponse(LecturaDivisionBase):
     id: int
     medicion_id: int
+    proyecto_id: int
     elv_base_real: Optional[Decimal] = None
     elv_base_proyecto: Optional[Decimal] = None
     elv_concreto_proyecto: Optional[Decimal] = None
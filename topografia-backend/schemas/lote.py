@@ -0,0 +1,48 @@
+from pydantic import BaseModel, Field, validator
+from typing import Any, Dict, List, Optional
+
+_METODOS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+
+# Schema de una sub-petición del lote
+class SubPeticion(BaseModel):
+    metodo: str = Field(..., description="GET, POST, PUT, PATCH o DELETE")
+    ruta: str = Field(..., description="Ruta de la API con su query string, p. ej. /lecturas/?medicion_id=1")
+    cuerpo: Optional[Any] = Field(None, description="Cuerpo JSON de la sub-petición")
+
+    @validator('metodo')
+    def validate_metodo(cls, v):
+        v = v.upper()
+        if v not in _METODOS:
+            raise ValueError('El método debe ser GET, POST, PUT, PATCH o DELETE')
+        return v
+
+    @validator('ruta')
+    def validate_ruta(cls, v):
+        if not v.startswith('/'):
+            raise ValueError('La ruta debe empezar por /')
+        if v.split('?')[0].rstrip('/') == '/batch':
+            raise ValueError('Un lote no puede contener otro lote')
+        return v
+
+# Schema para ejecutar un lote
+class LoteCreate(BaseModel):
+    peticiones: List[SubPeticion] = Field(..., min_items=1)
+    transaccion: bool = Field(
+        False,
+        description="Todas las sub-peticiones en una transacción: si una falla se deshacen todas"
+    )
+
+# Schema de la respuesta de una sub-petición
+class SubRespuesta(BaseModel):
+    estado: int = Field(..., description="Código HTTP de la sub-petición")
+    cuerpo: Optional[Any] = None
+    cabeceras: Dict[str, str] = {}
+
+# Schema para respuesta del lote
+class LoteResponse(BaseModel):
+    respuestas: List[SubRespuesta]
+    transaccion: bool
+    confirmado: Optional[bool] = Field(
+        None,
+        description="Con transaccion: si los cambios se guardaron (todas las sub-peticiones < 400)"
+    )
@@ -1,6 +1,6 @@
 # schemas/medicion.py - Schema corregido para tu modelo MedicionEstacion real
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 from decimal import Decimal
 
@@ -76,4 +76,13 @@ class MedicionEstacionResumen(BaseModel):
     operador: Optional[str] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Schema para la revisión de completitud de una medición contra la sección del proyecto
+class MedicionCompletitud(BaseModel):
+    medicion_id: int
+    total_divisiones: int
+    capturadas: int
+    completa: bool
+    faltantes: List[float] = Field(default=[], description="Divisiones de la sección sin lectura")
+    fuera_de_seccion: List[float] = Field(default=[], description="Lecturas en divisiones que ya no están en la sección")
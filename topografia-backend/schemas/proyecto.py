@@ -1,9 +1,10 @@
 # schemas/proyecto.py
 from pydantic import BaseModel, Field, validator
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 import uuid
+from .alineamiento import AlineamientoUpdate
 
 # Schema para encargados del proyecto
 class Encargado(BaseModel):
@@ -122,6 +123,7 @@ class ProyectoCompleto(BaseModel):
     fecha_creacion: datetime
     fecha_modificacion: datetime
     estado: str
+    revision: int = Field(1, description="Se incrementa en cada actualización del proyecto")
 
     class Config:
         from_attributes = True
@@ -142,6 +144,26 @@ class ProyectoResponse(ProyectoBase):
 # Schema para crear proyecto completo con estaciones automáticas
 class ProyectoCompletoCreate(ProyectoBase):
     generar_estaciones: bool = Field(True, description="Generar estaciones automáticamente")
+    alineamiento: Optional[AlineamientoUpdate] = Field(
+        None,
+        description="Rasante por PVI y bombeo; si se indica, las estaciones son virtuales y no se generan filas"
+    )
+
+# Schema para clonar un proyecto como plantilla de otro tramo o cuerpo
+class ProyectoClonar(BaseModel):
+    nombre: Optional[str] = Field(None, max_length=255, description="Nombre del nuevo proyecto (por defecto '<origen> (copia)')")
+    tramo: Optional[str] = Field(None, max_length=100, description="Tramo del nuevo proyecto (por defecto el del origen)")
+    cuerpo: Optional[str] = Field(None, max_length=50, description="Cuerpo del nuevo proyecto (por defecto el del origen)")
+    desplazamiento_km: Decimal = Field(0, description="Metros que se suman a cada km copiado")
+    km_desde: Optional[Decimal] = Field(None, description="Inicio del rango a copiar (km del proyecto origen)")
+    km_hasta: Optional[Decimal] = Field(None, description="Fin del rango a copiar (km del proyecto origen)")
+    incluir_campo: bool = Field(False, description="Copiar también mediciones y lecturas, no sólo el diseño")
+
+    @validator('km_hasta')
+    def validate_rango(cls, v, values):
+        if v is not None and values.get('km_desde') is not None and v <= values['km_desde']:
+            raise ValueError('km_hasta debe ser mayor que km_desde')
+        return v
 
 # Schema simplificado para listas (DEPRECATED - usar ProyectoCompleto)
 class ProyectoSimple(BaseModel):
@@ -156,6 +178,26 @@ class ProyectoSimple(BaseModel):
     class Config:
         from_attributes = True
 
+# Schema para el resumen de avance de todos los proyectos del usuario (Dashboard)
+class ProyectoResumen(BaseModel):
+    id: int
+    nombre: str
+    tramo: Optional[str] = None
+    cuerpo: Optional[str] = None
+    estado: str
+    revision: int
+    total_estaciones: int
+    estaciones_capturadas: int = Field(..., description="Estaciones con medición")
+    porcentaje_avance: float = Field(..., description="estaciones_capturadas / total_estaciones, en %")
+    lecturas: int
+    lecturas_evaluadas: int = Field(..., description="Lecturas con elevación real")
+    lecturas_fuera_tolerancia: int
+    porcentaje_cumplimiento: Optional[float] = Field(None, description="Lecturas evaluadas dentro de tolerancia, en %; null sin lecturas")
+    alertas_abiertas: int
+    alertas_criticas: int
+    ultima_medicion: Optional[date] = None
+    ultima_actividad: Optional[datetime] = None
+
 # ✅ NUEVO: Schema para debugging
 class ProyectoDebug(BaseModel):
     """Schema para endpoint de debugging con información detallada"""
@@ -0,0 +1,32 @@
+from pydantic import BaseModel, Field, validator
+from typing import Optional
+from datetime import datetime
+
+_FORMATOS = ("pdf", "xlsx")
+
+# Schema para solicitar un reporte
+class ReporteCreate(BaseModel):
+    formato: str = Field("pdf", description="pdf o xlsx")
+
+    @validator('formato')
+    def validate_formato(cls, v):
+        v = v.lower()
+        if v not in _FORMATOS:
+            raise ValueError('El formato debe ser pdf o xlsx')
+        return v
+
+# Schema para respuesta (progreso del trabajo)
+class ReporteResponse(BaseModel):
+    id: int
+    proyecto_id: int
+    formato: str
+    revision: int
+    estado: str = Field(..., description="pendiente, reuniendo, renderizando, listo o error")
+    progreso: int = Field(..., description="0-100")
+    error: Optional[str] = None
+    tamano: Optional[int] = None
+    creado_en: Optional[datetime] = None
+    terminado_en: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
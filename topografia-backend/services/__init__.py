@@ -0,0 +1,30 @@
+# Servicios de dominio compartidos por los routers (cálculos y operaciones por lotes)
+from . import punto_fijo
+from . import recalculo
+from . import purga
+from . import clonado
+from . import diseno
+from . import importacion_diseno
+from . import alineamiento
+from . import seccion
+from . import tramo
+from . import alertas
+from . import respuestas
+from . import reportes
+from . import portafolio
+
+__all__ = [
+    "punto_fijo",
+    "recalculo",
+    "purga",
+    "clonado",
+    "diseno",
+    "importacion_diseno",
+    "alineamiento",
+    "seccion",
+    "tramo",
+    "alertas",
+    "respuestas",
+    "reportes",
+    "portafolio"
+]
@@ -0,0 +1,414 @@
+"""
+Índice de alertas abiertas por proyecto (tabla alertas).
+
+Las alertas se recalculan por medición tras cada escritura que puede
+cambiarlas (crear/editar/borrar lecturas, crear/editar la medición): se leen
+las lecturas de esa medición, se comparan con el diseño vigente y se
+reemplazan sus filas en `alertas`. El costo depende de las divisiones de una
+medición, no del tamaño del proyecto, y la pantalla de Alertas pagina por
+(severidad, km, id) sobre `ix_alertas_proyecto_orden` sin tocar las lecturas.
+
+Ese recálculo no va en la transacción de la escritura: el autosave sigue
+siendo una sola sentencia. `programar_recalculo` anota la medición en la
+sesión y, cuando la transacción se confirma, pasa a una cola por worker que
+se procesa ALERTAS_ESPERA_SEGUNDOS después en un hilo aparte, una vez por
+medición aunque haya recibido muchas escrituras en ese intervalo. Si la
+transacción se deshace, la anotación se descarta.
+
+Tipos:
+- fuera_tolerancia: |elv_base_real - elevación de proyecto| > tolerancia_sct
+  (crítica > 5×, advertencia > 2×, info en otro caso).
+- calidad: lecturas con calidad distinta de BUENA/EXCELENTE (REVISAR es crítica).
+- division_faltante: divisiones de la sección sin lectura (crítica si no hay ninguna).
+- atipica: diferencia que se aparta de la mediana de la medición más de
+  FACTOR_ATIPICA × tolerancia (un error aislado, no un banco de nivel mal tomado).
+- sin_estacion: el km de la medición no tiene diseño (ni estación ni alineamiento).
+- recalculo_pendiente: el diseño cambió (edición por rango, importación,
+  alineamiento, tolerancia o sección) y las alertas de la medición aún no se
+  recalcularon; el recálculo se hace en segundo plano y las elimina.
+
+La elevación de proyecto se calcula con el diseño vigente y aritmética de
+punto fijo (services/punto_fijo.py), no con la copia guardada en la lectura.
+El cálculo en sí (`calcular_alertas`) no usa la base de datos: los recálculos
+de CALCULO_UMBRAL_LECTURAS lecturas o más se ejecutan en el pool de procesos
+(procesos.py) para no retener el GIL del worker.
+"""
+from decimal import Decimal
+from typing import List, Optional, Tuple
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import String, and_, cast, delete, event, func, literal, select, tuple_
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, insert_con_conflicto
+from models.alerta import Alerta
+from models.estacion import EstacionTeorica
+from models.lectura import LecturaDivision
+from models.medicion import MedicionEstacion
+from models.proyecto import Proyecto
+from procesos import pool_calculo
+from services import punto_fijo
+from services.alineamiento import diseno_virtual
+from services.seccion import elevaciones_en, plantilla_proyecto
+
+logger = logging.getLogger(__name__)
+
+CRITICA = 0
+ADVERTENCIA = 1
+INFO = 2
+SEVERIDADES = {"critica": CRITICA, "advertencia": ADVERTENCIA, "info": INFO}
+NOMBRES_SEVERIDAD = {valor: nombre for nombre, valor in SEVERIDADES.items()}
+
+TIPOS = ("fuera_tolerancia", "calidad", "division_faltante", "atipica", "sin_estacion", "recalculo_pendiente")
+
+FACTOR_ATIPICA = 3
+CALIDADES_ACEPTADAS = ("BUENA", "EXCELENTE")
+TAMANO_LOTE = 1000
+
+_MM = punto_fijo.MILIMETROS
+_UM = punto_fijo.MICRAS
+
+
+class ErrorAlertas(ValueError):
+    """Parámetros de consulta de alertas no válidos"""
+
+
+def _alerta(proyecto_id, medicion_id, km_mm, tipo, severidad, division_mm=None, valor=None, detalle=None) -> dict:
+    clave = f"{tipo}:{medicion_id}" if division_mm is None else f"{tipo}:{medicion_id}:{division_mm}"
+    return {
+        "proyecto_id": proyecto_id,
+        "medicion_id": medicion_id,
+        "clave": clave,
+        "tipo": tipo,
+        "severidad": severidad,
+        "estacion_km": punto_fijo.a_decimal(km_mm, _MM),
+        "division_transversal": None if division_mm is None else punto_fijo.a_decimal(division_mm, _MM),
+        "valor": valor,
+        "detalle": detalle,
+    }
+
+
+def _alertas_medicion(proyecto_id: int, medicion_id: int, km_mm: int, diseno: Optional[Tuple[int, int]],
+                      tolerancia: int, lecturas: List[tuple], plantilla) -> List[dict]:
+    """Alertas de una medición. `lecturas`: (division_mm, elv_base_real_um, calidad)"""
+    alertas = []
+    nueva = lambda *args, **kwargs: alertas.append(_alerta(proyecto_id, medicion_id, km_mm, *args, **kwargs))
+
+    if plantilla is not None and len(plantilla):
+        faltantes = plantilla.faltantes(punto_fijo.a_decimal(d, _MM) for d, _, _ in lecturas)
+        if faltantes:
+            nueva("division_faltante", CRITICA if not lecturas else ADVERTENCIA,
+                  valor=Decimal(len(faltantes)),
+                  detalle="Divisiones sin lectura: " + ", ".join(f"{d:g}" for d in faltantes))
+
+    for division, _, calidad in lecturas:
+        if calidad and calidad not in CALIDADES_ACEPTADAS:
+            nueva("calidad", CRITICA if calidad == "REVISAR" else ADVERTENCIA, division,
+                  detalle=f"Calidad de lectura: {calidad}")
+
+    if diseno is None:
+        nueva("sin_estacion", CRITICA, detalle="El km no tiene estación teórica ni alineamiento de diseño")
+        return alertas
+
+    medidas = [(d, elv) for d, elv, _ in lecturas if elv is not None]
+    if not medidas:
+        return alertas
+    divisiones = np.array([d for d, _ in medidas], dtype=np.int64)
+    reales = np.array([elv for _, elv in medidas], dtype=np.int64)
+    diferencias = reales - elevaciones_en(divisiones, diseno[0], diseno[1])
+
+    if tolerancia > 0:
+        magnitud = np.abs(diferencias)
+        for i in np.flatnonzero(magnitud > tolerancia):
+            factor = magnitud[i] / tolerancia
+            severidad = CRITICA if factor > 5 else ADVERTENCIA if factor > 2 else INFO
+            nueva("fuera_tolerancia", severidad, int(divisiones[i]),
+                  valor=punto_fijo.a_decimal(diferencias[i], _UM),
+                  detalle=f"Diferencia de {diferencias[i] / 1000:+.0f} mm (tolerancia ±{tolerancia / 1000:.0f} mm)")
+
+        if len(diferencias) >= 3:
+            desvio = diferencias - int(np.median(diferencias))
+            for i in np.flatnonzero(np.abs(desvio) > FACTOR_ATIPICA * tolerancia):
+                nueva("atipica", ADVERTENCIA, int(divisiones[i]),
+                      valor=punto_fijo.a_decimal(desvio[i], _UM),
+                      detalle=f"Se aparta {desvio[i] / 1000:+.0f} mm de la mediana de la estación")
+    return alertas
+
+
+def calcular_alertas(proyecto_id: int, tolerancia: int, plantilla,
+                     med_ids: np.ndarray, med_km: np.ndarray, med_base: np.ndarray, med_pendiente: np.ndarray,
+                     med_con_diseno: np.ndarray, lec_medicion: np.ndarray, lec_division: np.ndarray,
+                     lec_elv: np.ndarray, lec_con_elv: np.ndarray, lec_calidad: np.ndarray,
+                     calidades: List[str]) -> List[dict]:
+    """
+    Núcleo del recálculo, sin base de datos (se puede ejecutar en el pool de
+    procesos). Mediciones en arreglos paralelos (km en milímetros, diseño en
+    micras); lecturas ordenadas por medición, con la calidad como índice en
+    `calidades` (-1 = sin calidad).
+    """
+    inicios = np.searchsorted(lec_medicion, med_ids, side="left")
+    finales = np.searchsorted(lec_medicion, med_ids, side="right")
+    nuevas = []
+    for i in range(len(med_ids)):
+        filas = range(inicios[i], finales[i])
+        lecturas = [
+            (int(lec_division[j]),
+             int(lec_elv[j]) if lec_con_elv[j] else None,
+             calidades[lec_calidad[j]] if lec_calidad[j] >= 0 else None)
+            for j in filas
+        ]
+        diseno = (int(med_base[i]), int(med_pendiente[i])) if med_con_diseno[i] else None
+        nuevas.extend(_alertas_medicion(
+            proyecto_id, int(med_ids[i]), int(med_km[i]), diseno, tolerancia, lecturas, plantilla
+        ))
+    return nuevas
+
+
+def _filtro_mediciones(proyecto_id: int, medicion_ids=None, km_desde=None, km_hasta=None):
+    condiciones = [MedicionEstacion.proyecto_id == proyecto_id]
+    if medicion_ids is not None:
+        condiciones.append(MedicionEstacion.id.in_(medicion_ids))
+    if km_desde is not None:
+        condiciones.append(MedicionEstacion.estacion_km >= km_desde)
+    if km_hasta is not None:
+        condiciones.append(MedicionEstacion.estacion_km <= km_hasta)
+    return and_(*condiciones)
+
+
+def recalcular(db: Session, proyecto_id: int, medicion_ids: List[int] = None,
+               km_desde: Decimal = None, km_hasta: Decimal = None, esperar: float = 0) -> int:
+    """
+    Reemplaza las alertas de las mediciones indicadas (por id o por rango de
+    km; sin filtros, todo el proyecto). No confirma la transacción. Con ids
+    explícitos bloquea las filas de medición para que dos recálculos
+    simultáneos de la misma medición (p. ej. en dos workers) no intercalen su
+    reemplazo. El bloqueo es FOR NO KEY UPDATE: no choca con el FOR KEY SHARE
+    que toma la clave foránea al insertar una lectura nueva de esa medición.
+    Devuelve el número de alertas abiertas resultantes. `esperar`: segundos
+    que se espera cupo en el pool de procesos (procesos.PoolSaturado si no hay).
+    """
+    filtro = _filtro_mediciones(proyecto_id, medicion_ids, km_desde, km_hasta)
+    consulta = select(
+        MedicionEstacion.id,
+        punto_fijo.columna(MedicionEstacion.estacion_km, _MM),
+        punto_fijo.columna(EstacionTeorica.base_cl, _UM),
+        punto_fijo.columna(EstacionTeorica.pendiente_derecha, _UM),
+        punto_fijo.columna(Proyecto.tolerancia_sct, _UM),
+    ).join(
+        Proyecto, Proyecto.id == MedicionEstacion.proyecto_id
+    ).outerjoin(EstacionTeorica, and_(
+        EstacionTeorica.proyecto_id == MedicionEstacion.proyecto_id,
+        EstacionTeorica.km == MedicionEstacion.estacion_km,
+    )).where(filtro)
+    if medicion_ids is not None:
+        consulta = consulta.with_for_update(of=MedicionEstacion, key_share=True)
+    mediciones = db.execute(consulta).all()
+    if not mediciones:
+        return 0
+
+    # Ordenadas por medición (recorrido del índice por proyecto): el núcleo las separa con searchsorted
+    lecturas = db.execute(
+        select(
+            LecturaDivision.medicion_id,
+            punto_fijo.columna(LecturaDivision.division_transversal, _MM),
+            punto_fijo.columna(LecturaDivision.elv_base_real, _UM),
+            LecturaDivision.calidad,
+        ).where(
+            LecturaDivision.proyecto_id == proyecto_id,
+            LecturaDivision.medicion_id.in_(select(MedicionEstacion.id).where(filtro)),
+        ).order_by(LecturaDivision.medicion_id)
+    ).all()
+
+    plantilla = plantilla_proyecto(db, proyecto_id)
+    # El alineamiento sólo se carga si alguna medición no tiene estación guardada
+    virtuales = diseno_virtual(db, proyecto_id, [km for _, km, base, _, _ in mediciones if base is None])
+
+    disenos = [(base, pendiente) if base is not None else virtuales.get(km) for _, km, base, pendiente, _ in mediciones]
+    calidades = sorted({calidad for *_, calidad in lecturas if calidad})
+    codigos = {calidad: i for i, calidad in enumerate(calidades)}
+    argumentos = (
+        proyecto_id, mediciones[0][4] or 0, plantilla,
+        np.array([m[0] for m in mediciones], dtype=np.int64),
+        np.array([m[1] for m in mediciones], dtype=np.int64),
+        np.array([d[0] if d else 0 for d in disenos], dtype=np.int64),
+        np.array([d[1] if d else 0 for d in disenos], dtype=np.int64),
+        np.array([d is not None for d in disenos], dtype=bool),
+        np.fromiter((l[0] for l in lecturas), dtype=np.int64, count=len(lecturas)),
+        np.fromiter((l[1] for l in lecturas), dtype=np.int64, count=len(lecturas)),
+        np.fromiter((l[2] or 0 for l in lecturas), dtype=np.int64, count=len(lecturas)),
+        np.fromiter((l[2] is not None for l in lecturas), dtype=bool, count=len(lecturas)),
+        np.fromiter((codigos.get(l[3], -1) for l in lecturas), dtype=np.int16, count=len(lecturas)),
+        calidades,
+    )
+    # Un recálculo de proyecto completo no retiene el GIL del worker: va al pool de procesos
+    if len(lecturas) >= settings.calculo_umbral_lecturas:
+        nuevas = pool_calculo.ejecutar(calcular_alertas, *argumentos, nombre="alertas", esperar=esperar)
+    else:
+        nuevas = calcular_alertas(*argumentos)
+
+    ids = [m[0] for m in mediciones]
+    for inicio in range(0, len(ids), TAMANO_LOTE):
+        db.execute(
+            delete(Alerta).where(Alerta.proyecto_id == proyecto_id, Alerta.medicion_id.in_(ids[inicio:inicio + TAMANO_LOTE])),
+            execution_options={"synchronize_session": False},
+        )
+    if nuevas:
+        # executemany de Core sobre la tabla: la sentencia compilada se reutiliza sin
+        # importar cuántas alertas haya y no pasa por la persistencia del ORM
+        sentencia = insert_con_conflicto(db, Alerta.__table__)
+        # Un recálculo en segundo plano simultáneo puede haber escrito la misma clave
+        db.execute(sentencia.on_conflict_do_update(
+            index_elements=["proyecto_id", "clave"],
+            set_={columna: sentencia.excluded[columna]
+                  for columna in ("severidad", "estacion_km", "division_transversal", "valor", "detalle")},
+        ), nuevas)
+    return len(nuevas)
+
+
+# Mediciones confirmadas a la espera de recálculo en este worker: proyecto_id -> ids
+_diferidas = {}
+_candado_diferidas = threading.Lock()
+_temporizador = None
+_CLAVE_SESION = "alertas_diferidas"
+
+
+def programar_recalculo(db: Session, proyecto_id: int, medicion_id: int):
+    """Recalcula las alertas de la medición cuando se confirme la transacción de `db`"""
+    db.info.setdefault(_CLAVE_SESION, set()).add((proyecto_id, medicion_id))
+
+
+def confirmar_programados(db: Session):
+    """Pasa a la cola del worker las mediciones anotadas en la sesión"""
+    global _temporizador
+    pendientes = db.info.pop(_CLAVE_SESION, None)
+    if not pendientes:
+        return
+    with _candado_diferidas:
+        for proyecto_id, medicion_id in pendientes:
+            _diferidas.setdefault(proyecto_id, set()).add(medicion_id)
+        if _temporizador is None:
+            _temporizador = threading.Timer(settings.alertas_espera_segundos, recalcular_diferidas)
+            _temporizador.daemon = True
+            _temporizador.start()
+
+
+def descartar_programados(db: Session):
+    db.info.pop(_CLAVE_SESION, None)
+
+
+def recalcular_diferidas():
+    """Recalcula y confirma, con su propia sesión, las mediciones en cola"""
+    global _temporizador
+    with _candado_diferidas:
+        cola = dict(_diferidas)
+        _diferidas.clear()
+        _temporizador = None
+    for proyecto_id, medicion_ids in cola.items():
+        try:
+            with SessionLocal() as db:
+                # En orden de id: dos workers bloquean las mediciones en el mismo orden
+                recalcular(db, proyecto_id, medicion_ids=sorted(medicion_ids))
+                db.commit()
+        except Exception as e:
+            logger.error(f"Error recalculando alertas de {len(medicion_ids)} mediciones del proyecto {proyecto_id}: {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _al_confirmar(session):
+    # En un lote transaccional el commit de la ruta sólo libera un SAVEPOINT:
+    # routers/lotes.py entrega las anotaciones al confirmar la transacción externa
+    if not session.info.get("transaccion_lote"):
+        confirmar_programados(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _al_deshacer(session):
+    if not session.info.get("transaccion_lote"):
+        descartar_programados(session)
+
+
+def marcar_recalculo_pendiente(db: Session, proyecto_id: int, km_desde: Decimal = None, km_hasta: Decimal = None) -> int:
+    """Abre una alerta recalculo_pendiente por medición afectada, en una sola sentencia. No confirma."""
+    filtro = _filtro_mediciones(proyecto_id, km_desde=km_desde, km_hasta=km_hasta)
+    seleccion = select(
+        MedicionEstacion.proyecto_id,
+        MedicionEstacion.id,
+        literal("recalculo_pendiente:") + cast(MedicionEstacion.id, String),
+        literal("recalculo_pendiente"),
+        literal(INFO),
+        MedicionEstacion.estacion_km,
+        literal("El diseño cambió; las alertas de esta estación se están recalculando"),
+    ).where(filtro)
+    sentencia = insert_con_conflicto(db, Alerta).from_select(
+        ["proyecto_id", "medicion_id", "clave", "tipo", "severidad", "estacion_km", "detalle"], seleccion
+    ).on_conflict_do_nothing(index_elements=["proyecto_id", "clave"])
+    return db.execute(sentencia).rowcount
+
+
+def recalcular_en_segundo_plano(proyecto_id: int, km_desde: Decimal = None, km_hasta: Decimal = None):
+    """Tarea de fondo tras un cambio de diseño: recalcula y confirma con su propia sesión"""
+    try:
+        with SessionLocal() as db:
+            abiertas = recalcular(db, proyecto_id, km_desde=km_desde, km_hasta=km_hasta,
+                                  esperar=settings.calculo_timeout_segundos)
+            db.commit()
+        logger.info(f"Alertas del proyecto {proyecto_id} recalculadas ({abiertas} abiertas)")
+    except Exception as e:
+        logger.error(f"Error recalculando alertas del proyecto {proyecto_id}: {e}")
+
+
+def _leer_cursor(cursor: str):
+    try:
+        severidad, km, alerta_id = cursor.split(":")
+        return int(severidad), punto_fijo.a_decimal(int(km), _MM), int(alerta_id)
+    except ValueError:
+        raise ErrorAlertas("Cursor no válido")
+
+
+def pagina(db: Session, proyecto_id: int, limite: int = 50, cursor: str = None,
+           severidad: str = None, tipo: str = None) -> Tuple[List[Alerta], Optional[str]]:
+    """
+    Alertas abiertas ordenadas por (severidad, km, id), a partir de `cursor`.
+    Paginación por clave: cada página es un recorrido de rango del índice,
+    con el mismo costo en la primera página que en la última.
+    """
+    consulta = select(Alerta).where(Alerta.proyecto_id == proyecto_id)
+    if severidad is not None:
+        if severidad not in SEVERIDADES:
+            raise ErrorAlertas(f"Severidad desconocida: {severidad}")
+        consulta = consulta.where(Alerta.severidad == SEVERIDADES[severidad])
+    if tipo is not None:
+        if tipo not in TIPOS:
+            raise ErrorAlertas(f"Tipo desconocido: {tipo}")
+        consulta = consulta.where(Alerta.tipo == tipo)
+    if cursor:
+        consulta = consulta.where(
+            tuple_(Alerta.severidad, Alerta.estacion_km, Alerta.id) > tuple_(*_leer_cursor(cursor))
+        )
+    alertas = db.scalars(
+        consulta.order_by(Alerta.severidad, Alerta.estacion_km, Alerta.id).limit(limite + 1)
+    ).all()
+
+    siguiente = None
+    if len(alertas) > limite:
+        alertas = alertas[:limite]
+        ultima = alertas[-1]
+        siguiente = f"{ultima.severidad}:{punto_fijo.a_entero(ultima.estacion_km, _MM)}:{ultima.id}"
+    return alertas, siguiente
+
+
+def resumen(db: Session, proyecto_id: int) -> dict:
+    """Conteo de alertas abiertas por severidad y por tipo"""
+    por_severidad = {nombre: 0 for nombre in SEVERIDADES}
+    por_tipo = {}
+    for severidad, tipo, cantidad in db.execute(
+        select(Alerta.severidad, Alerta.tipo, func.count())
+        .where(Alerta.proyecto_id == proyecto_id)
+        .group_by(Alerta.severidad, Alerta.tipo)
+    ):
+        por_severidad[NOMBRES_SEVERIDAD[severidad]] += cantidad
+        por_tipo[tipo] = por_tipo.get(tipo, 0) + cantidad
+    return {"total": sum(por_severidad.values()), "por_severidad": por_severidad, "por_tipo": por_tipo}
@@ -0,0 +1,258 @@
+"""
+Diseño compacto por proyecto: rasante por PVI con curvas verticales
+parabólicas y pendiente transversal por puntos de transición lineal.
+
+`AlineamientoVertical.evaluar` recibe un arreglo de km y devuelve base_cl y
+pendientes para todos a la vez con NumPy, así que las estaciones teóricas
+pueden ser virtuales: sólo se guardan en estaciones_teoricas las que el
+diseñador sobrescribe, y `estaciones_virtuales` las superpone al diseño.
+
+La evaluación de las curvas es en coma flotante; los km de entrada y los
+resultados se cuantizan a la escala de la base de datos con
+services/punto_fijo.py (milímetros y micras).
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.alineamiento import PVIProyecto, PuntoBombeo
+from models.estacion import EstacionTeorica
+from models.proyecto import Proyecto
+from services import punto_fijo
+
+PENDIENTE_NORMAL = 0.02  # Bombeo cuando el proyecto no define puntos de transición
+
+
+@dataclass(frozen=True)
+class EvaluacionDiseno:
+    """Resultado de evaluar el diseño en un arreglo de km (NaN fuera de la rasante)"""
+    km: np.ndarray
+    base_cl: np.ndarray
+    pendiente_derecha: np.ndarray
+
+    @property
+    def pendiente_izquierda(self) -> np.ndarray:
+        # Igual que la columna generada de estaciones_teoricas
+        return -self.pendiente_derecha
+
+
+class AlineamientoVertical:
+    """Evaluador vectorizado de rasante y bombeo"""
+
+    def __init__(self, pvis: Sequence[Tuple[float, float, float]],
+                 bombeo: Sequence[Tuple[float, float]] = ()):
+        if len(pvis) < 2:
+            raise ValueError("La rasante necesita al menos dos PVI")
+        pvis = sorted(pvis)
+        self.km_pvi = np.array([p[0] for p in pvis], dtype=np.float64)
+        self.elev_pvi = np.array([p[1] for p in pvis], dtype=np.float64)
+        self.longitud = np.array([p[2] for p in pvis], dtype=np.float64)
+        if np.any(np.diff(self.km_pvi) <= 0):
+            raise ValueError("Los PVI deben tener km distintos")
+        # Pendiente de cada tangente entre PVI consecutivos
+        self.pendientes = np.diff(self.elev_pvi) / np.diff(self.km_pvi)
+
+        bombeo = sorted(bombeo)
+        self.km_bombeo = np.array([b[0] for b in bombeo], dtype=np.float64)
+        self.pend_bombeo = np.array([b[1] for b in bombeo], dtype=np.float64)
+
+    def rasante(self, km: np.ndarray) -> np.ndarray:
+        km = np.asarray(km, dtype=np.float64)
+        n = len(self.km_pvi)
+        tramo = np.clip(np.searchsorted(self.km_pvi, km, side="right") - 1, 0, n - 2)
+        elev = self.elev_pvi[tramo] + self.pendientes[tramo] * (km - self.km_pvi[tramo])
+
+        # Curvas verticales: la de cada PVI interior cubre [km - L/2, km + L/2].
+        # Una estación sólo puede caer en la curva del PVI inicial o final de su tramo.
+        for candidato in (tramo, tramo + 1):
+            interior = (candidato > 0) & (candidato < n - 1)
+            j = np.clip(candidato, 1, n - 2)
+            mitad = self.longitud[j] / 2
+            en_curva = interior & (mitad > 0) & (np.abs(km - self.km_pvi[j]) <= mitad)
+            if not en_curva.any():
+                continue
+            g1 = self.pendientes[j - 1]
+            g2 = self.pendientes[j]
+            x = km - (self.km_pvi[j] - mitad)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                parabola = (self.elev_pvi[j] - g1 * mitad + g1 * x
+                            + (g2 - g1) / (4 * mitad) * x * x)
+            elev = np.where(en_curva, parabola, elev)
+
+        fuera = (km < self.km_pvi[0]) | (km > self.km_pvi[-1])
+        return np.where(fuera, np.nan, elev)
+
+    def bombeo(self, km: np.ndarray) -> np.ndarray:
+        km = np.asarray(km, dtype=np.float64)
+        if not len(self.km_bombeo):
+            return np.full(km.shape, PENDIENTE_NORMAL)
+        # Transición lineal; antes del primer punto y después del último se mantiene el valor
+        return np.interp(km, self.km_bombeo, self.pend_bombeo)
+
+    def evaluar(self, km) -> EvaluacionDiseno:
+        km = np.asarray(km, dtype=np.float64)
+        return EvaluacionDiseno(km=km, base_cl=self.rasante(km), pendiente_derecha=self.bombeo(km))
+
+    def evaluar_micras(self, km_mm: np.ndarray):
+        """
+        Evalúa en km dados en milímetros enteros y devuelve (cubierto, base_cl,
+        pendiente_derecha): máscara de km dentro de la rasante y ambos valores
+        en micras (int64; 0 donde no hay cobertura).
+        """
+        evaluacion = self.evaluar(punto_fijo.a_float(km_mm, punto_fijo.MILIMETROS))
+        cubierto = ~np.isnan(evaluacion.base_cl)
+        base_cl = punto_fijo.a_enteros(np.where(cubierto, evaluacion.base_cl, 0.0), punto_fijo.MICRAS)
+        pendiente = punto_fijo.a_enteros(evaluacion.pendiente_derecha, punto_fijo.MICRAS)
+        return cubierto, base_cl, pendiente
+
+
+def cargar_alineamiento(db: Session, proyecto_id: int) -> Optional[AlineamientoVertical]:
+    """Alineamiento del proyecto, o None si no tiene rasante por PVI"""
+    pvis = db.execute(
+        select(PVIProyecto.km, PVIProyecto.elevacion, PVIProyecto.longitud_curva)
+        .where(PVIProyecto.proyecto_id == proyecto_id)
+    ).all()
+    if len(pvis) < 2:
+        return None
+    bombeo = db.execute(
+        select(PuntoBombeo.km, PuntoBombeo.pendiente_derecha)
+        .where(PuntoBombeo.proyecto_id == proyecto_id)
+    ).all()
+    return AlineamientoVertical(
+        [(float(k), float(e), float(l)) for k, e, l in pvis],
+        [(float(k), float(p)) for k, p in bombeo],
+    )
+
+
+def diseno_virtual(db: Session, proyecto_id: int, km_mm) -> dict:
+    """
+    {km_mm: (base_cl, pendiente_derecha)} en micras para los km (milímetros)
+    que cubre la rasante del proyecto; vacío si no tiene alineamiento.
+    """
+    if not len(km_mm):
+        return {}
+    alineamiento = cargar_alineamiento(db, proyecto_id)
+    if alineamiento is None:
+        return {}
+    km_mm = np.asarray(km_mm, dtype=np.int64)
+    cubierto, base_cl, pendiente = alineamiento.evaluar_micras(km_mm)
+    return {int(km_mm[i]): (int(base_cl[i]), int(pendiente[i])) for i in np.flatnonzero(cubierto)}
+
+
+def km_estaciones(km_inicial: Decimal, km_final: Decimal, intervalo: Decimal) -> np.ndarray:
+    """Km de las estaciones cada `intervalo` en milímetros (int64), incluido km_final si cae en la malla"""
+    return punto_fijo.serie(
+        punto_fijo.a_entero(km_inicial, punto_fijo.MILIMETROS),
+        punto_fijo.a_entero(km_final, punto_fijo.MILIMETROS),
+        punto_fijo.a_entero(intervalo, punto_fijo.MILIMETROS),
+    )
+
+
+def estaciones_virtuales(db: Session, proyecto: Proyecto, alineamiento: AlineamientoVertical,
+                         km_desde: Decimal = None, km_hasta: Decimal = None) -> List[dict]:
+    """
+    Estaciones cada `intervalo` en [km_desde, km_hasta] evaluadas con el
+    alineamiento, sustituidas por la fila de estaciones_teoricas donde exista
+    (sobrescritura del diseñador). Las filas guardadas fuera de la malla
+    también se incluyen.
+    """
+    desde = Decimal(proyecto.km_inicial) if km_desde is None else max(Decimal(km_desde), Decimal(proyecto.km_inicial))
+    hasta = Decimal(proyecto.km_final) if km_hasta is None else min(Decimal(km_hasta), Decimal(proyecto.km_final))
+    if hasta < desde:
+        return []
+
+    # Malla alineada con km_inicial, recortada al rango pedido (milímetros enteros)
+    km = km_estaciones(proyecto.km_inicial, proyecto.km_final, proyecto.intervalo)
+    km = km[(km >= punto_fijo.a_entero(desde, punto_fijo.MILIMETROS))
+            & (km <= punto_fijo.a_entero(hasta, punto_fijo.MILIMETROS))]
+    cubierto, base_cl, pendiente = alineamiento.evaluar_micras(km)
+    km_m = punto_fijo.a_float(km, punto_fijo.MILIMETROS)
+    base_m = punto_fijo.a_float(base_cl, punto_fijo.MICRAS)
+    pendiente_m = punto_fijo.a_float(pendiente, punto_fijo.MICRAS)
+
+    estaciones = {
+        int(km[i]): {
+            "km": float(km_m[i]),
+            "base_cl": float(base_m[i]) if cubierto[i] else None,
+            "pendiente_derecha": float(pendiente_m[i]),
+            "pendiente_izquierda": float(-pendiente_m[i]),
+            "estacion_id": None,
+            "origen": "diseno",
+        }
+        for i in range(len(km))
+    }
+
+    sobrescritas = db.query(EstacionTeorica).filter(
+        EstacionTeorica.proyecto_id == proyecto.id,
+        EstacionTeorica.km >= desde,
+        EstacionTeorica.km <= hasta,
+    )
+    for estacion in sobrescritas:
+        estaciones[punto_fijo.a_entero(estacion.km, punto_fijo.MILIMETROS)] = {
+            "km": float(estacion.km),
+            "base_cl": float(estacion.base_cl),
+            "pendiente_derecha": float(estacion.pendiente_derecha),
+            "pendiente_izquierda": float(-estacion.pendiente_derecha),
+            "estacion_id": estacion.id,
+            "origen": "estacion",
+        }
+
+    return [estaciones[k] for k in sorted(estaciones)]
+
+
+def materializar_estaciones(db: Session, proyecto: Proyecto, km_desde: Decimal, km_hasta: Decimal) -> int:
+    """
+    Guarda en estaciones_teoricas, con los valores del alineamiento, las
+    estaciones de la malla en [km_desde, km_hasta] que sólo existen como
+    virtuales, para que una edición del rango pueda sobrescribirlas. No hace
+    commit. Devuelve el número de filas insertadas (0 sin alineamiento).
+    """
+    alineamiento = cargar_alineamiento(db, proyecto.id)
+    if alineamiento is None:
+        return 0
+    km = km_estaciones(proyecto.km_inicial, proyecto.km_final, proyecto.intervalo)
+    km = km[(km >= punto_fijo.a_entero(km_desde, punto_fijo.MILIMETROS))
+            & (km <= punto_fijo.a_entero(km_hasta, punto_fijo.MILIMETROS))]
+    guardadas = {
+        punto_fijo.a_entero(k, punto_fijo.MILIMETROS)
+        for k in db.scalars(select(EstacionTeorica.km).where(
+            EstacionTeorica.proyecto_id == proyecto.id,
+            EstacionTeorica.km >= km_desde,
+            EstacionTeorica.km <= km_hasta,
+        ))
+    }
+    cubierto, base_cl, pendiente = alineamiento.evaluar_micras(km)
+    filas = [
+        {
+            "proyecto_id": proyecto.id,
+            "km": punto_fijo.a_decimal(int(km[i]), punto_fijo.MILIMETROS),
+            "base_cl": punto_fijo.a_decimal(int(base_cl[i]), punto_fijo.MICRAS),
+            "pendiente_derecha": punto_fijo.a_decimal(int(pendiente[i]), punto_fijo.MICRAS),
+        }
+        for i in np.flatnonzero(cubierto)
+        if int(km[i]) not in guardadas
+    ]
+    if filas:
+        db.execute(EstacionTeorica.__table__.insert(), filas)
+    return len(filas)
+
+
+def guardar_alineamiento(db: Session, proyecto_id: int, datos) -> None:
+    """Reemplaza los PVI y puntos de bombeo del proyecto (no hace commit)"""
+    db.query(PVIProyecto).filter(PVIProyecto.proyecto_id == proyecto_id).delete(synchronize_session=False)
+    db.query(PuntoBombeo).filter(PuntoBombeo.proyecto_id == proyecto_id).delete(synchronize_session=False)
+    if datos.pvis:
+        db.execute(PVIProyecto.__table__.insert(), [
+            {"proyecto_id": proyecto_id, "km": p.km, "elevacion": p.elevacion, "longitud_curva": p.longitud_curva}
+            for p in datos.pvis
+        ])
+    if datos.bombeo:
+        db.execute(PuntoBombeo.__table__.insert(), [
+            {"proyecto_id": proyecto_id, "km": b.km, "pendiente_derecha": b.pendiente_derecha}
+            for b in datos.bombeo
+        ])
+    db.expire_all()
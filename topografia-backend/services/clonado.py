@@ -0,0 +1,161 @@
+"""
+Clonado de proyectos dentro de la base de datos.
+
+El proyecto nuevo se crea con el ORM (una fila) y sus estaciones, PVI, puntos
+de bombeo, mediciones y lecturas se copian con INSERT ... SELECT, una
+sentencia por tabla, sin pasar las filas por Python. Las mediciones copiadas
+se emparejan con las originales por la restricción única (proyecto_id,
+estacion_km).
+
+De PVI y bombeo se copian además los puntos de fuera del rango de los que
+depende el diseño dentro de él: el punto de bombeo más cercano a cada
+extremo y los dos PVI más cercanos (el primero puede tener una curva vertical
+que entra en el rango y la curva necesita la tangente anterior).
+"""
+from decimal import Decimal
+
+from sqlalchemy import and_, func, insert, literal, select
+from sqlalchemy.orm import Session, aliased
+
+from models.alineamiento import PVIProyecto, PuntoBombeo
+from models.estacion import EstacionTeorica
+from models.lectura import LecturaDivision
+from models.medicion import MedicionEstacion
+from models.proyecto import Proyecto
+from schemas.proyecto import ProyectoClonar
+
+# Columnas de configuración que se heredan tal cual del proyecto origen
+_CAMPOS_CONFIGURACION = (
+    "intervalo", "espesor", "tolerancia_sct",
+    "divisiones_izquierdas", "divisiones_derechas", "encargados",
+)
+
+
+def _en_rango(columna, km_desde: Decimal, km_hasta: Decimal):
+    return and_(columna >= km_desde, columna <= km_hasta)
+
+
+def _en_rango_con_vecinos(modelo, proyecto_id: int, km_desde: Decimal, km_hasta: Decimal, vecinos: int):
+    """Rango ampliado hasta `vecinos` puntos antes de km_desde y después de km_hasta"""
+    def extremo(condicion, orden, agregado):
+        cercanos = select(modelo.km).where(
+            modelo.proyecto_id == proyecto_id, condicion
+        ).order_by(orden).limit(vecinos).subquery()
+        return select(agregado(cercanos.c.km)).scalar_subquery()
+
+    anterior = extremo(modelo.km <= km_desde, modelo.km.desc(), func.min)
+    posterior = extremo(modelo.km >= km_hasta, modelo.km.asc(), func.max)
+    return and_(
+        modelo.km >= func.coalesce(anterior, km_desde),
+        modelo.km <= func.coalesce(posterior, km_hasta),
+    )
+
+
+def clonar_proyecto(db: Session, origen: Proyecto, opciones: ProyectoClonar, usuario_id) -> Proyecto:
+    """
+    Crea la copia y devuelve el proyecto nuevo sin confirmar la transacción,
+    para que quien llama decida el commit.
+    """
+    km_desde = max(origen.km_inicial, opciones.km_desde) if opciones.km_desde is not None else origen.km_inicial
+    km_hasta = min(origen.km_final, opciones.km_hasta) if opciones.km_hasta is not None else origen.km_final
+    desplazamiento = Decimal(opciones.desplazamiento_km)
+
+    nuevo = Proyecto(
+        usuario_id=usuario_id,
+        nombre=opciones.nombre or f"{origen.nombre} (copia)",
+        tramo=opciones.tramo if opciones.tramo is not None else origen.tramo,
+        cuerpo=opciones.cuerpo if opciones.cuerpo is not None else origen.cuerpo,
+        km_inicial=km_desde + desplazamiento,
+        km_final=km_hasta + desplazamiento,
+        **{campo: getattr(origen, campo) for campo in _CAMPOS_CONFIGURACION},
+    )
+    db.add(nuevo)
+    db.flush()
+
+    offset = literal(desplazamiento, EstacionTeorica.km.type)
+
+    db.execute(insert(EstacionTeorica).from_select(
+        ["proyecto_id", "km", "pendiente_derecha", "base_cl", "observaciones"],
+        select(
+            literal(nuevo.id),
+            EstacionTeorica.km + offset,
+            EstacionTeorica.pendiente_derecha,
+            EstacionTeorica.base_cl,
+            EstacionTeorica.observaciones,
+        ).where(
+            EstacionTeorica.proyecto_id == origen.id,
+            _en_rango(EstacionTeorica.km, km_desde, km_hasta),
+        )
+    ))
+
+    db.execute(insert(PVIProyecto).from_select(
+        ["proyecto_id", "km", "elevacion", "longitud_curva"],
+        select(
+            literal(nuevo.id),
+            PVIProyecto.km + offset,
+            PVIProyecto.elevacion,
+            PVIProyecto.longitud_curva,
+        ).where(
+            PVIProyecto.proyecto_id == origen.id,
+            _en_rango_con_vecinos(PVIProyecto, origen.id, km_desde, km_hasta, vecinos=2),
+        )
+    ))
+
+    db.execute(insert(PuntoBombeo).from_select(
+        ["proyecto_id", "km", "pendiente_derecha"],
+        select(
+            literal(nuevo.id),
+            PuntoBombeo.km + offset,
+            PuntoBombeo.pendiente_derecha,
+        ).where(
+            PuntoBombeo.proyecto_id == origen.id,
+            _en_rango_con_vecinos(PuntoBombeo, origen.id, km_desde, km_hasta, vecinos=1),
+        )
+    ))
+
+    if opciones.incluir_campo:
+        db.execute(insert(MedicionEstacion).from_select(
+            ["proyecto_id", "estacion_km", "bn_altura", "bn_lectura", "fecha_medicion",
+             "operador", "condiciones_clima", "observaciones"],
+            select(
+                literal(nuevo.id),
+                MedicionEstacion.estacion_km + offset,
+                MedicionEstacion.bn_altura,
+                MedicionEstacion.bn_lectura,
+                MedicionEstacion.fecha_medicion,
+                MedicionEstacion.operador,
+                MedicionEstacion.condiciones_clima,
+                MedicionEstacion.observaciones,
+            ).where(
+                MedicionEstacion.proyecto_id == origen.id,
+                _en_rango(MedicionEstacion.estacion_km, km_desde, km_hasta),
+            )
+        ))
+
+        medicion_origen = aliased(MedicionEstacion)
+        medicion_nueva = aliased(MedicionEstacion)
+        columnas_lectura = [
+            "division_transversal", "lectura_mira", "elv_base_real", "elv_base_proyecto",
+            "elv_concreto_proyecto", "esp_concreto_proyecto", "clasificacion",
+            "volumen_por_metro", "cumple_tolerancia", "calidad",
+        ]
+        db.execute(insert(LecturaDivision).from_select(
+            ["medicion_id", "proyecto_id"] + columnas_lectura,
+            select(
+                medicion_nueva.id,
+                literal(nuevo.id),
+                *(getattr(LecturaDivision, columna) for columna in columnas_lectura),
+            ).join(
+                medicion_origen, medicion_origen.id == LecturaDivision.medicion_id
+            ).join(
+                medicion_nueva, and_(
+                    medicion_nueva.proyecto_id == nuevo.id,
+                    medicion_nueva.estacion_km == medicion_origen.estacion_km + offset,
+                )
+            ).where(
+                LecturaDivision.proyecto_id == origen.id,
+                _en_rango(medicion_origen.estacion_km, km_desde, km_hasta),
+            )
+        ))
+
+    return nuevo
@@ -0,0 +1,71 @@
+"""
+Edición en bloque de los datos de diseño (estaciones teóricas).
+
+En un proyecto con alineamiento las estaciones del rango que sólo son
+virtuales se guardan antes como filas (services/alineamiento.py) para que el
+UPDATE las sobrescriba igual que a las demás.
+"""
+from sqlalchemy import case, literal, select, update
+from sqlalchemy.orm import Session
+
+from models.estacion import EstacionTeorica
+from models.proyecto import Proyecto
+from schemas.estacion import EstacionesRangoUpdate, ValorRango
+from services.alineamiento import materializar_estaciones
+
+CAMPOS_EDITABLES = ("pendiente_derecha", "base_cl")
+
+
+class ErrorRango(ValueError):
+    """Los valores enviados no encajan con las estaciones del rango"""
+
+
+def _expresion(campo: str, valor: ValorRango, cambios: EstacionesRangoUpdate, ids):
+    """Expresión SQL que da el nuevo valor de `campo` para cada fila del UPDATE"""
+    tipo = getattr(EstacionTeorica, campo).type
+    if valor.modo == "constante":
+        return literal(valor.valor, tipo)
+    if valor.modo == "rampa":
+        # Interpolación lineal por km entre los extremos del rango
+        pendiente = (valor.fin - valor.inicio) / (cambios.km_hasta - cambios.km_desde)
+        return literal(valor.inicio, tipo) + (EstacionTeorica.km - literal(cambios.km_desde, tipo)) * literal(pendiente, tipo)
+    # lista: un valor por estación en orden de km, aplicado por id
+    if len(valor.valores) != len(ids):
+        raise ErrorRango(
+            f"{campo}: se recibieron {len(valor.valores)} valores para {len(ids)} estaciones en el rango"
+        )
+    return case(
+        {estacion_id: literal(v, tipo) for estacion_id, v in zip(ids, valor.valores)},
+        value=EstacionTeorica.id,
+    )
+
+
+def actualizar_rango(db: Session, proyecto: Proyecto, cambios: EstacionesRangoUpdate) -> int:
+    """
+    Aplica los cambios con un único UPDATE. En modo lista se leen antes los
+    ids del rango (ordenados por km) para validar la cantidad de valores.
+    No confirma la transacción. Devuelve el número de estaciones actualizadas.
+    """
+    materializar_estaciones(db, proyecto, cambios.km_desde, cambios.km_hasta)
+    en_rango = (
+        EstacionTeorica.proyecto_id == proyecto.id,
+        EstacionTeorica.km >= cambios.km_desde,
+        EstacionTeorica.km <= cambios.km_hasta,
+    )
+
+    ids = None
+    if any(getattr(cambios, campo) is not None and getattr(cambios, campo).modo == "lista"
+           for campo in CAMPOS_EDITABLES):
+        ids = db.scalars(select(EstacionTeorica.id).where(*en_rango).order_by(EstacionTeorica.km)).all()
+
+    valores = {
+        campo: _expresion(campo, getattr(cambios, campo), cambios, ids)
+        for campo in CAMPOS_EDITABLES
+        if getattr(cambios, campo) is not None
+    }
+
+    resultado = db.execute(
+        update(EstacionTeorica).where(*en_rango).values(**valores),
+        execution_options={"synchronize_session": False},
+    )
+    return resultado.rowcount
@@ -0,0 +1,355 @@
+"""
+Importación de datos de diseño (base_cl y bombeo/sobreelevación) desde
+LandXML o CSV hacia estaciones_teoricas.
+
+Los archivos se leen de forma incremental: el LandXML con iterparse,
+liberando cada elemento al terminarlo, y el CSV fila a fila. Sólo se conservan
+los puntos del alineamiento elegido (PVI y sobreelevaciones), nunca las
+superficies ni el resto del documento. Con esos puntos se evalúan base_cl y
+pendiente_derecha en los km del proyecto:
+
+- estaciones="intervalo": cada `intervalo` entre km_inicial y km_final.
+- estaciones="existentes": sólo los km de las estaciones ya cargadas.
+
+Las filas se escriben con un upsert por lotes sobre `_proyecto_km_uc`. Con
+simulacion=True no se escribe nada y se devuelve el diff contra lo existente.
+
+Los puntos evaluados viajan como enteros de punto fijo (km en milímetros,
+base_cl y pendiente en micras; services/punto_fijo.py): el CSV se interpreta
+sin pasar por float y el diff compara exactamente con lo guardado.
+
+La unidad de la pendiente del CSV (porcentaje o m/m) se decide una vez por
+archivo, nunca por fila: en una transición de sobreelevación hay valores
+entre -1 y 1 en ambas unidades. Por orden: el parámetro `unidad_pendiente`,
+el encabezado (`bombeo_%`, `pendiente (m/m)`) o la columna completa (ver
+`_unidad_por_columna`).
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Optional, Tuple
+import codecs
+import csv
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import insert_con_conflicto
+from models.estacion import EstacionTeorica
+from models.proyecto import Proyecto
+from services import punto_fijo
+from services.alineamiento import AlineamientoVertical, km_estaciones
+
+TAMANO_LOTE = 1000
+MAX_DIFERENCIAS = 200
+PENDIENTE_NORMAL = Decimal("0.02")  # Bombeo normal cuando el archivo no indica sobreelevación
+UNIDADES_PENDIENTE = ("porcentaje", "m/m")
+# Sin unidad declarada: una columna con todos sus valores hasta aquí se lee en
+# m/m (en % sería una vía prácticamente plana, sin el bombeo normal del 2 %)
+PENDIENTE_MAX_MM = Decimal("0.2")
+
+# Encabezados CSV aceptados para cada columna
+_COLUMNAS_CSV = {
+    "km": ("km", "estacion", "cadenamiento", "sta", "station"),
+    "base_cl": ("base_cl", "elevacion", "elev", "cota", "elevation"),
+    "pendiente_derecha": ("pendiente_derecha", "pendiente", "bombeo", "crossfall", "cross_slope"),
+}
+
+
+class ErrorImportacion(ValueError):
+    """El archivo no se puede interpretar o no cubre el proyecto"""
+
+
+@dataclass
+class DatosDiseno:
+    """Puntos de diseño leídos del archivo"""
+    alineamiento: Optional[str] = None
+    # Perfil: (estación, elevación, longitud de curva vertical)
+    pvis: List[Tuple[float, float, float]] = field(default_factory=list)
+    # Sobreelevación: (estación, pendiente derecha en m/m); vacío = sin datos
+    pendientes: List[Tuple[float, float]] = field(default_factory=list)
+
+
+def _local(tag: str) -> str:
+    """Nombre de la etiqueta sin el espacio de nombres de LandXML"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def leer_landxml(archivo, alineamiento: str = None) -> DatosDiseno:
+    """
+    Recorre el LandXML con iterparse y extrae el perfil (PVI, ParaCurve,
+    CircCurve de ProfAlign) y la sobreelevación del alineamiento pedido (o
+    del primero). En Superelevation, beginRunoutSta/endofRunoutSta llevan
+    bombeo normal y fullSuperSta/runoffSta el valor fullSuperelev (%).
+    """
+    datos = DatosDiseno()
+    elegido = False
+    peralte = None  # Hijos de la Superelevation abierta
+    abiertos = []  # Pila de elementos abiertos, para soltar cada uno de su padre
+
+    try:
+        for evento, elem in ET.iterparse(archivo, events=("start", "end")):
+            nombre = _local(elem.tag)
+            if evento == "start":
+                abiertos.append(elem)
+                if nombre == "Alignment" and datos.alineamiento is None:
+                    elegido = alineamiento is None or elem.get("name") == alineamiento
+                    if elegido:
+                        datos.alineamiento = elem.get("name") or ""
+                elif nombre == "Superelevation" and elegido:
+                    peralte = {}
+                continue
+
+            abiertos.pop()
+            if nombre == "Alignment" and elegido:
+                # El resto del documento no interesa: se deja de leer
+                break
+            if elegido and nombre in ("PVI", "ParaCurve", "CircCurve"):
+                sta, elev = (float(v) for v in (elem.text or "").split()[:2])
+                longitud = float(elem.get("length", 0)) if nombre != "PVI" else 0.0
+                datos.pvis.append((sta, elev, longitud))
+            elif peralte is not None and nombre == "Superelevation":
+                completo = float(peralte.get("fullSuperelev", 0)) / 100
+                normal = float(PENDIENTE_NORMAL)
+                for clave, valor in (("beginRunoutSta", normal), ("fullSuperSta", completo),
+                                     ("runoffSta", completo), ("endofRunoutSta", normal)):
+                    if clave in peralte:
+                        datos.pendientes.append((float(peralte[clave]), valor))
+                peralte = None
+            elif peralte is not None and elem.text:
+                peralte[nombre] = elem.text.strip()
+
+            # Suelta el elemento ya procesado: la memoria no crece con el archivo
+            elem.clear()
+            if abiertos:
+                abiertos[-1].remove(elem)
+    except (ET.ParseError, ValueError) as e:
+        raise ErrorImportacion(f"LandXML inválido: {e}")
+
+    if datos.alineamiento is None:
+        raise ErrorImportacion(
+            f"No se encontró el alineamiento '{alineamiento}'" if alineamiento
+            else "El archivo no contiene ningún Alignment"
+        )
+    if len(datos.pvis) < 2:
+        raise ErrorImportacion("El alineamiento no tiene perfil (se necesitan al menos dos PVI)")
+    return datos
+
+
+# Unidad escrita al final del encabezado: "bombeo_%", "pendiente (%)", "bombeo_pct", "pendiente m/m"
+_UNIDAD_ENCABEZADO = re.compile(r"[\s_]*(?:\(\s*)?(%|pct|porcentaje|m/m)(?:\s*\))?$")
+
+
+def _sin_unidad(nombre: str) -> str:
+    return _UNIDAD_ENCABEZADO.sub("", nombre.strip().lower())
+
+
+def _unidad_de_encabezado(nombre: str) -> Optional[str]:
+    encontrada = _UNIDAD_ENCABEZADO.search(nombre.strip().lower())
+    if encontrada is None:
+        return None
+    return "m/m" if encontrada.group(1) == "m/m" else "porcentaje"
+
+
+def _columna(encabezados, opciones):
+    for nombre in encabezados:
+        if _sin_unidad(nombre) in opciones:
+            return nombre
+    return None
+
+
+def _unidad_por_columna(archivo, columna: str) -> str:
+    """
+    Unidad de la columna de pendiente completa, sin unidad declarada: con algún
+    valor mayor que 1 en valor absoluto es porcentaje; con todos hasta
+    PENDIENTE_MAX_MM, m/m. Entre ambos la columna es ambigua. Recorre el
+    archivo una vez sin guardar filas y lo deja al principio.
+    """
+    inicio = archivo.tell()
+    maximo = Decimal(0)
+    for fila in csv.DictReader(codecs.getreader("utf-8-sig")(archivo)):
+        texto = (fila.get(columna) or "").strip()
+        try:
+            maximo = max(maximo, abs(Decimal(texto))) if texto else maximo
+        except ArithmeticError:
+            continue  # La lectura normal informa la fila
+    archivo.seek(inicio)
+    if maximo > 1:
+        return "porcentaje"
+    if maximo <= PENDIENTE_MAX_MM:
+        return "m/m"
+    raise ErrorImportacion(
+        f"No se puede deducir la unidad de la columna '{columna}' (valores hasta {maximo}): "
+        "indica unidad_pendiente=porcentaje o m/m, o escríbela en el encabezado (p. ej. bombeo_%)"
+    )
+
+
+def leer_csv(archivo, unidad_pendiente: str = None) -> Iterator[Tuple[int, int, Optional[int]]]:
+    """
+    Filas (km, base_cl, pendiente_derecha) de un CSV con encabezado, leídas de
+    una en una, en milímetros y micras. La pendiente es opcional; en
+    porcentaje se convierte a m/m (la unidad es la misma para todo el archivo).
+    """
+    if unidad_pendiente is not None and unidad_pendiente not in UNIDADES_PENDIENTE:
+        raise ErrorImportacion("unidad_pendiente debe ser porcentaje o m/m")
+    inicio = archivo.tell()
+    encabezados = csv.DictReader(codecs.getreader("utf-8-sig")(archivo)).fieldnames or []
+    archivo.seek(inicio)
+    col_km = _columna(encabezados, _COLUMNAS_CSV["km"])
+    col_base = _columna(encabezados, _COLUMNAS_CSV["base_cl"])
+    col_pendiente = _columna(encabezados, _COLUMNAS_CSV["pendiente_derecha"])
+    if col_km is None or col_base is None:
+        raise ErrorImportacion("El CSV debe tener columnas de km y base_cl (o elevacion)")
+    if col_pendiente is not None:
+        unidad_pendiente = (unidad_pendiente or _unidad_de_encabezado(col_pendiente)
+                            or _unidad_por_columna(archivo, col_pendiente))
+    en_porcentaje = unidad_pendiente == "porcentaje"
+
+    lector = csv.DictReader(codecs.getreader("utf-8-sig")(archivo))
+
+    anterior = None
+    for numero, fila in enumerate(lector, start=2):
+        try:
+            km = punto_fijo.a_entero(fila[col_km].strip(), punto_fijo.MILIMETROS)
+            base_cl = punto_fijo.a_entero(fila[col_base].strip(), punto_fijo.MICRAS)
+            pendiente = None
+            if col_pendiente and (fila[col_pendiente] or "").strip():
+                valor = Decimal(fila[col_pendiente].strip())
+                if en_porcentaje:
+                    valor /= 100
+                pendiente = punto_fijo.a_entero(valor, punto_fijo.MICRAS)
+        except (AttributeError, ArithmeticError, TypeError, ValueError):
+            raise ErrorImportacion(f"Fila {numero}: valores no numéricos")
+        if anterior is not None and km <= anterior:
+            raise ErrorImportacion(f"Fila {numero}: los km deben venir en orden creciente")
+        anterior = km
+        yield km, base_cl, pendiente
+
+
+def evaluar_landxml(datos: DatosDiseno, objetivos: List[Decimal]):
+    """(km, base_cl, pendiente_derecha) en cada km objetivo cubierto por el perfil"""
+    try:
+        alineamiento = AlineamientoVertical(datos.pvis, datos.pendientes)
+    except ValueError as e:
+        raise ErrorImportacion(str(e))
+    km_mm = punto_fijo.a_enteros(objetivos, punto_fijo.MILIMETROS)
+    cubierto, base_cl, pendiente = alineamiento.evaluar_micras(km_mm)
+    for i in np.flatnonzero(cubierto):
+        # Sin sobreelevación en el archivo se conserva la pendiente existente
+        yield objetivos[i], int(base_cl[i]), int(pendiente[i]) if datos.pendientes else None
+
+
+def evaluar_csv(filas: Iterator[Tuple[int, int, Optional[int]]], objetivos: Iterable[Decimal]):
+    """
+    Recorre a la par las filas del CSV y los km objetivo (ambos crecientes),
+    interpolando linealmente (en enteros) entre las dos filas que rodean cada km.
+    """
+    anterior, siguiente = None, next(filas, None)
+    for km in objetivos:
+        sta = punto_fijo.a_entero(km, punto_fijo.MILIMETROS)
+        while siguiente is not None and siguiente[0] < sta:
+            anterior, siguiente = siguiente, next(filas, None)
+        if siguiente is None:
+            return
+        if siguiente[0] == sta:
+            yield km, siguiente[1], siguiente[2]
+            continue
+        if anterior is None:
+            # km anterior al inicio del archivo
+            continue
+        pendiente = None
+        if anterior[2] is not None and siguiente[2] is not None:
+            pendiente = int(punto_fijo.interpolar(sta, anterior[0], siguiente[0], anterior[2], siguiente[2]))
+        yield km, int(punto_fijo.interpolar(sta, anterior[0], siguiente[0], anterior[1], siguiente[1])), pendiente
+
+
+def km_objetivo(db: Session, proyecto: Proyecto, estaciones: str) -> List[Decimal]:
+    """Km donde se evalúa el diseño, en orden creciente"""
+    if estaciones == "existentes":
+        return list(db.scalars(
+            select(EstacionTeorica.km).where(EstacionTeorica.proyecto_id == proyecto.id).order_by(EstacionTeorica.km)
+        ))
+    # Milímetros enteros: sin deriva acumulada en proyectos largos
+    return punto_fijo.a_decimales(
+        km_estaciones(proyecto.km_inicial, proyecto.km_final, proyecto.intervalo), punto_fijo.MILIMETROS
+    )
+
+
+def _a_decimal(valor: Optional[int]) -> Optional[Decimal]:
+    return None if valor is None else punto_fijo.a_decimal(valor, punto_fijo.MICRAS)
+
+
+def importar(db: Session, proyecto: Proyecto, puntos, simulacion: bool = False) -> dict:
+    """
+    Aplica (o simula) los puntos evaluados. No confirma la transacción.
+    Las estaciones existentes conservan su pendiente si el archivo no la trae.
+    """
+    # Lo existente llega ya en enteros escalados: el diff compara enteros, sin Decimal
+    existentes = {
+        km: (base_cl, pendiente)
+        for km, base_cl, pendiente in db.execute(
+            select(
+                punto_fijo.columna(EstacionTeorica.km, punto_fijo.MILIMETROS),
+                punto_fijo.columna(EstacionTeorica.base_cl, punto_fijo.MICRAS),
+                punto_fijo.columna(EstacionTeorica.pendiente_derecha, punto_fijo.MICRAS),
+            ).where(EstacionTeorica.proyecto_id == proyecto.id)
+        )
+    }
+    normal = punto_fijo.a_entero(PENDIENTE_NORMAL, punto_fijo.MICRAS)
+
+    resumen = {"nuevas": 0, "modificadas": 0, "sin_cambios": 0, "diferencias": []}
+    lote_con_pendiente, lote_sin_pendiente = [], []
+
+    for km, base_cl, pendiente in puntos:
+        antes = existentes.get(punto_fijo.a_entero(km, punto_fijo.MILIMETROS))
+
+        if antes is None:
+            resumen["nuevas"] += 1
+            cambio = {"km": km, "accion": "nueva", "base_cl": _a_decimal(base_cl),
+                      "pendiente_derecha": _a_decimal(pendiente if pendiente is not None else normal)}
+        elif antes[0] == base_cl and (pendiente is None or antes[1] == pendiente):
+            resumen["sin_cambios"] += 1
+            continue
+        else:
+            resumen["modificadas"] += 1
+            cambio = {"km": km, "accion": "modificada",
+                      "base_cl_anterior": _a_decimal(antes[0]), "base_cl": _a_decimal(base_cl),
+                      "pendiente_derecha_anterior": _a_decimal(antes[1]),
+                      "pendiente_derecha": _a_decimal(pendiente if pendiente is not None else antes[1])}
+
+        if len(resumen["diferencias"]) < MAX_DIFERENCIAS:
+            resumen["diferencias"].append(cambio)
+        if simulacion:
+            continue
+
+        fila = {"proyecto_id": proyecto.id, "km": km, "base_cl": _a_decimal(base_cl),
+                "pendiente_derecha": _a_decimal(pendiente if pendiente is not None else normal)}
+        lote = lote_con_pendiente if pendiente is not None else lote_sin_pendiente
+        lote.append(fila)
+        if len(lote) >= TAMANO_LOTE:
+            _upsert(db, lote, con_pendiente=lote is lote_con_pendiente)
+            lote.clear()
+
+    if not simulacion:
+        _upsert(db, lote_con_pendiente, con_pendiente=True)
+        _upsert(db, lote_sin_pendiente, con_pendiente=False)
+
+    if resumen["nuevas"] + resumen["modificadas"] + resumen["sin_cambios"] == 0:
+        raise ErrorImportacion("El archivo no cubre ningún km del proyecto")
+    return resumen
+
+
+def _upsert(db: Session, filas: List[dict], con_pendiente: bool):
+    """INSERT ... ON CONFLICT (proyecto_id, km) DO UPDATE para un lote"""
+    if not filas:
+        return
+    sentencia = insert_con_conflicto(db, EstacionTeorica).values(filas)
+    actualizar = {"base_cl": sentencia.excluded.base_cl}
+    if con_pendiente:
+        actualizar["pendiente_derecha"] = sentencia.excluded.pendiente_derecha
+    db.execute(sentencia.on_conflict_do_update(
+        index_elements=["proyecto_id", "km"],  # _proyecto_km_uc
+        set_=actualizar,
+    ))
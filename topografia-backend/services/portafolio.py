@@ -0,0 +1,117 @@
+"""
+Resumen de avance de todos los proyectos de un usuario (Proyectos/Dashboard).
+
+Una sola consulta: los proyectos del usuario unidos a tres agregados por
+proyecto (mediciones, lecturas y alertas abiertas), cada uno un GROUP BY
+sobre el índice que empieza por proyecto_id. El número de consultas no
+depende de cuántos proyectos tenga el usuario.
+
+- estaciones_capturadas: estaciones con medición (una por km y proyecto).
+- porcentaje_avance: capturadas / total_estaciones, acotado a 100.
+- porcentaje_cumplimiento: lecturas con elevación real que no tienen alerta
+  `fuera_tolerancia` en el índice de alertas (services/alertas.py), es decir,
+  comparadas con el diseño vigente y no con la copia guardada en la lectura.
+- ultima_actividad: la más reciente entre la modificación del proyecto y el
+  último cálculo de una lectura.
+"""
+from typing import List
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from models.alerta import Alerta
+from models.lectura import LecturaDivision
+from models.medicion import MedicionEstacion
+from models.proyecto import Proyecto
+from services.alertas import CRITICA
+
+
+def _porcentaje(parte: int, total: int):
+    if not total:
+        return None
+    return round(min(parte / total, 1) * 100, 1)
+
+
+def resumen_usuario(db: Session, usuario_id: str) -> List[dict]:
+    """Avance, cumplimiento y última actividad de cada proyecto del usuario"""
+    propios = (
+        select(Proyecto.id)
+        .where(Proyecto.usuario_id == usuario_id, Proyecto.eliminado_en.is_(None))
+        .scalar_subquery()
+    )
+
+    mediciones = (
+        select(
+            MedicionEstacion.proyecto_id,
+            func.count().label("capturadas"),
+            func.max(MedicionEstacion.fecha_medicion).label("ultima_medicion"),
+        )
+        .where(MedicionEstacion.proyecto_id.in_(propios))
+        .group_by(MedicionEstacion.proyecto_id)
+        .subquery()
+    )
+    lecturas = (
+        select(
+            LecturaDivision.proyecto_id,
+            func.count().label("lecturas"),
+            func.count(LecturaDivision.elv_base_real).label("evaluadas"),
+            func.max(LecturaDivision.fecha_calculo).label("ultima_lectura"),
+        )
+        .where(LecturaDivision.proyecto_id.in_(propios))
+        .group_by(LecturaDivision.proyecto_id)
+        .subquery()
+    )
+    alertas = (
+        select(
+            Alerta.proyecto_id,
+            func.count().label("abiertas"),
+            func.sum(case((Alerta.severidad == CRITICA, 1), else_=0)).label("criticas"),
+            func.sum(case((Alerta.tipo == "fuera_tolerancia", 1), else_=0)).label("fuera_tolerancia"),
+        )
+        .where(Alerta.proyecto_id.in_(propios))
+        .group_by(Alerta.proyecto_id)
+        .subquery()
+    )
+
+    filas = db.execute(
+        select(
+            Proyecto.id, Proyecto.nombre, Proyecto.tramo, Proyecto.cuerpo, Proyecto.estado,
+            Proyecto.total_estaciones, Proyecto.fecha_modificacion, Proyecto.revision,
+            func.coalesce(mediciones.c.capturadas, 0), mediciones.c.ultima_medicion,
+            func.coalesce(lecturas.c.lecturas, 0), func.coalesce(lecturas.c.evaluadas, 0),
+            lecturas.c.ultima_lectura,
+            func.coalesce(alertas.c.abiertas, 0), func.coalesce(alertas.c.criticas, 0),
+            func.coalesce(alertas.c.fuera_tolerancia, 0),
+        )
+        .outerjoin(mediciones, mediciones.c.proyecto_id == Proyecto.id)
+        .outerjoin(lecturas, lecturas.c.proyecto_id == Proyecto.id)
+        .outerjoin(alertas, alertas.c.proyecto_id == Proyecto.id)
+        .where(Proyecto.usuario_id == usuario_id, Proyecto.eliminado_en.is_(None))
+    ).all()
+
+    resumen = []
+    for (id_, nombre, tramo, cuerpo, estado, total, modificado, revision,
+         capturadas, ultima_medicion, n_lecturas, evaluadas, ultima_lectura,
+         abiertas, criticas, fuera) in filas:
+        actividad = [f for f in (modificado, ultima_lectura) if f is not None]
+        resumen.append({
+            "id": id_,
+            "nombre": nombre,
+            "tramo": tramo,
+            "cuerpo": cuerpo,
+            "estado": estado or "CONFIGURACION",
+            "revision": revision or 1,
+            "total_estaciones": total or 0,
+            "estaciones_capturadas": capturadas,
+            "porcentaje_avance": _porcentaje(capturadas, total) or 0.0,
+            "lecturas": n_lecturas,
+            "lecturas_evaluadas": evaluadas,
+            "lecturas_fuera_tolerancia": fuera,
+            "porcentaje_cumplimiento": _porcentaje(max(evaluadas - fuera, 0), evaluadas),
+            "alertas_abiertas": abiertas,
+            "alertas_criticas": criticas,
+            "ultima_medicion": ultima_medicion,
+            "ultima_actividad": max(actividad) if actividad else None,
+        })
+    resumen.sort(key=lambda p: (p["ultima_actividad"] is not None, p["ultima_actividad"] or 0, p["id"]), reverse=True)
+    return resumen
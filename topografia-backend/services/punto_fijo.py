@@ -0,0 +1,105 @@
+"""
+Núcleo numérico de punto fijo para los cálculos topográficos.
+
+Elevaciones, lecturas de mira y pendientes se guardan como DECIMAL(·, 6) y
+los km y divisiones como DECIMAL(·, 3). Aquí se representan como enteros
+escalados (int64 en arreglos NumPy) con la misma última cifra que la base de
+datos:
+
+- MICRAS (6 decimales): elevaciones, lecturas, pendientes (m/m × 10⁶).
+- MILIMETROS (3 decimales): km y divisiones transversales.
+
+La conversión en la frontera con la base de datos es exacta: `columna`
+hace que la propia consulta devuelva el entero escalado (lo más rápido para
+lecturas masivas), `a_entero` parte del Decimal (o del texto) sin pasar por
+float, y `a_decimal` devuelve un Decimal con la escala de la columna.
+
+Sumas y restas son exactas; los productos y divisiones se reescalan con
+redondeo al par más cercano (ROUND_HALF_EVEN, igual que `Decimal.quantize`),
+así que el resultado es reproducible hasta la última cifra guardada.
+"""
+from decimal import Decimal
+from typing import Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import BigInteger, cast, func
+
+MICRAS = 6
+MILIMETROS = 3
+
+
+def columna(expresion, decimales: int):
+    """
+    Expresión SQL que devuelve la columna ya escalada como BIGINT. Los valores
+    guardados tienen como mucho `decimales` cifras, así que el redondeo de la
+    base de datos no cambia nada: sólo absorbe el error de REAL en SQLite.
+    """
+    return cast(func.round(expresion * 10 ** decimales), BigInteger)
+
+
+def a_entero(valor, decimales: int) -> int:
+    """Decimal, texto, int o float a entero escalado (redondeo al par)"""
+    if isinstance(valor, float):
+        # repr es la representación decimal más corta que identifica al float
+        valor = Decimal(repr(valor))
+    elif not isinstance(valor, Decimal):
+        valor = Decimal(valor)
+    # round() de un Decimal redondea al par y devuelve int
+    return round(valor.scaleb(decimales))
+
+
+def a_enteros(valores, decimales: int) -> np.ndarray:
+    """Secuencia o arreglo a int64 escalado. Los float se redondean con np.rint (al par)"""
+    if isinstance(valores, np.ndarray) and valores.dtype.kind == "f":
+        return np.rint(valores * 10 ** decimales).astype(np.int64)
+    return np.fromiter((a_entero(v, decimales) for v in valores), dtype=np.int64)
+
+
+def a_decimal(entero, decimales: int) -> Decimal:
+    """Entero escalado a Decimal con exactamente `decimales` cifras"""
+    return Decimal(int(entero)).scaleb(-decimales)
+
+
+def a_decimales(enteros: Iterable, decimales: int) -> List[Decimal]:
+    return [Decimal(int(e)).scaleb(-decimales) for e in enteros]
+
+
+def opcional(valor, decimales: int) -> Optional[int]:
+    return None if valor is None else a_entero(valor, decimales)
+
+
+def a_float(enteros, decimales: int) -> np.ndarray:
+    """Para respuestas JSON: el float más cercano al valor exacto"""
+    return np.asarray(enteros, dtype=np.int64) / 10 ** decimales
+
+
+def dividir(numerador, denominador) -> np.ndarray:
+    """División entera con redondeo al par; el denominador debe ser positivo"""
+    numerador = np.asarray(numerador, dtype=np.int64)
+    denominador = np.asarray(denominador, dtype=np.int64)
+    cociente, resto = np.divmod(numerador, denominador)
+    doble = 2 * resto
+    sube = (doble > denominador) | ((doble == denominador) & (cociente % 2 == 1))
+    return cociente + sube
+
+
+def producto(a, decimales_a: int, b, decimales_b: int, decimales: int) -> np.ndarray:
+    """a × b con el resultado en la escala `decimales` (p. ej. pendiente × división → micras)"""
+    crudo = np.asarray(a, dtype=np.int64) * np.asarray(b, dtype=np.int64)
+    sobrante = decimales_a + decimales_b - decimales
+    if sobrante <= 0:
+        return crudo * 10 ** -sobrante
+    return dividir(crudo, 10 ** sobrante)
+
+
+def serie(inicio: int, fin: int, paso: int) -> np.ndarray:
+    """inicio, inicio + paso, ... hasta fin inclusive, sin deriva acumulada"""
+    if paso <= 0:
+        raise ValueError("El intervalo debe ser positivo")
+    return np.arange(inicio, fin + 1, paso, dtype=np.int64)
+
+
+def interpolar(x, x0, x1, y0, y1) -> np.ndarray:
+    """Interpolación lineal entera entre (x0, y0) y (x1, y1), con x0 < x1"""
+    x, x0, x1, y0, y1 = (np.asarray(v, dtype=np.int64) for v in (x, x0, x1, y0, y1))
+    return y0 + dividir((y1 - y0) * (x - x0), x1 - x0)
@@ -0,0 +1,121 @@
+"""
+Eliminación de proyectos delegada al ON DELETE CASCADE de la base de datos.
+
+`purgar_proyecto` borra primero las lecturas por lotes (rango del índice por
+proyecto_id) para que ninguna transacción bloquee ni registre en WAL cientos
+de miles de filas de una vez; después elimina el proyecto y la cascada de la
+base de datos se lleva estaciones y mediciones. Ninguna fila se carga en Python.
+
+Cada purga reclama antes el proyecto: en PostgreSQL con un advisory lock de
+sesión sobre su id, mantenido en la misma conexión durante todos los lotes;
+en otros motores, dentro del proceso. Si la tarea en segundo plano de un
+worker y la reanudación al arrancar de otro coinciden en un proyecto, sólo una
+lo purga y la otra lo salta: nunca se borra el proyecto mientras otra purga
+sigue por lotes (la cascada se llevaría el resto de lecturas de una vez).
+"""
+from contextlib import contextmanager
+import logging
+import threading
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from config import settings
+from database import SessionLocal, engine
+from models.lectura import LecturaDivision
+from models.proyecto import Proyecto
+
+logger = logging.getLogger(__name__)
+
+
+def marcar_eliminado(db, proyecto: Proyecto):
+    """Oculta el proyecto de inmediato; la purga se hace aparte"""
+    proyecto.eliminado_en = func.now()
+    db.commit()
+
+
+# Primera clave de los advisory locks de purga (la segunda es el proyecto_id)
+CLASE_BLOQUEO_PURGA = 3501
+
+_en_curso = set()
+_candado = threading.Lock()
+
+
+@contextmanager
+def _reclamar(conexion, proyecto_id: int):
+    """Reclama la purga del proyecto; produce False si otra purga lo tiene"""
+    if conexion.dialect.name == "postgresql":
+        reclamado = conexion.scalar(select(func.pg_try_advisory_lock(CLASE_BLOQUEO_PURGA, proyecto_id)))
+        conexion.commit()
+        try:
+            yield reclamado
+        finally:
+            if reclamado:
+                # El lock es de sesión: sobreviviría a la vuelta de la conexión al pool
+                conexion.rollback()
+                conexion.scalar(select(func.pg_advisory_unlock(CLASE_BLOQUEO_PURGA, proyecto_id)))
+                conexion.commit()
+        return
+
+    with _candado:
+        reclamado = proyecto_id not in _en_curso
+        _en_curso.add(proyecto_id)
+    try:
+        yield reclamado
+    finally:
+        if reclamado:
+            with _candado:
+                _en_curso.discard(proyecto_id)
+
+
+def purgar_proyecto(proyecto_id: int, lote: int = None) -> int:
+    """
+    Elimina el proyecto y todos sus hijos. Devuelve el número de lecturas
+    borradas (0 si otra purga en curso ya lo tiene reclamado).
+    """
+    lote = lote or settings.purga_lote
+    lecturas = 0
+    with engine.connect() as conexion, _reclamar(conexion, proyecto_id) as reclamado:
+        if not reclamado:
+            logger.info(f"Proyecto {proyecto_id}: otra purga en curso, se omite")
+            return 0
+        with Session(bind=conexion, autoflush=False) as db:
+            while True:
+                ids = select(LecturaDivision.id).where(
+                    LecturaDivision.proyecto_id == proyecto_id
+                ).limit(lote).scalar_subquery()
+                borradas = db.execute(
+                    delete(LecturaDivision).where(LecturaDivision.id.in_(ids)),
+                    execution_options={"synchronize_session": False},
+                ).rowcount
+                db.commit()
+                lecturas += borradas
+                if borradas < lote:
+                    break
+
+            db.execute(
+                delete(Proyecto).where(Proyecto.id == proyecto_id),
+                execution_options={"synchronize_session": False},
+            )
+            db.commit()
+    logger.info(f"Proyecto {proyecto_id} purgado ({lecturas} lecturas)")
+    return lecturas
+
+
+def purgar_pendientes():
+    """Retoma las purgas que quedaron a medias (p. ej. por un reinicio del proceso)"""
+    with SessionLocal() as db:
+        pendientes = db.scalars(
+            select(Proyecto.id).where(Proyecto.eliminado_en.is_not(None))
+        ).all()
+    for proyecto_id in pendientes:
+        try:
+            purgar_proyecto(proyecto_id)
+        except Exception as e:
+            logger.error(f"Error purgando el proyecto {proyecto_id}: {e}")
+
+
+def iniciar_purga_pendientes():
+    """Lanza purgar_pendientes en un hilo para no retrasar el arranque"""
+    threading.Thread(target=purgar_pendientes, name="purga-proyectos", daemon=True).start()
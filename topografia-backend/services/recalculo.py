@@ -0,0 +1,29 @@
+"""
+Recálculos de valores derivados que se hacen en la base de datos, por conjuntos,
+sin cargar las filas en Python.
+"""
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from models.lectura import LecturaDivision
+from models.medicion import MedicionEstacion
+
+
+def recalcular_elv_base_real(db: Session, medicion_id: int) -> int:
+    """
+    elv_base_real = altura_aparato - lectura_mira para todas las lecturas de la
+    medición, en un único UPDATE. altura_aparato se lee de la columna generada
+    dentro de la misma sentencia, así que refleja cambios aún no confirmados de
+    la transacción en curso. Devuelve el número de lecturas actualizadas.
+    """
+    altura_aparato = select(MedicionEstacion.altura_aparato).where(
+        MedicionEstacion.id == medicion_id
+    ).scalar_subquery()
+
+    resultado = db.execute(
+        update(LecturaDivision)
+        .where(LecturaDivision.medicion_id == medicion_id)
+        .values(elv_base_real=altura_aparato - LecturaDivision.lectura_mira),
+        execution_options={"synchronize_session": False},
+    )
+    return resultado.rowcount
@@ -0,0 +1,460 @@
+"""
+Reporte de liberación de pavimentación (TOP-FM-05) generado en el servidor.
+
+POST /proyectos/{id}/reportes crea (o reutiliza) un trabajo en la tabla
+`reportes` y lo ejecuta en segundo plano:
+
+1. reuniendo: tres consultas por conjuntos (proyecto, mediciones con su
+   estación y lecturas del proyecto en escala de punto fijo) y el cálculo por
+   estación con NumPy. La elevación de proyecto sale del diseño vigente
+   (estación guardada o alineamiento), igual que en services/alertas.py.
+2. renderizando: el PDF (reportlab) o el XLSX (openpyxl) se arma en el pool
+   de cálculo (procesos.py), fuera del proceso de la API; el hilo de la tarea
+   sólo espera el resultado con REPORTES_TIMEOUT_SEGUNDOS de límite.
+3. listo: el artefacto se guarda en la fila y se borran los anteriores del
+   mismo proyecto y formato.
+
+Los trabajos se identifican por la versión de los datos: la revisión del
+proyecto (diseño, estaciones, mediciones) y una huella de las lecturas
+(cantidad y último fecha_calculo), porque el autosave de lecturas no
+incrementa la revisión. Pedir otra vez el mismo reporte sin cambios devuelve
+el artefacto ya generado, desde cualquier worker.
+"""
+from datetime import date, datetime, timezone
+from typing import Tuple
+import hashlib
+import io
+import logging
+
+import numpy as np
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, insert_con_conflicto
+from models.estacion import EstacionTeorica
+from models.lectura import LecturaDivision
+from models.medicion import MedicionEstacion
+from models.proyecto import Proyecto
+from models.reporte import Reporte
+from procesos import pool_calculo
+from services import punto_fijo
+from services.alineamiento import diseno_virtual
+from services.seccion import elevaciones_en
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = {
+    "pdf": "application/pdf",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+EN_CURSO = ("pendiente", "reuniendo", "renderizando")
+
+ANCHO_PAVIMENTO = 7.5  # m, ancho de calzada del reporte del frontend
+FILAS_POR_TABLA = 400  # reportlab parte tablas enormes muy despacio; se dividen en bloques
+
+_MM = punto_fijo.MILIMETROS
+_UM = punto_fijo.MICRAS
+
+class ErrorReporte(ValueError):
+    """Formato o estado de reporte no válido"""
+
+
+def nombre_archivo(proyecto_id: int, formato: str) -> str:
+    return f"LIB-{proyecto_id}.{formato}"
+
+
+def formatear_km(km_mm: int) -> str:
+    """Cadenamiento "k+mmm" a partir de metros × 1000, como formatearKM del frontend"""
+    kilometro, resto = divmod(int(km_mm), 1_000_000)
+    if resto % 1000 == 0:
+        return f"{kilometro}+{resto // 1000:03d}"
+    return f"{kilometro}+{resto / 1000:07.3f}"
+
+
+# --- Versión de los datos y trabajos ----------------------------------------
+
+def version_datos(db: Session, proyecto_id: int) -> Tuple[int, str]:
+    """(revisión del proyecto, huella de sus lecturas) en una sola consulta"""
+    revision = select(Proyecto.revision).where(Proyecto.id == proyecto_id).scalar_subquery()
+    revision, cantidad, ultima = db.execute(select(
+        revision,
+        func.count(LecturaDivision.id),
+        func.max(LecturaDivision.fecha_calculo),
+    ).where(LecturaDivision.proyecto_id == proyecto_id)).one()
+    huella = hashlib.sha1(f"{cantidad}:{ultima}".encode()).hexdigest()
+    return revision, huella
+
+
+def _vencido(reporte: Reporte) -> bool:
+    """Trabajo en curso que ya superó el límite (p. ej. el worker se reinició)"""
+    creado = reporte.creado_en
+    if creado is None:
+        return False
+    if creado.tzinfo is None:
+        creado = creado.replace(tzinfo=timezone.utc)
+    transcurrido = (datetime.now(timezone.utc) - creado).total_seconds()
+    return transcurrido > 2 * settings.reportes_timeout_segundos
+
+
+def solicitar(db: Session, proyecto_id: int, formato: str) -> Tuple[Reporte, bool]:
+    """
+    Trabajo del reporte para la versión actual de los datos. Devuelve
+    (reporte, encolar): encolar es True sólo para quien crea el trabajo o lo
+    reinicia (tras un error o si quedó colgado), así que dos peticiones
+    simultáneas no generan el mismo reporte dos veces.
+    """
+    if formato not in FORMATOS:
+        raise ErrorReporte(f"Formato no soportado: {formato}")
+    revision, huella = version_datos(db, proyecto_id)
+
+    sentencia = insert_con_conflicto(db, Reporte).values(
+        proyecto_id=proyecto_id, formato=formato, revision=revision, huella=huella, estado="pendiente", progreso=0
+    ).on_conflict_do_nothing(index_elements=["proyecto_id", "formato", "revision", "huella"])
+    encolar = db.execute(sentencia).rowcount == 1
+    db.commit()
+
+    reporte = db.scalars(select(Reporte).where(
+        Reporte.proyecto_id == proyecto_id,
+        Reporte.formato == formato,
+        Reporte.revision == revision,
+        Reporte.huella == huella,
+    )).one()
+
+    if not encolar and (reporte.estado == "error" or (reporte.estado in EN_CURSO and _vencido(reporte))):
+        # Reinicio condicionado al estado leído: sólo una petición lo consigue
+        encolar = db.execute(
+            update(Reporte).where(Reporte.id == reporte.id, Reporte.estado == reporte.estado)
+            .values(estado="pendiente", progreso=0, error=None, creado_en=func.now(), terminado_en=None),
+            execution_options={"synchronize_session": False},
+        ).rowcount == 1
+        db.commit()
+        db.refresh(reporte)
+    return reporte, encolar
+
+
+def _avance(db: Session, reporte_id: int, estado: str, progreso: int, **valores):
+    db.execute(
+        update(Reporte).where(Reporte.id == reporte_id).values(estado=estado, progreso=progreso, **valores),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+
+
+def generar_en_segundo_plano(reporte_id: int):
+    """Tarea de fondo: reúne los datos, renderiza en el pool de procesos y guarda el artefacto"""
+    try:
+        with SessionLocal() as db:
+            proyecto_id, formato = db.execute(
+                select(Reporte.proyecto_id, Reporte.formato).where(Reporte.id == reporte_id)
+            ).one()
+            _avance(db, reporte_id, "reuniendo", 10)
+            datos = reunir_datos(db, proyecto_id)
+            # La transacción de lectura no queda abierta mientras se renderiza
+            _avance(db, reporte_id, "renderizando", 40)
+
+            # Un reporte es un trabajo de fondo: espera cupo en el pool en vez de fallar
+            contenido = pool_calculo.ejecutar(
+                renderizar, formato, datos, nombre=f"reporte_{formato}",
+                timeout=settings.reportes_timeout_segundos, esperar=settings.reportes_timeout_segundos,
+            )
+
+            # Sólo se conserva el artefacto más reciente por proyecto y formato
+            db.execute(
+                delete(Reporte).where(
+                    Reporte.proyecto_id == proyecto_id,
+                    Reporte.formato == formato,
+                    Reporte.id != reporte_id,
+                    Reporte.estado == "listo",
+                ),
+                execution_options={"synchronize_session": False},
+            )
+            _avance(db, reporte_id, "listo", 100, contenido=contenido, tamano=len(contenido),
+                    error=None, terminado_en=func.now())
+        logger.info(f"Reporte {reporte_id} ({formato}) del proyecto {proyecto_id} generado ({len(contenido)} bytes)")
+    except Exception as e:
+        logger.error(f"Error generando el reporte {reporte_id}: {e}")
+        try:
+            with SessionLocal() as db:
+                _avance(db, reporte_id, "error", 100, error=str(e) or type(e).__name__, terminado_en=func.now())
+        except Exception as e2:
+            logger.error(f"No se pudo registrar el error del reporte {reporte_id}: {e2}")
+
+
+# --- Datos del reporte (consultas por conjuntos) ----------------------------
+
+def reunir_datos(db: Session, proyecto_id: int) -> dict:
+    """
+    Todo lo que necesita el renderizado, en tipos simples (se envía por pickle
+    al proceso que renderiza). Cálculos del reporte del frontend: por estación,
+    promedio de elevaciones de campo y de proyecto, espesor = diferencia,
+    área = intervalo × ANCHO_PAVIMENTO y volúmenes acumulados.
+    """
+    proyecto = db.execute(select(
+        Proyecto.id, Proyecto.nombre, Proyecto.tramo, Proyecto.cuerpo,
+        punto_fijo.columna(Proyecto.km_inicial, _MM),
+        punto_fijo.columna(Proyecto.km_final, _MM),
+        Proyecto.intervalo, Proyecto.espesor,
+    ).where(Proyecto.id == proyecto_id)).one()
+    espesor = float(proyecto.espesor or 0)
+    area = float(proyecto.intervalo or 0) * ANCHO_PAVIMENTO
+
+    mediciones = db.execute(select(
+        MedicionEstacion.id,
+        punto_fijo.columna(MedicionEstacion.estacion_km, _MM),
+        punto_fijo.columna(EstacionTeorica.base_cl, _UM),
+        punto_fijo.columna(EstacionTeorica.pendiente_derecha, _UM),
+    ).outerjoin(EstacionTeorica, and_(
+        EstacionTeorica.proyecto_id == MedicionEstacion.proyecto_id,
+        EstacionTeorica.km == MedicionEstacion.estacion_km,
+    )).where(
+        MedicionEstacion.proyecto_id == proyecto_id
+    ).order_by(MedicionEstacion.estacion_km, MedicionEstacion.id)).all()
+
+    # Recorrido de rango de ix_lecturas_proyecto_medicion_division, ya ordenado
+    lecturas = {}
+    for medicion_id, division, real, guardada in db.execute(select(
+        LecturaDivision.medicion_id,
+        punto_fijo.columna(LecturaDivision.division_transversal, _MM),
+        punto_fijo.columna(LecturaDivision.elv_base_real, _UM),
+        punto_fijo.columna(LecturaDivision.elv_base_proyecto, _UM),
+    ).where(
+        LecturaDivision.proyecto_id == proyecto_id
+    ).order_by(LecturaDivision.medicion_id, LecturaDivision.division_transversal)):
+        lecturas.setdefault(medicion_id, []).append((division, real, guardada))
+
+    virtuales = diseno_virtual(db, proyecto_id, [km for _, km, base, _ in mediciones if base is None])
+
+    estaciones = []
+    espesores = []
+    volumen_real = volumen_proyecto = 0.0
+    for medicion_id, km, base, pendiente in mediciones:
+        filas = lecturas.get(medicion_id)
+        if not filas:
+            continue
+        divisiones = np.array([d for d, _, _ in filas], dtype=np.int64)
+        reales = np.array([np.nan if r is None else r for _, r, _ in filas], dtype=np.float64)
+        diseno = (base, pendiente) if base is not None else virtuales.get(km)
+        if diseno is not None:
+            proyectadas = elevaciones_en(divisiones, diseno[0], diseno[1]).astype(np.float64)
+        else:
+            # Sin diseño se usa la copia guardada en la lectura, como el frontend
+            proyectadas = np.array([np.nan if g is None else g for _, _, g in filas], dtype=np.float64)
+        reales /= 10 ** _UM
+        proyectadas /= 10 ** _UM
+
+        con_real = ~np.isnan(reales)
+        con_proyecto = ~np.isnan(proyectadas)
+        if not con_real.any() or not con_proyecto.any():
+            continue
+        campo = float(reales[con_real].mean())
+        elevacion_proyecto = float(proyectadas[con_proyecto].mean())
+        diferencia = campo - elevacion_proyecto
+        espesores.append(diferencia)
+        volumen_real += diferencia * area
+        volumen_proyecto += espesor * area
+
+        estaciones.append({
+            "estacion": formatear_km(km),
+            "campo": campo,
+            "proyecto": elevacion_proyecto,
+            "diferencia": diferencia,
+            "rt_proyecto": elevacion_proyecto + espesor,
+            "area": area,
+            "volumen_parcial": diferencia * area,
+            "volumen_acumulado": volumen_real,
+            "proyecto_parcial": espesor * area,
+            "proyecto_acumulado": volumen_proyecto,
+            "divisiones": [
+                (
+                    f"{divisiones[i] / 10 ** _MM:.3f}",
+                    None if np.isnan(reales[i]) else float(reales[i]),
+                    None if np.isnan(proyectadas[i]) else float(proyectadas[i]),
+                    None if np.isnan(reales[i]) or np.isnan(proyectadas[i]) else float(reales[i] - proyectadas[i]),
+                    None if np.isnan(proyectadas[i]) else float(proyectadas[i]) + espesor,
+                )
+                for i in range(len(filas))
+            ],
+        })
+
+    valores = np.array(espesores, dtype=np.float64)
+    n = len(valores)
+    promedio = float(valores.mean()) if n else 0.0
+    desviacion = float(valores.std()) if n else 0.0  # Poblacional, como el frontend
+    dentro = int(((valores >= espesor - 0.004) & (valores <= espesor + 0.001)).sum())
+
+    return {
+        "proyecto": {
+            "id": proyecto.id,
+            "nombre": proyecto.nombre,
+            "tramo": proyecto.tramo,
+            "cuerpo": proyecto.cuerpo,
+            "km_inicial": formatear_km(proyecto[4]),
+            "km_final": formatear_km(proyecto[5]),
+            "espesor": espesor,
+        },
+        "fecha": date.today().strftime("%d/%m/%Y"),
+        "estaciones": estaciones,
+        "estadisticas": {
+            "maximo": float(valores.max()) if n else 0.0,
+            "minimo": float(valores.min()) if n else 0.0,
+            "promedio": promedio,
+            "desviacion": desviacion,
+            "n": n,
+        },
+        "verificacion": {
+            # N-CTR-CAR-1-04-009/20: ē ≥ 0.98 e y s ≤ 0.10 e
+            "cumple_promedio": promedio >= 0.98 * espesor,
+            "cumple_desviacion": desviacion <= 0.10 * espesor,
+            "estado": "CONFORME" if n and dentro / n > 0.95 else "NO CONFORME",
+        },
+        "volumenes": {
+            "proyecto": volumen_proyecto,
+            "real": volumen_real,
+            "excedente": volumen_real - volumen_proyecto,
+        },
+    }
+
+
+# --- Renderizado (se ejecuta en el pool de cálculo) -------------------------
+
+COLUMNAS = ("ESTACIÓN", "ELEVACIÓN CAMPO", "ELEVACIÓN PROYECTO", "DIFERENCIA TERR", "RT PROYECTO",
+            "ESPESOR PROM", "ÁREA (m²)", "VOL. PARCIAL", "VOL. ACUMULADO", "PROY. PARCIAL", "PROY. ACUMULADO")
+TITULO = "LIBERACIÓN DE PAVIMENTACIÓN POR TOPOGRAFÍA"
+
+
+def _texto(valor, decimales: int = 3) -> str:
+    return "" if valor is None else f"{valor:.{decimales}f}"
+
+
+def _filas_tabla(datos: dict):
+    """Fila por estación seguida de sus divisiones, como la tabla principal del frontend"""
+    for estacion in datos["estaciones"]:
+        yield True, (
+            estacion["estacion"], estacion["campo"], estacion["proyecto"], estacion["diferencia"],
+            estacion["rt_proyecto"], estacion["diferencia"], estacion["area"], estacion["volumen_parcial"],
+            estacion["volumen_acumulado"], estacion["proyecto_parcial"], estacion["proyecto_acumulado"],
+        )
+        for division, campo, proyecto, diferencia, rt in estacion["divisiones"]:
+            yield False, (f"  {division}", campo, proyecto, diferencia, rt, None, None, None, None, None, None)
+
+
+def _resumen(datos: dict):
+    estadisticas = datos["estadisticas"]
+    verificacion = datos["verificacion"]
+    volumenes = datos["volumenes"]
+    espesor = datos["proyecto"]["espesor"]
+    return [
+        ("DATO MÁXIMO (m)", estadisticas["maximo"]),
+        ("DATO MÍNIMO (m)", estadisticas["minimo"]),
+        ("DATO PROMEDIO ē (m)", estadisticas["promedio"]),
+        ("DESVIACIÓN ESTÁNDAR s (m)", estadisticas["desviacion"]),
+        ("NÚMERO DE DETERMINACIONES n", estadisticas["n"]),
+        ("ESPESOR DE PROYECTO e (m)", espesor),
+        ("ē ≥ 0.98 e", "CUMPLE" if verificacion["cumple_promedio"] else "NO CUMPLE"),
+        ("s ≤ 0.10 e", "CUMPLE" if verificacion["cumple_desviacion"] else "NO CUMPLE"),
+        ("CUMPLE CON ESPECIFICACIÓN", verificacion["estado"]),
+        ("VOLUMEN DE PROYECTO (m³)", volumenes["proyecto"]),
+        ("VOLUMEN REAL (m³)", volumenes["real"]),
+        ("VOLUMEN EXCEDENTE (m³)", volumenes["excedente"]),
+    ]
+
+
+def _encabezado(datos: dict):
+    proyecto = datos["proyecto"]
+    return [
+        ("PROYECTO", proyecto["nombre"] or ""),
+        ("CUERPO", proyecto["cuerpo"] or ""),
+        ("CADENAMIENTO INICIAL", proyecto["km_inicial"]),
+        ("CADENAMIENTO FINAL", proyecto["km_final"]),
+        ("TRAMO", proyecto["tramo"] or f"DEL {proyecto['km_inicial']} AL {proyecto['km_final']}"),
+        ("FECHA DEL REPORTE", datos["fecha"]),
+        ("FOLIO", f"LIB-{proyecto['id']}"),
+    ]
+
+
+def renderizar_pdf(datos: dict) -> bytes:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import landscape, letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    salida = io.BytesIO()
+    documento = SimpleDocTemplate(salida, pagesize=landscape(letter), leftMargin=1 * cm, rightMargin=1 * cm,
+                                  topMargin=1 * cm, bottomMargin=1 * cm, title=TITULO)
+    estilos = getSampleStyleSheet()
+    rejilla = [("GRID", (0, 0), (-1, -1), 0.5, colors.black), ("FONTSIZE", (0, 0), (-1, -1), 7)]
+
+    encabezado = _encabezado(datos)
+    celdas = [[etiqueta for etiqueta, _ in encabezado[:4]], [valor for _, valor in encabezado[:4]],
+              [etiqueta for etiqueta, _ in encabezado[4:]] + [""], [valor for _, valor in encabezado[4:]] + [""]]
+    historia = [
+        Paragraph(f"TOP-FM-05 · {TITULO}", estilos["Title"]),
+        Table(celdas, style=TableStyle(rejilla + [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E8E8E8")),
+            ("BACKGROUND", (0, 2), (-1, 2), colors.HexColor("#E8E8E8")),
+        ])),
+        Spacer(1, 0.4 * cm),
+    ]
+
+    estilo_tabla = TableStyle(rejilla + [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E8E8E8")),
+        ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+    ])
+    bloque = [list(COLUMNAS)]
+    estaciones = []
+    for es_estacion, fila in _filas_tabla(datos):
+        bloque.append([fila[0]] + [_texto(v, 1 if i == 6 else 3) for i, v in enumerate(fila) if i > 0])
+        if es_estacion:
+            estaciones.append(len(bloque) - 1)
+        if len(bloque) > FILAS_POR_TABLA:
+            historia.append(Table(bloque, repeatRows=1, style=_negritas(estilo_tabla, estaciones)))
+            bloque, estaciones = [list(COLUMNAS)], []
+    if len(bloque) > 1 or not datos["estaciones"]:
+        historia.append(Table(bloque, repeatRows=1, style=_negritas(estilo_tabla, estaciones)))
+
+    historia += [
+        Spacer(1, 0.4 * cm),
+        Paragraph("RESUMEN DE ESPESORES · N-CTR-CAR-1-04-009/20", estilos["Heading3"]),
+        Table([[etiqueta, _texto(valor, 6) if isinstance(valor, float) else str(valor)]
+               for etiqueta, valor in _resumen(datos)], style=TableStyle(rejilla)),
+    ]
+    documento.build(historia)
+    return salida.getvalue()
+
+
+def _negritas(estilo, filas):
+    from reportlab.platypus import TableStyle
+    return TableStyle(list(estilo.getCommands()) + [("FONTNAME", (0, f), (-1, f), "Helvetica-Bold") for f in filas])
+
+
+def renderizar_xlsx(datos: dict) -> bytes:
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Liberación")
+    hoja.append([f"TOP-FM-05 · {TITULO}"])
+    for etiqueta, valor in _encabezado(datos):
+        hoja.append([etiqueta, valor])
+    hoja.append([])
+    hoja.append(list(COLUMNAS))
+    for _, fila in _filas_tabla(datos):
+        hoja.append([None if v is None else round(v, 6) if isinstance(v, float) else v for v in fila])
+
+    resumen = libro.create_sheet("Resumen")
+    for etiqueta, valor in _resumen(datos):
+        resumen.append([etiqueta, valor])
+
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def renderizar(formato: str, datos: dict) -> bytes:
+    """Núcleo del pool de cálculo"""
+    if formato == "pdf":
+        return renderizar_pdf(datos)
+    if formato == "xlsx":
+        return renderizar_xlsx(datos)
+    raise ErrorReporte(f"Formato no soportado: {formato}")
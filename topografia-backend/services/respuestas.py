@@ -0,0 +1,58 @@
+"""
+Caché de respuestas de lectura de proyecto, ya codificadas en JSON.
+
+Varios supervisores abren el mismo proyecto a la vez; GET /proyectos/{id},
+/estaciones/ y /mediciones/ devolverían los mismos bytes. La clave es
+(proyecto, endpoint, parámetros, revision) y el valor el cuerpo codificado,
+en `cache.respuestas` (LRU por proceso con límite en bytes).
+
+Las escrituras que cambian estas respuestas (proyecto, estaciones,
+mediciones, diseño) llaman a `incrementar_revision` en su misma transacción
+y a `cache.invalidar_proyecto` después del commit. La revisión en la clave
+garantiza que otro worker, o una lectura concurrente con la escritura, nunca
+sirva bytes anteriores bajo la revisión nueva; la invalidación sólo libera
+memoria antes. Las lecturas de división no aparecen en estas respuestas y no
+incrementan la revisión, así que el autosave no toca la fila del proyecto.
+"""
+from typing import Callable
+from urllib.parse import urlencode
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from cache import cache
+from database import en_transaccion_de_lote
+from metrics import RESPUESTAS_CACHE
+from models.proyecto import Proyecto
+
+
+def incrementar_revision(db: Session, proyecto_id: int):
+    """Incrementa proyectos.revision en la transacción en curso (no hace commit)"""
+    db.execute(
+        update(Proyecto).where(Proyecto.id == proyecto_id).values(revision=Proyecto.revision + 1),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def respuesta_json(proyecto: Proyecto, endpoint: str, parametros: dict, construir: Callable) -> Response:
+    """
+    Cuerpo cacheado para la revisión actual del proyecto, o el resultado de
+    `construir()` codificado igual que lo haría FastAPI (si devuelve un modelo
+    Pydantic se serializa con él, como con response_model).
+    """
+    if en_transaccion_de_lote():
+        # La revisión leída dentro de un lote transaccional puede deshacerse y
+        # reaparecer después con otros datos: no se cachea
+        return Response(content=JSONResponse(jsonable_encoder(construir())).body, media_type="application/json")
+    clave = f"{proyecto.id}:{endpoint}:{proyecto.revision}:{urlencode(sorted(parametros.items()))}"
+    cuerpo = cache.respuestas.get(clave)
+    if cuerpo is None:
+        RESPUESTAS_CACHE.labels(endpoint, "fallo").inc()
+        cuerpo = JSONResponse(jsonable_encoder(construir())).body
+        cache.respuestas.set(clave, cuerpo, proyecto.id)
+    else:
+        RESPUESTAS_CACHE.labels(endpoint, "acierto").inc()
+    return Response(content=cuerpo, media_type="application/json")
@@ -0,0 +1,196 @@
+"""
+Plantilla de sección transversal por proyecto.
+
+`divisiones_izquierdas` y `divisiones_derechas` son listas JSONB; en vez de
+releerlas y reinterpretarlas en cada cálculo de alertas o revisión de
+completitud, se compilan una vez en una `PlantillaSeccion` inmutable:
+divisiones ordenadas en un arreglo NumPy de sólo lectura (en milímetros
+enteros, ver services/punto_fijo.py), máscara de lado y mapa de índice por
+división.
+
+Las plantillas se guardan en un LRU por proceso con clave (proyecto_id,
+revision). `Proyecto.revision` se incrementa en cada actualización del
+proyecto, así que una plantilla nunca se modifica ni se invalida: la revisión
+nueva simplemente genera otra clave. La revisión vigente de cada proyecto se
+guarda en la caché compartida, etiquetada con el proyecto, y la descarta
+`cache.invalidar_proyecto` como el resto de datos del proyecto.
+
+Dentro de un lote transaccional (POST /batch) no se guarda nada: la revisión
+leída puede deshacerse y volver a usarse después con otras divisiones.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, List, Mapping, Optional
+import threading
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from cache import cache
+from config import settings
+from database import en_transaccion_de_lote
+from models.proyecto import Proyecto
+from services import punto_fijo
+
+IZQUIERDA = -1
+EJE = 0
+DERECHA = 1
+
+_revisiones = cache.espacio("revision", ttl=settings.acceso_ttl_segundos)
+
+
+def clave_division(division) -> int:
+    """División en milímetros enteros (las columnas son DECIMAL(8, 3))"""
+    return punto_fijo.a_entero(division, punto_fijo.MILIMETROS)
+
+
+def elevaciones_en(divisiones, base_cl, pendiente_derecha) -> np.ndarray:
+    """
+    Elevación de proyecto en divisiones arbitrarias (milímetros), en micras:
+    base_cl + pendiente del lado * |división|, con la pendiente izquierda
+    igual a -pendiente_derecha. base_cl y pendiente_derecha en micras.
+    """
+    divisiones = np.asarray(divisiones, dtype=np.int64)
+    pendiente_derecha = np.asarray(pendiente_derecha, dtype=np.int64)
+    pendientes = np.where(divisiones < 0, -pendiente_derecha, pendiente_derecha)
+    desnivel = punto_fijo.producto(
+        pendientes, punto_fijo.MICRAS, np.abs(divisiones), punto_fijo.MILIMETROS, punto_fijo.MICRAS
+    )
+    return np.asarray(base_cl, dtype=np.int64) + desnivel
+
+
+def _solo_lectura(arreglo: np.ndarray) -> np.ndarray:
+    arreglo.setflags(write=False)
+    return arreglo
+
+
+@dataclass(frozen=True)
+class PlantillaSeccion:
+    """Sección transversal compilada de una revisión del proyecto"""
+    proyecto_id: int
+    revision: int
+    divisiones: np.ndarray  # Milímetros (int64), ordenadas de izquierda a derecha
+    lado: np.ndarray  # IZQUIERDA, EJE o DERECHA por división
+    _indice: Mapping[int, int] = field(repr=False)  # clave_division -> posición
+
+    @classmethod
+    def compilar(cls, proyecto_id: int, revision: int, izquierdas, derechas) -> "PlantillaSeccion":
+        claves = sorted({clave_division(d) for d in list(izquierdas or []) + list(derechas or [])})
+        divisiones = np.array(claves, dtype=np.int64)
+        return cls(
+            proyecto_id=proyecto_id,
+            revision=revision,
+            divisiones=_solo_lectura(divisiones),
+            lado=_solo_lectura(np.sign(divisiones).astype(np.int8)),
+            _indice={c: i for i, c in enumerate(claves)},
+        )
+
+    def __len__(self) -> int:
+        return len(self.divisiones)
+
+    def indice(self, division) -> Optional[int]:
+        """Posición de la división en la plantilla, o None si no pertenece a la sección"""
+        return self._indice.get(clave_division(division))
+
+    def contiene(self, division) -> bool:
+        return clave_division(division) in self._indice
+
+    def pendientes(self, pendiente_derecha) -> np.ndarray:
+        """
+        Pendiente de cada división en micras (m/m × 10⁶): la derecha a la
+        derecha del eje y la izquierda (-pendiente_derecha) a la izquierda.
+        Admite un arreglo con forma (n, 1) para evaluar n estaciones a la vez.
+        """
+        pendiente_derecha = np.asarray(pendiente_derecha, dtype=np.int64)
+        return np.where(self.lado < 0, -pendiente_derecha, pendiente_derecha)
+
+    def elevaciones(self, base_cl, pendiente_derecha) -> np.ndarray:
+        """
+        Elevación de proyecto en cada división, en micras:
+        base_cl + pendiente del lado * |división| (entradas también en micras).
+        """
+        return elevaciones_en(self.divisiones, base_cl, pendiente_derecha)
+
+    def faltantes(self, capturadas: Iterable) -> List[float]:
+        """Divisiones de la plantilla (en metros) que no aparecen en `capturadas`"""
+        marcadas = np.zeros(len(self.divisiones), dtype=bool)
+        for division in capturadas:
+            i = self._indice.get(clave_division(division))
+            if i is not None:
+                marcadas[i] = True
+        return punto_fijo.a_float(self.divisiones[~marcadas], punto_fijo.MILIMETROS).tolist()
+
+
+class _PlantillasLRU:
+    """LRU de plantillas por (proyecto_id, revision), seguro entre hilos"""
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._candado = threading.Lock()
+
+    def get(self, clave) -> Optional[PlantillaSeccion]:
+        with self._candado:
+            plantilla = self._datos.get(clave)
+            if plantilla is not None:
+                self._datos.move_to_end(clave)
+            return plantilla
+
+    def set(self, clave, plantilla: PlantillaSeccion):
+        with self._candado:
+            self._datos[clave] = plantilla
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._candado:
+            self._datos.clear()
+
+
+_plantillas = _PlantillasLRU(settings.plantillas_max)
+
+
+def plantilla_de(proyecto: Proyecto) -> PlantillaSeccion:
+    """Plantilla de un proyecto ya cargado (su revisión decide la entrada del LRU)"""
+    if en_transaccion_de_lote():
+        return PlantillaSeccion.compilar(
+            proyecto.id, proyecto.revision, proyecto.divisiones_izquierdas, proyecto.divisiones_derechas
+        )
+    clave = (proyecto.id, proyecto.revision)
+    plantilla = _plantillas.get(clave)
+    if plantilla is None:
+        plantilla = PlantillaSeccion.compilar(
+            proyecto.id, proyecto.revision, proyecto.divisiones_izquierdas, proyecto.divisiones_derechas
+        )
+        _plantillas.set(clave, plantilla)
+    _revisiones.set(str(proyecto.id), proyecto.revision, proyecto_id=proyecto.id)
+    return plantilla
+
+
+def plantilla_proyecto(db: Session, proyecto_id: int) -> Optional[PlantillaSeccion]:
+    """
+    Plantilla del proyecto sin cargarlo: con la revisión en caché y la
+    plantilla en el LRU no hay consultas. None si el proyecto no existe.
+    """
+    en_lote = en_transaccion_de_lote()
+    revision = None if en_lote else _revisiones.get(str(proyecto_id))
+    if revision is not None:
+        plantilla = _plantillas.get((proyecto_id, revision))
+        if plantilla is not None:
+            return plantilla
+    
+    fila = db.query(
+        Proyecto.revision, Proyecto.divisiones_izquierdas, Proyecto.divisiones_derechas
+    ).filter(Proyecto.id == proyecto_id).first()
+    if fila is None:
+        return None
+    revision, izquierdas, derechas = fila
+    if en_lote:
+        return PlantillaSeccion.compilar(proyecto_id, revision, izquierdas, derechas)
+    plantilla = _plantillas.get((proyecto_id, revision))
+    if plantilla is None:
+        plantilla = PlantillaSeccion.compilar(proyecto_id, revision, izquierdas, derechas)
+        _plantillas.set((proyecto_id, revision), plantilla)
+    _revisiones.set(str(proyecto_id), revision, proyecto_id=proyecto_id)
+    return plantilla
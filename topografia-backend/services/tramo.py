@@ -0,0 +1,133 @@
+"""
+Consulta de una ventana de km de un proyecto (GET /proyectos/{id}/tramo).
+
+Pensada para perfiles, mapas y tablas que sólo muestran unos cientos de
+metros a la vez. Cada entidad se obtiene con un recorrido de rango sobre un
+índice que empieza por proyecto_id:
+
+- estaciones: `_proyecto_km_uc` (proyecto_id, km).
+- mediciones: `_proyecto_estacion_uc` (proyecto_id, estacion_km).
+- lecturas: `ix_lecturas_proyecto_medicion_division`, limitado a las
+  mediciones de la ventana.
+
+La proyección de campos se aplica en el SELECT, así que las columnas que no
+se piden tampoco salen de la base de datos.
+"""
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.estacion import EstacionTeorica
+from models.lectura import LecturaDivision
+from models.medicion import MedicionEstacion
+
+# Campos que se pueden pedir por entidad. Las claves (id y, en lecturas,
+# medicion_id) se devuelven siempre para poder relacionar las filas.
+CAMPOS = {
+    "estaciones": {
+        "modelo": EstacionTeorica,
+        "claves": ("id",),
+        "campos": ("km", "base_cl", "pendiente_derecha", "pendiente_izquierda", "fecha_captura", "observaciones"),
+    },
+    "mediciones": {
+        "modelo": MedicionEstacion,
+        "claves": ("id",),
+        "campos": ("estacion_km", "bn_altura", "bn_lectura", "altura_aparato", "fecha_medicion",
+                   "operador", "condiciones_clima", "observaciones"),
+    },
+    "lecturas": {
+        "modelo": LecturaDivision,
+        "claves": ("id", "medicion_id"),
+        "campos": ("division_transversal", "lectura_mira", "elv_base_real", "elv_base_proyecto",
+                   "elv_concreto_proyecto", "esp_concreto_proyecto", "clasificacion",
+                   "volumen_por_metro", "cumple_tolerancia", "calidad"),
+    },
+}
+
+
+class ErrorTramo(ValueError):
+    """Parámetros de la ventana o de la proyección no válidos"""
+
+
+def parsear_incluir(texto: Optional[str]) -> List[str]:
+    """Entidades pedidas ("estaciones,mediciones,lecturas"); por defecto todas"""
+    if not texto:
+        return list(CAMPOS)
+    entidades = [e.strip() for e in texto.split(",") if e.strip()]
+    desconocidas = [e for e in entidades if e not in CAMPOS]
+    if desconocidas:
+        raise ErrorTramo(f"Entidades desconocidas: {', '.join(desconocidas)}")
+    return entidades
+
+
+def parsear_campos(texto: Optional[str]) -> Dict[str, List[str]]:
+    """
+    Proyección "entidad.campo,..." (p. ej. "estaciones.km,lecturas.elv_base_real").
+    Las entidades que no aparecen devuelven todos sus campos.
+    """
+    proyeccion = {}
+    for item in (texto or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        entidad, _, campo = item.partition(".")
+        if entidad not in CAMPOS or campo not in CAMPOS[entidad]["campos"]:
+            raise ErrorTramo(f"Campo desconocido: {item}")
+        proyeccion.setdefault(entidad, []).append(campo)
+    return proyeccion
+
+
+def _columnas(entidad: str, campos: Optional[List[str]]):
+    definicion = CAMPOS[entidad]
+    nombres = list(definicion["claves"]) + [c for c in (campos or definicion["campos"])
+                                            if c not in definicion["claves"]]
+    return nombres, [getattr(definicion["modelo"], nombre) for nombre in nombres]
+
+
+def _filas(db: Session, consulta, nombres: List[str]) -> List[dict]:
+    # Decimal a float como el resto de endpoints de listas del proyecto
+    return [
+        {nombre: float(valor) if isinstance(valor, Decimal) else valor for nombre, valor in zip(nombres, fila)}
+        for fila in db.execute(consulta)
+    ]
+
+
+def consultar_tramo(db: Session, proyecto_id: int, km_desde: Decimal, km_hasta: Decimal,
+                    incluir: List[str], proyeccion: Dict[str, List[str]]) -> dict:
+    """Estaciones, mediciones y lecturas con km en [km_desde, km_hasta], ordenadas por km"""
+    resultado = {"km_desde": float(km_desde), "km_hasta": float(km_hasta)}
+
+    if "estaciones" in incluir:
+        nombres, columnas = _columnas("estaciones", proyeccion.get("estaciones"))
+        resultado["estaciones"] = _filas(db, select(*columnas).where(
+            EstacionTeorica.proyecto_id == proyecto_id,
+            EstacionTeorica.km.between(km_desde, km_hasta),
+        ).order_by(EstacionTeorica.km), nombres)
+
+    # Ids de las mediciones de la ventana: también acotan el recorrido de lecturas
+    mediciones_ventana = select(MedicionEstacion.id).where(
+        MedicionEstacion.proyecto_id == proyecto_id,
+        MedicionEstacion.estacion_km.between(km_desde, km_hasta),
+    )
+
+    if "mediciones" in incluir:
+        nombres, columnas = _columnas("mediciones", proyeccion.get("mediciones"))
+        resultado["mediciones"] = _filas(db, select(*columnas).where(
+            MedicionEstacion.proyecto_id == proyecto_id,
+            MedicionEstacion.estacion_km.between(km_desde, km_hasta),
+        ).order_by(MedicionEstacion.estacion_km), nombres)
+
+    if "lecturas" in incluir:
+        nombres, columnas = _columnas("lecturas", proyeccion.get("lecturas"))
+        if "mediciones" in incluir:
+            ids = [m["id"] for m in resultado["mediciones"]]
+        else:
+            ids = list(db.scalars(mediciones_ventana))
+        resultado["lecturas"] = _filas(db, select(*columnas).where(
+            LecturaDivision.proyecto_id == proyecto_id,
+            LecturaDivision.medicion_id.in_(ids),
+        ).order_by(LecturaDivision.medicion_id, LecturaDivision.division_transversal), nombres) if ids else []
+
+    return resultado
@@ -0,0 +1,120 @@
+"""
+Registro muestreado de consultas lentas.
+
+Las consultas que superan `slow_query_threshold_ms` se registran (con
+probabilidad `slow_query_sample_rate`) en un buffer circular en memoria junto
+con la ruta que las originó. Para las registradas se captura en segundo plano
+el plan con EXPLAIN (ANALYZE, BUFFERS) usando una conexión aparte, de modo que
+la petición original no espera al EXPLAIN.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import itertools
+import logging
+import random
+import threading
+import time
+
+from sqlalchemy import event
+
+from config import settings
+from metrics import estadisticas_actuales
+
+logger = logging.getLogger(__name__)
+
+_registros = deque(maxlen=settings.slow_query_buffer_size)
+_candado = threading.Lock()
+_ids = itertools.count(1)
+# Un único hilo: los EXPLAIN se serializan y nunca compiten entre sí por el pool
+_explicador = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+
+# Sólo se ejecuta ANALYZE sobre lecturas; en DML se usa EXPLAIN simple
+# porque EXPLAIN ANALYZE ejecutaría de verdad el INSERT/UPDATE/DELETE
+_PREFIJOS_SOLO_LECTURA = ("select", "with")
+
+
+def _redactar(parametros):
+    """Sustituye los valores por su tipo para no guardar datos de usuarios"""
+    if isinstance(parametros, dict):
+        return {clave: f"<{type(valor).__name__}>" for clave, valor in parametros.items()}
+    if isinstance(parametros, (list, tuple)):
+        if parametros and isinstance(parametros[0], (dict, list, tuple)):
+            # executemany: basta con la forma del primer juego de parámetros
+            return {"filas": len(parametros), "ejemplo": _redactar(parametros[0])}
+        return [f"<{type(valor).__name__}>" for valor in parametros]
+    return None
+
+
+def _capturar_plan(engine, registro, sentencia, parametros):
+    analizar = sentencia.lstrip().lower().startswith(_PREFIJOS_SOLO_LECTURA)
+    prefijo = "EXPLAIN (ANALYZE, BUFFERS) " if analizar else "EXPLAIN "
+    conexion = engine.raw_connection()
+    try:
+        cursor = conexion.cursor()
+        cursor.execute(prefijo + sentencia, parametros)
+        plan = "\n".join(fila[0] for fila in cursor.fetchall())
+        cursor.close()
+    except Exception as e:
+        plan = f"No se pudo obtener el plan: {e}"
+    finally:
+        conexion.rollback()
+        conexion.close()
+    registro["plan"] = plan
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    # En el contexto de ejecución y no en conn.info: si la sentencia falla no
+    # hay after_cursor_execute y el inicio se descarta con el contexto
+    context._inicio_consulta_lenta = time.perf_counter()
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_inicio_consulta_lenta", None)
+    if inicio is None:
+        return
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+    if duracion_ms < settings.slow_query_threshold_ms:
+        return
+    if random.random() >= settings.slow_query_sample_rate:
+        return
+
+    peticion = estadisticas_actuales()
+    explicar = (
+        settings.slow_query_explain
+        and conn.dialect.name == "postgresql"
+        and not executemany
+    )
+    registro = {
+        "id": next(_ids),
+        "fecha": datetime.now().isoformat(),
+        "duracion_ms": round(duracion_ms, 2),
+        "sentencia": statement,
+        "parametros": _redactar(parameters),
+        "metodo": peticion.metodo if peticion else None,
+        "ruta": peticion.ruta if peticion else None,
+        "plan": "pendiente" if explicar else None,
+    }
+    with _candado:
+        _registros.append(registro)
+    logger.warning(f"Consulta lenta ({duracion_ms:.0f} ms) en {registro['ruta']}: {statement[:200]}")
+
+    if explicar:
+        _explicador.submit(_capturar_plan, conn.engine, registro, statement, parameters)
+
+
+def instalar_registro_consultas_lentas(engine):
+    """Registra los eventos de cursor que detectan las consultas lentas del engine"""
+    event.listen(engine, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(engine, "after_cursor_execute", _despues_de_ejecutar)
+
+
+def obtener_registros(limite: int = 50):
+    """Registros más recientes primero"""
+    with _candado:
+        return list(reversed(_registros))[:limite]
+
+
+def limpiar_registros():
+    with _candado:
+        _registros.clear()
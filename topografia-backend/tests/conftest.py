@@ -0,0 +1,53 @@
+"""
+Configuración común de las pruebas.
+
+Se apoyan en la preparación de los benchmarks (benchmarks/base_datos.py):
+SQLite temporal por defecto, o el PostgreSQL de TEST_DATABASE_URL
+(postgresql+psycopg2://...). Las pruebas de concurrencia sólo tienen sentido
+con los bloqueos de PostgreSQL y se saltan sin él.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.base_datos import crear_esquema, crear_usuario, preparar_entorno, token_para
+
+# Antes de importar config/database/main, que leen el entorno al importarse
+preparar_entorno(os.getenv("TEST_DATABASE_URL"))
+# Las pruebas disparan muchas escrituras simultáneas de un mismo usuario
+os.environ["ESCRITURA_TASA"] = "0"
+os.environ["ESCRITURA_CONCURRENCIA"] = "0"
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def engine():
+    return crear_esquema()
+
+
+@pytest.fixture(scope="session")
+def app(engine):
+    from main import app
+    return app
+
+
+@pytest.fixture
+def postgres(engine):
+    if engine.dialect.name != "postgresql":
+        pytest.skip("Requiere PostgreSQL: definir TEST_DATABASE_URL")
+    return engine
+
+
+@pytest.fixture
+def usuario(engine):
+    from database import SessionLocal
+
+    with SessionLocal() as db:
+        return crear_usuario(db)
+
+
+@pytest.fixture
+def cabeceras(usuario):
+    return {"Authorization": f"Bearer {token_para(usuario)}"}
@@ -0,0 +1,64 @@
+"""
+Autosave simultáneo de una misma división: muchos POST /lecturas/ a la vez
+contra la misma medición y división deben responder todos 200 y dejar una
+sola fila, con elv_base_real calculada a partir de la lectura que quedó.
+"""
+import asyncio
+from decimal import Decimal
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+ESCRITORES = 16
+
+
+def _medicion(usuario):
+    from benchmarks.generador import ConfigSintetica, generar_proyecto
+    from database import SessionLocal
+    from models.medicion import MedicionEstacion
+
+    with SessionLocal() as db:
+        proyecto_id = generar_proyecto(db, usuario, ConfigSintetica(longitud_km=0.02, relleno=1))
+        medicion = db.scalars(
+            select(MedicionEstacion)
+            .where(MedicionEstacion.proyecto_id == proyecto_id)
+            .order_by(MedicionEstacion.estacion_km)
+        ).first()
+        return medicion.id, medicion.altura_aparato
+
+
+async def _autosave_simultaneo(app, cabeceras, medicion_id, division, lecturas_mira):
+    async with httpx.AsyncClient(app=app, base_url="http://pruebas", timeout=60) as cliente:
+        return await asyncio.gather(*(
+            cliente.post("/lecturas/", headers=cabeceras, json={
+                "medicion_id": medicion_id,
+                "division_transversal": str(division),
+                "lectura_mira": str(lectura_mira),
+            })
+            for lectura_mira in lecturas_mira
+        ))
+
+
+# 4.5 no tiene lectura (todos insertan a la vez); 3 ya la tiene (todos actualizan)
+@pytest.mark.parametrize("division", [Decimal("4.5"), Decimal("3")])
+def test_escritores_simultaneos_misma_division(app, postgres, usuario, cabeceras, division):
+    from database import SessionLocal
+    from models.lectura import LecturaDivision
+
+    medicion_id, altura_aparato = _medicion(usuario)
+    lecturas_mira = [Decimal("1.500") + Decimal(i) / 1000 for i in range(ESCRITORES)]
+
+    respuestas = asyncio.run(_autosave_simultaneo(app, cabeceras, medicion_id, division, lecturas_mira))
+
+    assert [r.status_code for r in respuestas] == [200] * ESCRITORES, [r.text for r in respuestas if r.status_code != 200]
+    with SessionLocal() as db:
+        filas = db.scalars(select(LecturaDivision).where(
+            LecturaDivision.medicion_id == medicion_id,
+            LecturaDivision.division_transversal == division,
+        )).all()
+    assert len(filas) == 1
+    lectura = filas[0]
+    assert lectura.lectura_mira in lecturas_mira
+    assert lectura.elv_base_real == altura_aparato - lectura.lectura_mira
+    assert {r.json()["id"] for r in respuestas} == {lectura.id}
@@ -0,0 +1,43 @@
+"""
+GET /proyectos/resumen hace el mismo número de consultas SQL con 1 proyecto
+que con 200 (Server-Timing cuenta las consultas de la petición).
+"""
+import asyncio
+import re
+
+import httpx
+
+from benchmarks.generador import ConfigSintetica, generar_proyecto
+
+
+def _proyectos(usuario, cantidad):
+    from database import SessionLocal
+
+    config = ConfigSintetica(longitud_km=0.02, relleno=0.5)
+    with SessionLocal() as db:
+        for _ in range(cantidad):
+            generar_proyecto(db, usuario, config)
+
+
+def _resumen(app, cabeceras):
+    async def pedir():
+        async with httpx.AsyncClient(app=app, base_url="http://pruebas") as cliente:
+            return await cliente.get("/proyectos/resumen", headers=cabeceras)
+
+    respuesta = asyncio.run(pedir())
+    assert respuesta.status_code == 200, respuesta.text
+    consultas = re.search(r"(\d+) consultas", respuesta.headers["server-timing"])
+    assert consultas, respuesta.headers["server-timing"]
+    return len(respuesta.json()), int(consultas.group(1))
+
+
+def test_resumen_consultas_constantes(app, usuario, cabeceras):
+    _proyectos(usuario, 1)
+    _resumen(app, cabeceras)  # Calienta las cachés de token y perfil
+    proyectos, consultas_1 = _resumen(app, cabeceras)
+    assert proyectos == 1
+
+    _proyectos(usuario, 199)
+    proyectos, consultas_200 = _resumen(app, cabeceras)
+    assert proyectos == 200
+    assert consultas_200 == consultas_1